@@ -1,23 +1,53 @@
 # -*- coding: utf-8 -*-
 
-import matplotlib.pyplot as plt
+import argparse
+import json
 
 from catnlp.ner.format import JsonFormat, ConllFormat
 
 
-def analysis_ner(source, file_format, delimiter):
+def analysis_ner(source, file_format, delimiter, workers=1, chunk_size=10000, plot=True, output=None):
     if file_format == "conll":
-        ner_data = ConllFormat(source, delimiter)
+        ner_data = ConllFormat(source, delimiter, workers=workers, chunk_size=chunk_size)
     else:
-        ner_data = JsonFormat(source)
-    ner_data.statistics()
-    ner_data.draw_histogram(num_bins=100, density=False)
-    ner_data.draw_hbar()
-    plt.show()
+        ner_data = JsonFormat(source, workers=workers, chunk_size=chunk_size)
+    summary = ner_data.statistics()
+    if output:
+        summary["labels"] = dict(ner_data.get_label_dict())
+        with open(output, "w", encoding="utf-8") as of:
+            json.dump(summary, of, ensure_ascii=False, indent=2)
+    if plot:
+        import matplotlib.pyplot as plt
+
+        ner_data.draw_histogram(num_bins=100, density=False)
+        ner_data.draw_hbar()
+        plt.show()
 
 
 if __name__ == "__main__":
-    delimiter = "\t"
-    file_format = "conll"
-    source_file = "resources/data/dataset/ner/zh/ccks/address/bies/train.txt"
-    analysis_ner(source_file, file_format, delimiter)
+    parser = argparse.ArgumentParser(description="统计NER数据集")
+    parser.add_argument(
+        "--source", default="resources/data/dataset/ner/zh/ccks/address/bies/train.txt", type=str, help="数据集文件"
+    )
+    parser.add_argument(
+        "--file_format", default="conll", type=str, choices=["conll", "json"], help="文件格式，json包括.arrow文件"
+    )
+    parser.add_argument(
+        "--delimiter", default="\t", type=str, help="conll格式中字和标签的分隔符"
+    )
+    parser.add_argument(
+        "--workers", default=1, type=int, help="统计进程数"
+    )
+    parser.add_argument(
+        "--chunk_size", default=10000, type=int, help="每个进程每次统计的记录数"
+    )
+    parser.add_argument(
+        "--no_plot", action="store_true", help="只输出统计结果，不画图"
+    )
+    parser.add_argument(
+        "--output", default=None, type=str, help="统计结果保存为json文件"
+    )
+    args = parser.parse_args()
+    analysis_ner(args.source, args.file_format, args.delimiter,
+                 workers=args.workers, chunk_size=args.chunk_size,
+                 plot=not args.no_plot, output=args.output)
@@ -2,6 +2,7 @@
 
 import argparse
 
+from catnlp.common.load_file import load_config_file
 from catnlp.ner.auto import NerAuto
 
 
@@ -9,12 +10,19 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="训练模型")
     parser.add_argument("--task", type=str,
                         default="NER", help="任务")
+    parser.add_argument("--train_config", type=str,
+                        default="resources/config/ner/bert_biaffine.yaml", help="训练配置")
     parser.add_argument("--n_trials", type=int,
-                        default=20, help="训练配置")
+                        default=None, help="trial总数，默认使用配置中的auto.n_trials")
     args = parser.parse_args()
 
+    try:
+        train_config = load_config_file(args.train_config)
+    except Exception:
+        raise RuntimeError("加载配置文件失败")
+
     task = args.task.lower()
     if task == "ner":
-        NerAuto(args.n_trials)
+        NerAuto(train_config, args.n_trials)
     else:
         raise RuntimeError(f"{args.task}未开发")
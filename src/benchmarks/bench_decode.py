@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import numpy as np
+import torch
+
+from .fixtures import entities_to_tags, get_label_list, random_entities
+
+
+def run_crf(suite, quick=False):
+    """
+    CRF的负对数似然、viterbi解码、k-best解码和边缘概率
+    """
+    from catnlp.layer.decoder.crf import CRF
+
+    torch.manual_seed(0)
+    num_tags = len(get_label_list())
+    crf = CRF(num_tags=num_tags, batch_first=True)
+    shapes = [(8, 64)] if quick else [(8, 64), (32, 128), (32, 256)]
+    for batch_size, seq_len in shapes:
+        emissions = torch.randn(batch_size, seq_len, num_tags)
+        tags = torch.randint(num_tags, (batch_size, seq_len))
+        lengths = torch.randint(seq_len // 2, seq_len + 1, (batch_size,))
+        lengths[0] = seq_len
+        mask = (torch.arange(seq_len)[None, :] < lengths[:, None]).byte()
+        params = {"batch_size": batch_size, "seq_len": seq_len, "num_tags": num_tags}
+        name = f"len={seq_len}/batch={batch_size}"
+        with torch.no_grad():
+            suite.run(f"crf/decode/{name}", lambda: crf.decode(emissions, mask),
+                      params=params, items=batch_size, unit="seqs")
+            suite.run(f"crf/decode_nbest/k=5/{name}", lambda: crf.decode_nbest(emissions, mask, nbest=5),
+                      params=dict(params, nbest=5), items=batch_size, unit="seqs")
+            suite.run(f"crf/marginals/{name}", lambda: crf.marginals(emissions, mask),
+                      params=params, items=batch_size, unit="seqs")
+        suite.run(f"crf/forward_backward/{name}", lambda: (-crf(emissions, tags, mask)).backward(),
+                  params=params, items=batch_size, unit="seqs")
+
+
+def run_biaffine(suite, quick=False):
+    """
+    训练验证时的biaffine解码
+    """
+    from catnlp.ner.util.decode import get_labels
+
+    torch.manual_seed(0)
+    label_list = get_label_list("biaffine")
+    shapes = [(8, 64)] if quick else [(8, 64), (16, 128)]
+    for batch_size, seq_len in shapes:
+        predictions = torch.softmax(torch.randn(batch_size, seq_len, seq_len, len(label_list)), dim=-1)
+        references = torch.randint(len(label_list), (batch_size, seq_len, seq_len))
+        input_len = torch.full((batch_size,), seq_len, dtype=torch.long)
+        params = {"batch_size": batch_size, "seq_len": seq_len}
+        suite.run(f"biaffine_decode/len={seq_len}/batch={batch_size}",
+                  lambda: get_labels(predictions, references, label_list, input_len, decode_type="biaffine"),
+                  params=params, items=batch_size, unit="seqs")
+        max_span_len = 16
+        band_predictions = predictions[:, :, :max_span_len].contiguous()
+        suite.run(f"biaffine_decode/band={max_span_len}/len={seq_len}/batch={batch_size}",
+                  lambda: get_labels(band_predictions, references, label_list, input_len,
+                                     decode_type="biaffine", max_span_len=max_span_len),
+                  params=dict(params, max_span_len=max_span_len), items=batch_size, unit="seqs")
+
+
+def run_merge(suite, quick=False):
+    """
+    多个模型标签序列的去冲突合并
+    """
+    from catnlp.ner.util.merge import merge_tag_lists
+
+    rng = random.Random(0)
+    num_models = 5
+    seq_lens = [128] if quick else [128, 512]
+    for seq_len in seq_lens:
+        tag_lists = [entities_to_tags(random_entities(seq_len, rng), seq_len) for _ in range(num_models)]
+        weight_list = [rng.random() for _ in range(num_models)]
+        for method in ["longest", "most", "maximum", "weighted"]:
+            params = {"method": method, "seq_len": seq_len, "num_models": num_models}
+            suite.run(f"merge_tag_lists/{method}/len={seq_len}",
+                      lambda: merge_tag_lists(tag_lists, method=method, weight_list=weight_list),
+                      params=params, items=1, unit="seqs")
+
+
+def run_score(suite, quick=False):
+    """
+    实体级别的F1计算
+    """
+    from catnlp.ner.util.score import NerScorer, get_f1
+
+    rng = random.Random(0)
+    num = 200 if quick else 2000
+    seq_len = 64
+    gold_lists = [entities_to_tags(random_entities(seq_len, rng), seq_len) for _ in range(num)]
+    pred_lists = [entities_to_tags(random_entities(seq_len, rng), seq_len) for _ in range(num)]
+    # 一半预测与标注一致，模拟训练后期
+    pred_lists[::2] = gold_lists[::2]
+    params = {"num": num, "seq_len": seq_len}
+    suite.run(f"get_f1/num={num}", lambda: get_f1(gold_lists, pred_lists, "bio"),
+              params=params, items=num, unit="seqs")
+
+    # 与训练验证时一致：标签id带[CLS]，按batch累计
+    label_list = get_label_list()
+    label_to_id = {label: idx for idx, label in enumerate(label_list)}
+    batch_size = 32
+    gold_ids = torch.tensor([[0] + [label_to_id[tag] for tag in tags] + [0] for tags in gold_lists])
+    pred_ids = torch.tensor([[0] + [label_to_id[tag] for tag in tags] + [0] for tags in pred_lists])
+    input_len = torch.full((num,), seq_len + 2, dtype=torch.long)
+
+    def score():
+        scorer = NerScorer(label_list)
+        for i in range(0, num, batch_size):
+            scorer.update(gold_ids[i: i + batch_size], pred_ids[i: i + batch_size], input_len[i: i + batch_size])
+        return scorer.compute()
+
+    suite.run(f"ner_scorer/num={num}", score, params={**params, "batch_size": batch_size},
+              items=num, unit="seqs")
+
+
+def run(suite, workdir=None, quick=False):
+    """
+    解码、合并、评估
+    Args:
+        suite(BenchmarkSuite): 结果收集
+        workdir(Path): 临时目录(未使用)
+        quick(bool): 是否只跑小规模参数
+    """
+    np.random.seed(0)
+    run_crf(suite, quick)
+    run_biaffine(suite, quick)
+    run_merge(suite, quick)
+    run_score(suite, quick)
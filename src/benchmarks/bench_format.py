@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+from .fixtures import entities_to_tags, random_entities, random_text, write_json_file
+
+FORMATS = ["json2bio", "json2bies", "json2split", "bio2json", "bies2json"]
+
+
+def run(suite, workdir, quick=False):
+    """
+    数据格式转换
+    Args:
+        suite(BenchmarkSuite): 结果收集
+        workdir(Path): 临时目录，存放数据文件
+        quick(bool): 是否只跑小规模参数
+    """
+    from catnlp.ner.format import NerFormat
+    from catnlp.ner.util.split import cut_batch
+
+    num = 500 if quick else 5000
+    text_len = 100
+    json_file = workdir / "data.json"
+    write_json_file(json_file, num, text_len)
+    ner_format = NerFormat()
+    sources = {
+        "json2bio": json_file,
+        "json2bies": json_file,
+        "json2split": json_file,
+        "bio2json": workdir / "data.json2bio",
+        "bies2json": workdir / "data.json2bies"
+    }
+    for format in FORMATS:
+        target = workdir / f"data.{format}"
+        params = {"format": format, "num": num, "text_len": text_len}
+        suite.run(f"format/{format}/num={num}",
+                  lambda: ner_format.convert(str(sources[format]), str(target), False, format),
+                  params=params, items=num, unit="records")
+
+    # 长文本切分，句子之间用分隔符连接
+    rng = random.Random(0)
+    doc_len = 2000 if quick else 20000
+    texts = list()
+    tags_list = list()
+    for _ in range(10):
+        sents = [random_text(rng.randint(5, 30), rng) for _ in range(doc_len // 18)]
+        text = "".join(sent + rng.choice("，。；") for sent in sents)
+        texts.append(text)
+        tags_list.append(entities_to_tags(random_entities(len(text), rng), len(text)))
+    params = {"doc_len": doc_len, "max_len": 256, "overlap_len": 50}
+    suite.run(f"format/cut/doc_len={doc_len}",
+              lambda: cut_batch(texts, tags_list, 256, 50),
+              params=params, items=sum(map(len, texts)), unit="chars")
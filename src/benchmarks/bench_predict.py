@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import torch
+
+from .fixtures import random_text, write_plm_model
+
+MODEL_NAMES = ["bert_softmax", "bert_crf", "bert_lstm_crf", "bert_biaffine", "albert_tiny_crf", "albert_tiny_softmax"]
+
+
+def predict_texts(predictor, texts):
+    """
+    按PredictPlm.predict的流程批量预测
+    Args:
+        predictor(PredictPlm): 预测器
+        texts(list): 文本列表
+    Returns:
+        entity_lists(list): 实体列表
+    """
+    inputs = predictor.preprocess(texts)
+    with torch.no_grad():
+        outputs = predictor.model(**inputs)
+    return predictor.postprocess(texts, outputs)
+
+
+def run(suite, workdir, quick=False):
+    """
+    PredictPlm端到端预测(分词、前向、解码)
+    Args:
+        suite(BenchmarkSuite): 结果收集
+        workdir(Path): 临时目录，存放随机初始化的模型
+        quick(bool): 是否只跑小规模参数
+    """
+    from catnlp.ner.predict_plm import PredictPlm
+
+    seq_lens = [32] if quick else [32, 128]
+    batch_sizes = [1, 8] if quick else [1, 8, 32]
+    model_names = MODEL_NAMES[:2] + MODEL_NAMES[3:4] if quick else MODEL_NAMES
+    rng = random.Random(0)
+    for name in model_names:
+        model_dir = workdir / name
+        decode_type = write_plm_model(model_dir, name)
+        for seq_len in seq_lens:
+            predictor = PredictPlm({
+                "name": name,
+                "decode_type": decode_type,
+                "model_path": str(model_dir),
+                "max_length": seq_len + 2,
+                "do_lower_case": False,
+                "device": "cpu"
+            })
+            for batch_size in batch_sizes:
+                texts = [random_text(seq_len, rng) for _ in range(batch_size)]
+                params = {"model": name, "seq_len": seq_len, "batch_size": batch_size}
+                suite.run(f"predict_plm/{name}/len={seq_len}/batch={batch_size}",
+                          lambda: predict_texts(predictor, texts), params=params,
+                          items=batch_size, unit="texts")
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+from .fixtures import TAGS, random_text
+
+
+def write_dict_files(workdir, num_words, rng):
+    """
+    为每个类别生成词典文件
+    Returns:
+        config(dict): 类别 - 词典文件
+    """
+    config = dict()
+    for tag in TAGS:
+        dict_file = workdir / f"{tag}.dict"
+        with open(dict_file, "w", encoding="utf-8") as df:
+            for _ in range(num_words):
+                df.write(random_text(rng.randint(2, 6), rng) + "\n")
+        config[tag] = str(dict_file)
+    return config
+
+
+def write_re_files(workdir):
+    """
+    为每个类别生成正则文件
+    Returns:
+        config(dict): 类别 - 正则文件
+    """
+    patterns = {
+        "ROAD": [r"[东南西北]?[一-龥]{1,4}路", r"[一-龥]{1,4}街道?"],
+        "POI": [r"[一-龥]{2,4}(小区|花园|大厦|广场|中心)"],
+        "NUM": [r"\d+号楼?", r"\d+单元", r"\d+室"]
+    }
+    config = dict()
+    for tag, pattern_list in patterns.items():
+        re_file = workdir / f"{tag}.re"
+        with open(re_file, "w", encoding="utf-8") as rf:
+            rf.write("\n".join(pattern_list) + "\n")
+        config[tag] = str(re_file)
+    return config
+
+
+def run(suite, workdir, quick=False):
+    """
+    词典和正则预测
+    Args:
+        suite(BenchmarkSuite): 结果收集
+        workdir(Path): 临时目录，存放词典和正则文件
+        quick(bool): 是否只跑小规模参数
+    """
+    from catnlp.ner.predict_dict import PredictDict
+    from catnlp.ner.predict_re import PredictRe
+
+    rng = random.Random(0)
+    text_lens = [64] if quick else [64, 512]
+    num_words = 1000 if quick else 20000
+
+    dict_service = PredictDict(write_dict_files(workdir, num_words, rng))
+    re_service = PredictRe(write_re_files(workdir))
+    for text_len in text_lens:
+        text = random_text(text_len, rng)
+        params = {"text_len": text_len, "num_words": num_words, "num_tags": len(TAGS)}
+        suite.run(f"predict_dict/len={text_len}/words={num_words}", lambda: dict_service.predict(text),
+                  params=params, items=1, unit="texts")
+        params = {"text_len": text_len}
+        suite.run(f"predict_re/len={text_len}", lambda: re_service.predict(text),
+                  params=params, items=1, unit="texts")
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime
+
+import numpy as np
+import torch
+
+
+def measure(func, repeat=20, warmup=3, quiet=True):
+    """
+    多次运行函数并统计耗时
+    Args:
+        func(callable): 无参函数
+        repeat(int): 计时次数
+        warmup(int): 预热次数，不计时
+        quiet(bool): 是否屏蔽函数内的print
+    Returns:
+        stats(dict): 耗时统计(毫秒)
+    """
+    times = list()
+    with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+        for _ in range(warmup):
+            func()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append((time.perf_counter() - start) * 1e3)
+    times = np.array(times)
+    return {
+        "mean_ms": round(float(times.mean()), 4),
+        "std_ms": round(float(times.std()), 4),
+        "min_ms": round(float(times.min()), 4),
+        "p50_ms": round(float(np.percentile(times, 50)), 4),
+        "p95_ms": round(float(np.percentile(times, 95)), 4),
+        "repeat": repeat
+    }
+
+
+class BenchmarkSuite:
+    """
+    收集benchmark结果并输出json
+    Example:
+        >>> suite = BenchmarkSuite(repeat=20)
+        >>> suite.run("crf/decode", func, params={"batch": 32}, items=32)
+        >>> suite.save("bench.json")
+    """
+    def __init__(self, repeat=20, warmup=3, verbose=True):
+        self.repeat = repeat
+        self.warmup = warmup
+        self.verbose = verbose
+        self.results = dict()
+
+    def run(self, name, func, params=None, items=None, unit="items"):
+        """
+        运行一个benchmark
+        Args:
+            name(str): 名称，比较时以名称对齐
+            func(callable): 无参函数
+            params(dict): 参数
+            items(int): 每次调用处理的条数，用于计算吞吐量
+            unit(str): 吞吐量单位
+        Returns:
+            result(dict): 结果
+        """
+        result = measure(func, repeat=self.repeat, warmup=self.warmup)
+        result["params"] = params or dict()
+        if items:
+            result["throughput"] = round(items / (result["p50_ms"] / 1e3), 2)
+            result["unit"] = f"{unit}/s"
+        self.results[name] = result
+        if self.verbose:
+            throughput = f"\t{result['throughput']} {result['unit']}" if items else ""
+            print(f"{name:<60}\tp50: {result['p50_ms']:.3f}ms\tp95: {result['p95_ms']:.3f}ms{throughput}")
+        return result
+
+    def save(self, output_file):
+        """
+        保存结果
+        Args:
+            output_file(str): json文件路径
+        """
+        data = {
+            "meta": get_meta(),
+            "results": self.results
+        }
+        with open(output_file, "w", encoding="utf-8") as of:
+            json.dump(data, of, ensure_ascii=False, indent=2)
+
+
+def get_meta():
+    """
+    获得运行环境信息
+    Returns:
+        meta(dict): commit、python/torch版本、线程数、时间
+    """
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "numpy": np.__version__,
+        "num_threads": torch.get_num_threads(),
+        "machine": platform.machine(),
+        "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import sys
+
+from prettytable import PrettyTable
+
+
+def load_results(result_file):
+    with open(result_file, "r", encoding="utf-8") as rf:
+        return json.load(rf)
+
+
+def compare(base, head, metric="p50_ms", threshold=0.1):
+    """
+    对比两次benchmark结果
+    Args:
+        base(dict): 基准结果
+        head(dict): 新结果
+        metric(str): 对比的耗时指标
+        threshold(float): 变慢超过该比例视为退化
+    Returns:
+        table(PrettyTable): 对比表
+        regressions(list): 退化的benchmark名
+    """
+    table = PrettyTable()
+    table.field_names = ["Benchmark", f"base {metric}", f"head {metric}", "Speedup", ""]
+    table.align["Benchmark"] = "l"
+    regressions = list()
+    base_results = base["results"]
+    head_results = head["results"]
+    for name in sorted(set(base_results) | set(head_results)):
+        if name not in base_results or name not in head_results:
+            base_value = base_results.get(name, {}).get(metric, "-")
+            head_value = head_results.get(name, {}).get(metric, "-")
+            table.add_row([name, base_value, head_value, "-", "new" if name in head_results else "removed"])
+            continue
+        base_value = base_results[name][metric]
+        head_value = head_results[name][metric]
+        speedup = base_value / max(head_value, 1e-9)
+        flag = ""
+        if head_value > base_value * (1 + threshold):
+            flag = "slower"
+            regressions.append(name)
+        elif base_value > head_value * (1 + threshold):
+            flag = "faster"
+        table.add_row([name, base_value, head_value, f"{speedup:.2f}x", flag])
+    return table, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="对比两次benchmark结果")
+    parser.add_argument("base", type=str, help="基准结果文件")
+    parser.add_argument("head", type=str, help="新结果文件")
+    parser.add_argument("--metric", type=str, default="p50_ms", choices=["mean_ms", "min_ms", "p50_ms", "p95_ms"])
+    parser.add_argument("--threshold", type=float, default=0.1, help="变慢超过该比例视为退化")
+    args = parser.parse_args()
+
+    base = load_results(args.base)
+    head = load_results(args.head)
+    print(f"base: {base['meta'].get('commit')}\thead: {head['meta'].get('commit')}")
+    table, regressions = compare(base, head, args.metric, args.threshold)
+    print(table)
+    if regressions:
+        print(f"{len(regressions)}项退化：{', '.join(regressions)}")
+        sys.exit(1)
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+import json
+import random
+from pathlib import Path
+
+import torch
+
+CHARS = "北京上海广州深圳杭州南京武汉成都西安天津重庆市区县镇村路街道号楼单元室小区花园大厦中心广场东南西北新华人民建设解放"
+TAGS = ["PROV", "CITY", "DIST", "ROAD", "POI"]
+
+
+def random_text(length, rng=random):
+    """
+    生成随机文本
+    Args:
+        length(int): 文本长度
+        rng(random.Random): 随机数生成器
+    Returns:
+        text(str): 文本
+    """
+    return "".join(rng.choice(CHARS) for _ in range(length))
+
+
+def random_entities(length, rng=random, max_entity_len=6, density=0.5):
+    """
+    生成不重叠的随机实体
+    Args:
+        length(int): 文本长度
+        rng(random.Random): 随机数生成器
+        max_entity_len(int): 实体最大长度
+        density(float): 实体字符占比
+    Returns:
+        entity_list(list): [[start, end, tag], ...]
+    """
+    entity_list = list()
+    idx = 0
+    while idx < length:
+        if rng.random() < density:
+            end = min(length, idx + rng.randint(1, max_entity_len))
+            entity_list.append([idx, end, rng.choice(TAGS)])
+            idx = end
+        else:
+            idx += rng.randint(1, max_entity_len)
+    return entity_list
+
+
+def entities_to_tags(entity_list, length, format="bio"):
+    """
+    实体列表转标签序列
+    Args:
+        entity_list(list): 实体列表
+        length(int): 序列长度
+        format(str): bio|bies
+    Returns:
+        tag_list(list): 标签序列
+    """
+    tag_list = ["O"] * length
+    for start, end, tag in entity_list:
+        if format == "bies":
+            if end - start == 1:
+                tag_list[start] = f"S-{tag}"
+                continue
+            tag_list[end-1] = f"E-{tag}"
+            for i in range(start+1, end-1):
+                tag_list[i] = f"I-{tag}"
+        else:
+            for i in range(start+1, end):
+                tag_list[i] = f"I-{tag}"
+        tag_list[start] = f"B-{tag}"
+    return tag_list
+
+
+def get_label_list(decode_type="general", format="bio"):
+    """
+    获得标签列表，第0个为[PAD]
+    Args:
+        decode_type(str): general|biaffine
+        format(str): bio|bies
+    Returns:
+        label_list(list): 标签列表
+    """
+    label_list = ["[PAD]"]
+    if decode_type == "biaffine":
+        return label_list + TAGS
+    label_list.append("O")
+    prefixes = "BIES" if format == "bies" else "BI"
+    for tag in TAGS:
+        for prefix in prefixes:
+            label_list.append(f"{prefix}-{tag}")
+    return label_list
+
+
+def write_json_file(data_file, num, length, seed=0):
+    """
+    生成json格式的数据文件
+    Args:
+        data_file(str): 文件路径
+        num(int): 条数
+        length(int): 文本长度
+        seed(int): 随机种子
+    """
+    rng = random.Random(seed)
+    with open(data_file, "w", encoding="utf-8") as df:
+        for _ in range(num):
+            line = {"text": random_text(length, rng), "labels": random_entities(length, rng)}
+            df.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+def write_plm_model(model_dir, name, hidden_size=64, num_layers=2, seed=0):
+    """
+    生成随机初始化的小模型目录，结构与训练保存的模型一致(config.json/vocab.txt/label.txt/pytorch_model.bin)
+    Args:
+        model_dir(str): 模型目录
+        name(str): 模型名(bert_softmax|bert_crf|bert_lstm_crf|bert_biaffine|albert_tiny_crf|albert_tiny_softmax)
+        hidden_size(int): 隐层大小
+        num_layers(int): 层数
+        seed(int): 随机种子
+    Returns:
+        decode_type(str): 解码方式
+    """
+    from transformers import AlbertConfig, BertConfig
+    from catnlp.ner.model.albert_tiny import AlbertTinyCrf, AlbertTinySoftmax
+    from catnlp.ner.model.bert import BertBiaffine, BertCrf, BertLstmCrf, BertSoftmax
+
+    model_funcs = {
+        "bert_softmax": BertSoftmax,
+        "bert_crf": BertCrf,
+        "bert_lstm_crf": BertLstmCrf,
+        "bert_biaffine": BertBiaffine,
+        "albert_tiny_crf": AlbertTinyCrf,
+        "albert_tiny_softmax": AlbertTinySoftmax
+    }
+    if name not in model_funcs:
+        raise ValueError(f"无效模型：{name}")
+    decode_type = "biaffine" if name == "bert_biaffine" else "general"
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+
+    vocab_list = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "[unused1]"] + sorted(set(CHARS))
+    with open(model_dir / "vocab.txt", "w", encoding="utf-8") as vf:
+        vf.write("\n".join(vocab_list) + "\n")
+    label_list = get_label_list(decode_type)
+    with open(model_dir / "label.txt", "w", encoding="utf-8") as lf:
+        lf.write("\n".join(label_list) + "\n")
+
+    config_kwargs = {
+        "vocab_size": len(vocab_list),
+        "hidden_size": hidden_size,
+        "num_hidden_layers": num_layers,
+        "num_attention_heads": 2,
+        "intermediate_size": hidden_size * 2,
+        "max_position_embeddings": 512,
+        "num_labels": len(label_list)
+    }
+    if name.startswith("albert"):
+        config = AlbertConfig(embedding_size=hidden_size // 2, tokenizer_class="BertTokenizer", **config_kwargs)
+    else:
+        config = BertConfig(**config_kwargs)
+        config.use_relative_position = True
+        config.max_relative_position = 64
+    config.save_pretrained(str(model_dir))
+    config.loss_name = None
+
+    torch.manual_seed(seed)
+    model = model_funcs[name](config)
+    torch.save(model.state_dict(), model_dir / "pytorch_model.bin")
+    return decode_type
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import importlib
+import tempfile
+from pathlib import Path
+
+import torch
+
+from .common import BenchmarkSuite
+
+SUITES = ["predict", "decode", "rule", "format"]
+
+
+def main(args):
+    torch.set_num_threads(args.num_threads)
+    suite = BenchmarkSuite(repeat=args.repeat, warmup=args.warmup)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in args.suites:
+            try:
+                module = importlib.import_module(f".bench_{name}", __package__)
+                workdir = Path(tmp_dir) / name
+                workdir.mkdir()
+                module.run(suite, workdir, quick=args.quick)
+            except ImportError as e:
+                # 缺少可选依赖(如ahocorasick/matplotlib)时跳过该组
+                print(f"跳过{name}：{e}")
+    suite.save(args.output)
+    print(f"结果保存在{args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU性能测试")
+    parser.add_argument("--output", type=str, default="benchmark.json", help="结果文件")
+    parser.add_argument("--suites", type=str, nargs="+", default=SUITES, choices=SUITES, help="测试组")
+    parser.add_argument("--repeat", type=int, default=20, help="计时次数")
+    parser.add_argument("--warmup", type=int, default=3, help="预热次数")
+    parser.add_argument("--num_threads", type=int, default=1, help="torch线程数")
+    parser.add_argument("--quick", action="store_true", help="只跑小规模参数")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(line):
+    """
+    解析json字符串，安装了orjson时使用orjson
+    Args:
+        line(str|bytes): json字符串
+    Returns:
+        obj(object): 解析结果
+    """
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+def dumps(obj):
+    """
+    序列化为json字符串，中文不转义，安装了orjson时使用orjson(输出不带空格)
+    Args:
+        obj(object): 对象
+    Returns:
+        line(str): json字符串
+    """
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
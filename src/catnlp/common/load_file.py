@@ -45,6 +45,19 @@ def load_dict_file(dict_file):
 def load_re_file(re_file):
     """
     """
+    pattern_list = load_re_patterns(re_file)
+    pattern_str = "|".join(pattern_list)
+    return pattern_str
+
+
+def load_re_patterns(re_file):
+    """
+    加载正则文件，每行一个正则
+    Args:
+        re_file(str): 正则文件路径
+    Returns:
+        pattern_list(list): 正则列表
+    """
     pattern_list = list()
     with open(re_file, "r", encoding="utf-8") as lf:
         for line in lf:
@@ -52,5 +65,4 @@ def load_re_file(re_file):
             if not line:
                 continue
             pattern_list.append(line)
-    pattern_str = "|".join(pattern_list)
-    return pattern_str
+    return pattern_list
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 import torch
 import torch.nn as nn
@@ -138,6 +138,101 @@ class CRF(nn.Module):
 
         return self._viterbi_decode(emissions, mask)
 
+    def decode_nbest(self, emissions: torch.Tensor,
+                     mask: Optional[torch.ByteTensor] = None,
+                     nbest: int = 1) -> Tuple[torch.LongTensor, torch.Tensor]:
+        """Find the k most likely tag sequences using a batched k-best Viterbi algorithm.
+
+        Args:
+            emissions (`~torch.Tensor`): Emission score tensor of size
+                ``(seq_length, batch_size, num_tags)`` if ``batch_first`` is ``False``,
+                ``(batch_size, seq_length, num_tags)`` otherwise.
+            mask (`~torch.ByteTensor`): Mask tensor of size ``(seq_length, batch_size)``
+                if ``batch_first`` is ``False``, ``(batch_size, seq_length)`` otherwise.
+            nbest: Number of tag sequences to return.
+
+        Returns:
+            Tag sequences of size ``(batch_size, nbest, seq_length)`` padded with 0, and
+            their log probabilities of size ``(batch_size, nbest)`` sorted in descending
+            order. A sequence with fewer than ``nbest`` possible paths gets ``-inf`` scores.
+        """
+        if nbest <= 0:
+            raise ValueError(f'invalid nbest: {nbest}')
+        self._validate(emissions, mask=mask)
+        if mask is None:
+            mask = emissions.new_ones(emissions.shape[:2], dtype=torch.uint8)
+
+        if self.batch_first:
+            emissions = emissions.transpose(0, 1)
+            mask = mask.transpose(0, 1)
+
+        tags, scores = self._viterbi_decode_nbest(emissions, mask, nbest)
+        return tags, scores - self._compute_normalizer(emissions, mask).unsqueeze(1)
+
+    def marginals(self, emissions: torch.Tensor,
+                  mask: Optional[torch.ByteTensor] = None) -> torch.Tensor:
+        """Compute the posterior probability of every tag at every timestep using the
+        forward-backward algorithm.
+
+        Args:
+            emissions (`~torch.Tensor`): Emission score tensor of size
+                ``(seq_length, batch_size, num_tags)`` if ``batch_first`` is ``False``,
+                ``(batch_size, seq_length, num_tags)`` otherwise.
+            mask (`~torch.ByteTensor`): Mask tensor of size ``(seq_length, batch_size)``
+                if ``batch_first`` is ``False``, ``(batch_size, seq_length)`` otherwise.
+
+        Returns:
+            `~torch.Tensor`: Marginal probabilities with the same size as ``emissions``.
+            Masked timesteps are 0.
+        """
+        self._validate(emissions, mask=mask)
+        if mask is None:
+            mask = emissions.new_ones(emissions.shape[:2], dtype=torch.uint8)
+
+        if self.batch_first:
+            emissions = emissions.transpose(0, 1)
+            mask = mask.transpose(0, 1)
+
+        # shape: (seq_length, batch_size, num_tags)
+        alphas = self._compute_alphas(emissions, mask)
+        betas = self._compute_betas(emissions, mask)
+        # shape: (batch_size,)
+        normalizer = torch.logsumexp(alphas[-1] + self.end_transitions, dim=1)
+        marginals = torch.exp(alphas + betas - normalizer.unsqueeze(1))
+        marginals = marginals * mask.unsqueeze(2).to(marginals.dtype)
+
+        if self.batch_first:
+            marginals = marginals.transpose(0, 1)
+        return marginals
+
+    def decode_with_confidence(self, emissions: torch.Tensor,
+                               mask: Optional[torch.ByteTensor] = None
+                               ) -> Tuple[torch.LongTensor, torch.Tensor]:
+        """Find the best tag sequence and the marginal probability of each of its tags.
+
+        Args:
+            emissions (`~torch.Tensor`): Emission score tensor of size
+                ``(seq_length, batch_size, num_tags)`` if ``batch_first`` is ``False``,
+                ``(batch_size, seq_length, num_tags)`` otherwise.
+            mask (`~torch.ByteTensor`): Mask tensor of size ``(seq_length, batch_size)``
+                if ``batch_first`` is ``False``, ``(batch_size, seq_length)`` otherwise.
+
+        Returns:
+            Best tag sequences and per-tag confidences, both of size ``(batch_size, seq_length)``
+            if ``batch_first`` is ``True`` and ``(seq_length, batch_size)`` otherwise, padded with 0.
+        """
+        tags, _ = self.decode_nbest(emissions, mask, nbest=1)
+        # shape: (batch_size, seq_length)
+        tags = tags[:, 0]
+        marginals = self.marginals(emissions, mask)
+        if not self.batch_first:
+            marginals = marginals.transpose(0, 1)
+        confidence = marginals.gather(2, tags.unsqueeze(2)).squeeze(2)
+        if not self.batch_first:
+            tags = tags.transpose(0, 1)
+            confidence = confidence.transpose(0, 1)
+        return tags, confidence
+
     def _validate(
             self,
             emissions: torch.Tensor,
@@ -209,6 +304,22 @@ class CRF(nn.Module):
             self, emissions: torch.Tensor, mask: torch.ByteTensor) -> torch.Tensor:
         # emissions: (seq_length, batch_size, num_tags)
         # mask: (seq_length, batch_size)
+        # shape: (batch_size, num_tags)
+        score = self._compute_alphas(emissions, mask, keep_all=False)
+
+        # End transition score
+        # shape: (batch_size, num_tags)
+        score = score + self.end_transitions
+
+        # Sum (log-sum-exp) over all possible tags
+        # shape: (batch_size,)
+        return torch.logsumexp(score, dim=1)
+
+    def _compute_alphas(
+            self, emissions: torch.Tensor, mask: torch.ByteTensor,
+            keep_all: bool = True) -> torch.Tensor:
+        # emissions: (seq_length, batch_size, num_tags)
+        # mask: (seq_length, batch_size)
         assert emissions.dim() == 3 and mask.dim() == 2
         assert emissions.shape[:2] == mask.shape
         assert emissions.size(2) == self.num_tags
@@ -221,6 +332,7 @@ class CRF(nn.Module):
         # the score that the first timestep has tag j
         # shape: (batch_size, num_tags)
         score = self.start_transitions + emissions[0]
+        alphas = [score]
 
         for i in range(1, seq_length):
             # Broadcast score for every possible next tag
@@ -246,15 +358,42 @@ class CRF(nn.Module):
 
             # Set score to the next score if this timestep is valid (mask == 1)
             # shape: (batch_size, num_tags)
-            score = torch.where(mask[i].unsqueeze(1), next_score, score)
+            score = torch.where(mask[i].unsqueeze(1).bool(), next_score, score)
+            if keep_all:
+                alphas.append(score)
 
-        # End transition score
+        if not keep_all:
+            return score
+        # shape: (seq_length, batch_size, num_tags)
+        return torch.stack(alphas)
+
+    def _compute_betas(
+            self, emissions: torch.Tensor, mask: torch.ByteTensor) -> torch.Tensor:
+        # emissions: (seq_length, batch_size, num_tags)
+        # mask: (seq_length, batch_size)
+        seq_length = emissions.size(0)
+
+        # The score of all tag sequences from timestep i to the end given tag j at
+        # timestep i; it stays at the end transition score after the last valid timestep
         # shape: (batch_size, num_tags)
-        score += self.end_transitions
+        score = self.end_transitions.expand_as(emissions[0])
+        betas = [score]
 
-        # Sum (log-sum-exp) over all possible tags
-        # shape: (batch_size,)
-        return torch.logsumexp(score, dim=1)
+        for i in range(seq_length - 1, 0, -1):
+            # shape: (batch_size, 1, num_tags)
+            broadcast_score = (score + emissions[i]).unsqueeze(1)
+
+            # Sum over all possible next tags
+            # shape: (batch_size, num_tags)
+            next_score = torch.logsumexp(self.transitions + broadcast_score, dim=2)
+
+            # shape: (batch_size, num_tags)
+            score = torch.where(mask[i].unsqueeze(1).bool(), next_score, score)
+            betas.append(score)
+
+        betas.reverse()
+        # shape: (seq_length, batch_size, num_tags)
+        return torch.stack(betas)
 
     def _viterbi_decode(self, emissions: torch.FloatTensor,
                         mask: torch.ByteTensor) -> List[List[int]]:
@@ -332,3 +471,58 @@ class CRF(nn.Module):
             best_tags_list.append(best_tags)
 
         return best_tags_list
+
+    def _viterbi_decode_nbest(self, emissions: torch.FloatTensor,
+                              mask: torch.ByteTensor,
+                              nbest: int) -> Tuple[torch.LongTensor, torch.Tensor]:
+        # emissions: (seq_length, batch_size, num_tags)
+        # mask: (seq_length, batch_size)
+        assert emissions.dim() == 3 and mask.dim() == 2
+        assert emissions.shape[:2] == mask.shape
+        assert emissions.size(2) == self.num_tags
+        assert mask[0].all()
+
+        seq_length, batch_size = mask.shape
+        num_tags = self.num_tags
+
+        # score[b, k, j] stores the score of the k-th best tag sequence so far that ends
+        # with tag j; only k = 0 exists at the first timestep
+        # shape: (batch_size, nbest, num_tags)
+        score = emissions.new_full((batch_size, nbest, num_tags), float('-inf'))
+        score[:, 0] = self.start_transitions + emissions[0]
+        # Index of (k, j) flattened, used as the back pointer of masked timesteps
+        # shape: (nbest, num_tags)
+        identity = torch.arange(nbest * num_tags, device=emissions.device).view(nbest, num_tags)
+        history = []
+
+        for i in range(1, seq_length):
+            # shape: (batch_size, nbest, num_tags, num_tags)
+            next_score = score.unsqueeze(3) + self.transitions + emissions[i].view(batch_size, 1, 1, num_tags)
+
+            # Keep the k best (previous k, previous tag) candidates for every next tag
+            # shape: (batch_size, nbest, num_tags)
+            next_score, indices = next_score.view(batch_size, nbest * num_tags, num_tags).topk(nbest, dim=1)
+
+            # Masked timesteps keep the score and point back to themselves
+            is_valid = mask[i].view(batch_size, 1, 1).bool()
+            score = torch.where(is_valid, next_score, score)
+            history.append(torch.where(is_valid, indices, identity))
+
+        # End transition score
+        # shape: (batch_size, nbest * num_tags)
+        score = (score + self.end_transitions).view(batch_size, nbest * num_tags)
+        # shape: (batch_size, nbest)
+        best_scores, best_indices = score.topk(nbest, dim=1)
+
+        # Trace back all the paths of all the samples at once
+        # shape: (seq_length, batch_size, nbest)
+        best_tags = emissions.new_zeros((seq_length, batch_size, nbest), dtype=torch.long)
+        best_tags[-1] = best_indices % num_tags
+        for i in range(seq_length - 1, 0, -1):
+            best_indices = history[i - 1].view(batch_size, nbest * num_tags).gather(1, best_indices)
+            best_tags[i - 1] = best_indices % num_tags
+
+        # Positions after the last valid timestep repeat its tag; pad them with 0
+        best_tags = best_tags * mask.unsqueeze(2).long()
+        # shape: (batch_size, nbest, seq_length)
+        return best_tags.permute(1, 2, 0), best_scores
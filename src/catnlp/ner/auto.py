@@ -1,20 +1,113 @@
 # -*- coding:utf-8 -*-
 
+import multiprocessing
+import os
+from functools import partial
+
 import optuna
 
-from .auto_plm import objective
+from .auto_plm import get_search_space, load_datasets, objective
 
 
 class NerAuto:
-    def __init__(self, n_trials):
+    """
+    超参数搜索
+    Args:
+        config(dict): 训练配置，搜索相关的配置在auto下
+            study_name(str): study名
+            storage(str): 存储，如sqlite:///auto.db，多进程搜索时必须配置
+            pruner(dict): {name: median|hyperband|none, ...}，其余参数传给对应的pruner
+            n_trials(int): trial总数
+            n_jobs(int): 每个进程内并发的trial数，只支持1：trial会设置全局随机种子、Accelerator和日志，
+                同一进程内的线程互相干扰，结果不可复现，并行搜索请用workers
+            workers(int): 进程数
+            gpus(list): 每个进程使用的GPU，按进程编号轮流分配
+            search_space(dict): 搜索空间，见auto_plm.suggest_params
+        n_trials(int): trial总数，覆盖配置
+    """
+    def __init__(self, config, n_trials=None):
         print("start auto")
-        study = optuna.create_study(direction="maximize")
-        study.optimize(objective, n_trials=n_trials)
+        auto_config = config.get("auto") or dict()
+        if n_trials is None:
+            n_trials = auto_config.get("n_trials", 20)
+        study_name = auto_config.get("study_name", config.get("name"))
+        storage = auto_config.get("storage")
+        n_jobs = auto_config.get("n_jobs", 1)
+        workers = auto_config.get("workers", 1)
+        gpus = auto_config.get("gpus")
+        search_space = get_search_space(config)
+        if n_jobs != 1:
+            raise ValueError(f"auto.n_jobs只支持1(当前为{n_jobs})：同一进程内并发的trial会互相重置全局随机种子，"
+                             f"并行搜索请配置auto.workers和auto.storage使用多进程")
+        if workers > 1 and not storage:
+            raise ValueError("多进程搜索需要配置auto.storage，如sqlite:///auto.db")
+
+        study = optuna.create_study(
+            study_name=study_name,
+            storage=storage,
+            direction="maximize",
+            pruner=get_pruner(auto_config.get("pruner")),
+            load_if_exists=True
+        )
+        # fork前加载好数据集，子进程共享缓存，不再重复分词
+        load_datasets(config)
+        if workers > 1:
+            context = multiprocessing.get_context("fork")
+            processes = list()
+            for rank in range(workers):
+                worker_trials = n_trials // workers + int(rank < n_trials % workers)
+                process = context.Process(
+                    target=run_worker,
+                    args=(config, search_space, study_name, storage, worker_trials, n_jobs, gpus, rank)
+                )
+                process.start()
+                processes.append(process)
+            for process in processes:
+                process.join()
+            study = optuna.load_study(study_name=study_name, storage=storage,
+                                      pruner=get_pruner(auto_config.get("pruner")))
+        else:
+            study.optimize(partial(objective, config=config, search_space=search_space),
+                           n_trials=n_trials, n_jobs=n_jobs)
 
+        pruned_trials = study.get_trials(deepcopy=False, states=[optuna.trial.TrialState.PRUNED])
         print("Number of finished trials: ", len(study.trials))
+        print("Number of pruned trials: ", len(pruned_trials))
         print("Best trial:")
         trial = study.best_trial
         print("  Value: ", trial.value)
         print("  Params: ")
         for key, value in trial.params.items():
             print("    {}: {}".format(key, value))
+
+
+def get_pruner(pruner_config):
+    """
+    获得pruner
+    Args:
+        pruner_config(dict): {name: median|hyperband|none, ...}，默认median
+    Returns:
+        pruner(BasePruner): pruner
+    """
+    pruner_config = dict(pruner_config or dict())
+    name = pruner_config.pop("name", "median")
+    if name == "median":
+        return optuna.pruners.MedianPruner(**pruner_config)
+    elif name == "hyperband":
+        return optuna.pruners.HyperbandPruner(**pruner_config)
+    elif name == "none":
+        return optuna.pruners.NopPruner()
+    else:
+        raise ValueError(f"无效pruner：{name}")
+
+
+def run_worker(config, search_space, study_name, storage, n_trials, n_jobs, gpus, rank):
+    """
+    子进程：从共享存储加载study并执行trial
+    """
+    if gpus:
+        os.environ["CUDA_VISIBLE_DEVICES"] = str(gpus[rank % len(gpus)])
+    auto_config = config.get("auto") or dict()
+    study = optuna.load_study(study_name=study_name, storage=storage,
+                              pruner=get_pruner(auto_config.get("pruner")))
+    study.optimize(partial(objective, config=config, search_space=search_space), n_trials=n_trials, n_jobs=n_jobs)
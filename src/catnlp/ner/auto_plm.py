@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 
+import contextlib
 import logging
 import math
 import os
+import threading
 from pathlib import Path
 
+import optuna
 import torch
 from tqdm.auto import tqdm
 import transformers
@@ -23,15 +26,105 @@ from .util.data import NerBertDataset, NerBertDataLoader
 from .util.split import recover
 from .util.score import get_f1
 from .util.decode import get_labels
-from ..common.load_file import load_config_file
+from .util.distributed import gather_for_eval
 
 
-config_file = "resources/config/ner/bert_biaffine.yaml"
-config = load_config_file(config_file)
+# 未配置search_space时使用的搜索空间
+DEFAULT_SEARCH_SPACE = {
+    "seed": {"type": "categorical", "choices": [31, 42, 100]},
+    "plm_lr": {"type": "float", "low": 1e-5, "high": 1e-4, "log": True},
+    "not_plm_lr": {"type": "float", "low": 5e-5, "high": 1e-2, "log": True},
+    "num_train_epochs": {"type": "int", "low": 3, "high": 20}
+}
 
+# 进程内共享的数据集缓存，多个trial不再重复分词
+_dataset_cache = dict()
+_dataset_lock = threading.Lock()
 
-def objective(trial):
+
+def suggest_params(trial, search_space):
+    """
+    根据搜索空间采样超参数
+    Args:
+        trial(Trial): optuna trial
+        search_space(dict): 参数名 - {type: categorical|int|float, choices/low/high/log/step}
+    Returns:
+        params(dict): 参数名 - 取值
+    """
+    params = dict()
+    for name, space in search_space.items():
+        space_type = space.get("type", "float")
+        if space_type == "categorical":
+            params[name] = trial.suggest_categorical(name, space["choices"])
+        elif space_type == "int":
+            params[name] = trial.suggest_int(name, int(space["low"]), int(space["high"]),
+                                             step=int(space.get("step", 1)), log=space.get("log", False))
+        elif space_type == "float":
+            # yaml会把1e-5这样的写法读成字符串
+            step = space.get("step")
+            params[name] = trial.suggest_float(name, float(space["low"]), float(space["high"]),
+                                               step=float(step) if step is not None else None,
+                                               log=space.get("log", False))
+        else:
+            raise ValueError(f"无效搜索空间类型：{name}: {space_type}")
+    return params
+
+
+def load_datasets(config):
+    """
+    加载分词器和训练、验证集，按文件和分词参数缓存在进程内
+    Args:
+        config(dict): 训练配置
+    Returns:
+        tokenizer(Tokenizer): 分词器
+        train_dataset(NerBertDataset): 训练集
+        dev_dataset(NerBertDataset): 验证集
+    """
+    file_format = config.get("file_format")
+    input_dir = Path(config.get("input"))
+    if file_format in ["bio", "bies", "conll"]:
+        train_file = input_dir / "train.txt"
+        dev_file = input_dir / "dev.txt"
+    elif file_format == "arrow":
+        train_file = input_dir / "train.arrow"
+        dev_file = input_dir / "dev.arrow"
+    else:
+        train_file = input_dir / "train.json"
+        dev_file = input_dir / "dev.json"
+    key = (str(train_file), str(dev_file), config.get("model_path"), config.get("max_length"),
+           file_format, config.get("do_lower_case"))
+    with _dataset_lock:
+        if key not in _dataset_cache:
+            tokenizer = AutoTokenizer.from_pretrained(config.get("model_path"), use_fast=True)
+            train_dataset = NerBertDataset(train_file, tokenizer, config.get("max_length"), file_format=file_format, do_lower=config.get("do_lower_case"))
+            dev_dataset = NerBertDataset(dev_file, tokenizer, config.get("max_length"), file_format=file_format, do_lower=config.get("do_lower_case"))
+            _dataset_cache[key] = (tokenizer, train_dataset, dev_dataset)
+    return _dataset_cache[key]
+
+
+def get_search_space(config):
+    """
+    获得搜索空间，未配置auto.search_space时使用DEFAULT_SEARCH_SPACE
+    """
+    auto_config = config.get("auto") or dict()
+    return auto_config.get("search_space") or DEFAULT_SEARCH_SPACE
+
+
+def objective(trial, config, search_space=None):
+    """
+    一次trial：按采样的超参数训练，每轮验证后上报f1，供pruner提前终止
+    Args:
+        trial(Trial): optuna trial
+        config(dict): 训练配置
+        search_space(dict): 搜索空间，为None时从config中获取
+    Returns:
+        best_f1(float): 验证集最好的f1
+    """
     logger = logging.getLogger(__name__)
+    if search_space is None:
+        search_space = get_search_space(config)
+    config = dict(config)
+    config.update(suggest_params(trial, search_space))
 
     # Initialize the accelerator. We will let the accelerator handle device placement for us in this example.
     accelerator = Accelerator(cpu=config["cpu"])
@@ -52,29 +145,11 @@ def objective(trial):
         transformers.utils.logging.set_verbosity_error()
 
     # If passed along, set the training seed now.
-    seed = trial.suggest_categorical("seed", [31, 42, 100])
-    set_seed(seed)
+    if config.get("seed") is not None:
+        set_seed(config.get("seed"))
 
-    # Get the datasets: you can either provide your own CSV/JSON/TXT training and evaluation files (see below)
-    # or just provide the name of one of the public datasets for token classification task available on the hub at https://huggingface.co/datasets/
-    # (the dataset will be downloaded automatically from the datasets Hub).
-    #
-    # For CSV/JSON files, this script will use the column called 'tokens' or the first column if no column called
-    # 'tokens' is found. You can easily tweak this behavior (see below).
-    #
-    # In distributed training, the load_dataset function guarantee that only one local process can concurrently
-    # download the dataset.
     file_format = config.get("file_format")
-    input_dir = Path(config.get("input"))
-    if file_format in ["bio", "bies", "conll"]:
-        train_file = input_dir / "train.txt"
-        dev_file = input_dir / "dev.txt"
-    else:
-        train_file = input_dir / "train.json"
-        dev_file = input_dir / "dev.json"
-    tokenizer = AutoTokenizer.from_pretrained(config.get("model_path"), use_fast=True)
-    train_dataset = NerBertDataset(train_file, tokenizer, config.get("max_length"), file_format=file_format, do_lower=config.get("do_lower_case"))
-    dev_dataset = NerBertDataset(dev_file, tokenizer, config.get("max_length"), file_format=file_format, do_lower=config.get("do_lower_case"))
+    tokenizer, train_dataset, dev_dataset = load_datasets(config)
     if file_format == "split":
         dev_contents = dev_dataset.get_contents()
         dev_offset_lists = dev_dataset.get_offset_lists()
@@ -109,6 +184,7 @@ def objective(trial):
     else:
         raise ValueError
     pretrained_config.loss_name = config.get("loss_name")
+    pretrained_config.max_span_len = config.get("max_span_len")
     model = model_func.from_pretrained(
         config.get("model_path"),
         config=pretrained_config
@@ -126,8 +202,8 @@ def objective(trial):
     no_decay = ["bias", "LayerNorm.weight", "LayerNorm.bias"]
     weight_decay = config.get("weight_decay")
     model_type = config.get("model_type")
-    plm_lr = trial.suggest_loguniform("plm_lr", 1e-5, 1e-4)
-    not_plm_lr = trial.suggest_loguniform("not_plm_lr", 5e-5, 1e-2)
+    plm_lr = float(config.get("plm_lr"))
+    not_plm_lr = float(config.get("not_plm_lr"))
     optimizer_grouped_parameters = [
         {
             "params": [p for n, p in model.named_parameters() if not any(nd in n for nd in no_decay) and model_type not in n],
@@ -165,8 +241,9 @@ def objective(trial):
     # shorter in multiprocess)
 
     # Scheduler and math around the number of training steps.
-    num_train_epochs = trial.suggest_int("num_train_epochs", 3, 20)
-    num_update_steps_per_epoch = math.ceil(len(train_dataloader) / config.get("gradient_accumulation_steps"))
+    num_train_epochs = config.get("num_train_epochs")
+    gradient_accumulation_steps = config.get("gradient_accumulation_steps")
+    num_update_steps_per_epoch = math.ceil(len(train_dataloader) / gradient_accumulation_steps)
     config["max_train_steps"] = num_train_epochs * num_update_steps_per_epoch
 
     lr_scheduler = get_scheduler(
@@ -194,12 +271,18 @@ def objective(trial):
     for epoch in range(num_train_epochs):
         model.train()
         for step, batch in enumerate(train_dataloader):
-            inputs = {"input_ids": batch[0], "attention_mask": batch[1], "labels": batch[3], "label_mask": batch[4], "input_len": batch[5]}
-            outputs = model(**inputs)
-            loss = outputs
-            loss = loss / config.get("gradient_accumulation_steps")
-            accelerator.backward(loss)
-            if step % config.get("gradient_accumulation_steps") == 0 or step == len(train_dataloader) - 1:
+            is_update_step = (step + 1) % gradient_accumulation_steps == 0 or step == len(train_dataloader) - 1
+            if is_update_step or not hasattr(model, "no_sync"):
+                sync_context = contextlib.nullcontext()
+            else:
+                sync_context = model.no_sync()
+            with sync_context:
+                inputs = {"input_ids": batch[0], "attention_mask": batch[1], "labels": batch[3], "label_mask": batch[4], "input_len": batch[5]}
+                outputs = model(**inputs)
+                loss = outputs
+                loss = loss / gradient_accumulation_steps
+                accelerator.backward(loss)
+            if is_update_step:
                 optimizer.step()
                 lr_scheduler.step()
                 optimizer.zero_grad()
@@ -214,14 +297,16 @@ def objective(trial):
         decode_type = config.get("decode_type")
         pred_lists = list()
         gold_lists = list()
+        samples_seen = 0
         for step, batch in enumerate(dev_dataloader):
             with torch.no_grad():
                 inputs = {"input_ids": batch[0], "attention_mask": batch[1], "label_mask": batch[4], "input_len": batch[5]}
                 outputs = model(**inputs)
             labels = batch[3]
-            predictions_gathered = accelerator.gather(outputs)
-            labels_gathered = accelerator.gather(labels)
-            preds, golds = get_labels(predictions_gathered, labels_gathered, label_list, batch[5], decode_type=decode_type, device=device_type)
+            # 每个进程都需要f1作为搜索目标，gather后各自解码
+            (predictions_gathered, labels_gathered, input_len_gathered), samples_seen = gather_for_eval(
+                accelerator, [outputs, labels, batch[5]], samples_seen, len(dev_dataset))
+            preds, golds = get_labels(predictions_gathered, labels_gathered, label_list, input_len_gathered, decode_type=decode_type, device=device_type, max_span_len=config.get("max_span_len"))
             pred_lists += preds
             gold_lists += golds
         
@@ -245,5 +330,8 @@ def objective(trial):
             best_f1 = f1
             print(table)
             accelerator.wait_for_everyone()
+        trial.report(f1, epoch)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
     print(f"best f1: {best_f1}")
     return best_f1
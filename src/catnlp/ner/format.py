@@ -1,435 +1,569 @@
 # -*- coding: utf-8 -*-
 
-import json
 from collections import defaultdict
+from functools import partial
 
 import numpy as np
 
-from .util.clean import clean_text
-from .util.split import cut, recover
-from ..tool import visual
+from ..common import fast_json
+from .util.chunk import iter_blocks, iter_chunks, iter_lines, iter_records, map_chunks
+from .util.clean import clean_text, get_clean_table
+from .util.conflict import merge_entities
+from .util.split import cut
+from .util.stats import NerStats, compute_chunk_stats
 
 
 class NerFormat:
-    def convert(self, source, target, is_clean, format):
-        if format == "json2bio":
-            self._json2bio(source, target, is_clean)
-        elif format == "bio2json":
-            self._bio2json(source, target, is_clean)
-        elif format == "json2bies":
-            self._json2bies(source, target, is_clean)
-        elif format == "bies2json":
-            self._bies2json(source, target, is_clean)
-        elif format == "json2clue":
-            self._json2clue(source, target, is_clean)
-        elif format == "clue2json":
-            self._clue2json(source, target, is_clean)
-        elif format == "json2split":
-            self._json2split(source, target, is_clean)
-        elif format == "split2json":
-            self._split2json(source, target, is_clean)
-        elif format == "json2many":
-            self._json2many(source, target, is_clean)
-        else:
-            raise RuntimeError(f"无效格式：{format}")
-        print(f"{format}格式转换成功")
-
-    def _json2bio(self, source, target, is_clean=False):
-        """
-        json格式转bio格式
-        Args:
-            source(str): json格式的文件路径
-            target(str): bio格式的文件路径
-        Returns:
-            None
-        """
-        with open(source, 'r', encoding='utf-8') as sf, \
-                open(target, 'w', encoding='utf-8') as tf:
-            for line in sf:
-                line = json.loads(line)
-                if not line:
-                    continue
-                text = line['text']
-                if is_clean:
-                    text = clean_text(text)
-                entities = line['labels']
-                tag_list = ['O'] * len(text)
-                for entity in entities:
-                    start, end, tag = entity
-                    tag_list[start] = f"B-{tag}"
-                    for i in range(start + 1, end):
-                        tag_list[i] = f"I-{tag}"
-                for word, tag in zip(text, tag_list):
-                    tf.write(f"{word}\t{tag}\n")
-                tf.write("\n")
-
-
-    def _bio2json(self, source, target, is_clean=False):
+    """
+    数据格式转换：按记录切分为块，块在进程池中转换，结果按原顺序批量写入
+    json类格式每行一条记录，bio/bies格式以空行分隔记录，arrow格式为Arrow IPC文件
+    """
+    def convert(self, source, target, is_clean, format, workers=1, chunk_size=1000, clean_mapping=None):
         """
-        bio格式转json格式
+        格式转换
         Args:
-            source(str): bio格式的文件路径
-            target(str): json格式的文件路径
+            source(str): 源文件路径
+            target(str): 目标文件路径
+            is_clean(bool): 是否清理文本
+            format(str): 转换类型
+            workers(int): 进程数，为1时在当前进程中转换
+            chunk_size(int): 每块的记录数
+            clean_mapping(dict|str): 清理时追加的单字符映射{原字符: 新字符}，或yaml文件路径
         Returns:
             None
         """
-        with open(source, 'r', encoding='utf-8') as sf, \
-                open(target, 'w', encoding='utf-8') as tf:
-            word_list = []
-            entities = []
-            pre_o = True
-            idx = 0
-            for line in sf:
-                line = line.rstrip()
-                if line:
-                    word, tag = line.split("\t")
-                    word_list.append(word)
-                    if tag != "O":
-                        prefix, tname = tag.split("-")
-                        if prefix == "B":
-                            entities.append([idx, idx + 1, tname])
-                        elif prefix == "I":
-                            if pre_o or \
-                                    (entities and entities[-1][-1] != tname):
-                                entities.append([idx, idx + 1, tname])
-                            else:
-                                entities[-1][1] += 1
-                        else:
-                            print(f"error line: {line}")
-                            exit(1)
-                        pre_o = False
-                    else:
-                        pre_o = True
-                    idx += 1
-                elif entities:
-                    text = "".join(word_list)
-                    if is_clean:
-                        text = clean_text(text)
-                    tf.write(json.dumps({
-                        "text": text,
-                        "labels": entities
-                    }, ensure_ascii=False) + "\n")
-                    word_list = []
-                    entities = []
-                    pre_o = True
-                    idx = 0
-
-
-    def _json2bies(self, source, target, is_clean=False):
-        """
-        json格式转bies格式
-        Args:
-            source(str): json格式的文件路径
-            target(str): bies格式的文件路径
-        Returns:
-            None
-        """
-        with open(source, 'r', encoding='utf-8') as sf, \
-                open(target, 'w', encoding='utf-8') as tf:
-            for line in sf:
-                line = json.loads(line)
-                if not line:
-                    continue
-                text = line['text']
-                if is_clean:
-                    text = clean_text(text)
-                entities = line['labels']
-                tag_list = ['O'] * len(text)
-                for entity in entities:
-                    start, end, tag = entity
-                    if start + 1 == end:
-                        tag_list[start] = f"S-{tag}"
-                        continue
-                    else:
-                        tag_list[start] = f"B-{tag}"
-                    for i in range(start + 1, end - 1):
-                        tag_list[i] = f"I-{tag}"
-                    tag_list[end - 1] = f"E-{tag}"
-                for word, tag in zip(text, tag_list):
-                    tf.write(f"{word}\t{tag}\n")
-                tf.write("\n")
-
-
-    def _bies2json(self, source, target, is_clean=False):
-        """
-        bies格式转json格式
-        Args:
-            source(str): bies格式的文件路径
-            target(str): json格式的文件路径
-        Returns:
-            None
-        """
-        with open(source, 'r', encoding='utf-8') as sf, \
-                open(target, 'w', encoding='utf-8') as tf:
-            word_list = []
-            entities = []
-            pre_o = True
-            idx = 0
-            for line in sf:
-                line = line.rstrip()
-                if line:
-                    word, tag = line.split("\t")
-                    word_list.append(word)
-                    if tag != "O":
-                        prefix, tname = tag.split("-")
-                        if prefix in ["B", "S"]:
-                            entities.append([idx, idx + 1, tname])
-                        elif prefix in ["I", "E"]:
-                            if pre_o or \
-                                    (entities and entities[-1][-1] != tname):
-                                entities.append([idx, idx + 1, tname])
-                            else:
-                                entities[-1][1] += 1
-                        else:
-                            print(f"error line: {line}")
-                            exit(1)
-                        pre_o = False
-                    else:
-                        pre_o = True
-                    idx += 1
-                elif entities:
-                    text = "".join(word_list)
-                    if is_clean:
-                        text = clean_text(text)
-                    tf.write(json.dumps({
-                        "text": text,
-                        "labels": entities
-                    }, ensure_ascii=False) + "\n")
-                    word_list = []
-                    entities = []
-                    pre_o = True
-                    idx = 0
-
-
-    def _clue2json(self, source, target, is_clean=False):
-        """
-        clue格式转json格式
-        Args:
-            source(str): clue格式的文件路径
-            target(str): json格式的文件路径
-        Returns:
-            None
-        """
-        with open(source, 'r', encoding='utf-8') as sf, \
-                open(target, 'w', encoding='utf-8') as tf:
-            for line in sf:
-                line = json.loads(line)
-                if not line:
-                    continue
-                text = line['text']
-                if is_clean:
-                    text = clean_text(text)
-                entities = line['label']
-                entity_list = []
-                for tag in entities:
-                    for item in entities[tag]:
-                        pos_list = entities[tag][item]
-                        for pos in pos_list:
-                            pos[-1] += 1
-                            pos.append(tag)
-                            entity_list.append(pos)
-                tf.write(json.dumps({
-                    "text": text,
-                    "labels": entity_list
-                }, ensure_ascii=False) + "\n")
-
+        clean_table = get_clean_table(clean_mapping) if is_clean else None
+        if format in CONVERTERS:
+            record_type, convert_record = CONVERTERS[format]
+            convert_record = partial(convert_record, is_clean=is_clean, clean_table=clean_table)
+            with open(source, "r", encoding="utf-8") as sf, \
+                    open(target, "w", encoding="utf-8", buffering=1 << 20) as tf:
+                chunks = iter_chunks(iter_records(sf, record_type), chunk_size)
+                for output in map_chunks(partial(convert_chunk, convert_record), chunks, workers):
+                    tf.write(output)
+        elif format in ARROW_CONVERTERS:
+            record_type, convert_record = ARROW_CONVERTERS[format]
+            convert_record = partial(convert_record, is_clean=is_clean, clean_table=clean_table)
+            self._to_arrow(source, target, record_type, convert_record, workers, chunk_size)
+        elif format == "arrow2json":
+            self._arrow2json(source, target, is_clean, clean_table)
+        else:
+            raise RuntimeError(f"无效格式：{format}")
+        print(f"{format}格式转换成功")
 
-    def _json2clue(self, source, target, is_clean=False):
+    def _to_arrow(self, source, target, record_type, convert_record, workers=1, chunk_size=1000):
         """
-        json格式转clue格式
+        文本格式转arrow格式，每块写为一个RecordBatch
         Args:
-            source(str): json格式的文件路径
-            target(str): clue格式的文件路径
+            source(str): 源文件路径
+            target(str): arrow格式的文件路径
+            record_type(str): line|block
+            convert_record(callable): 单条记录转为(text, entities, offsets)
         Returns:
             None
         """
-        with open(source, 'r', encoding='utf-8') as sf, \
-                open(target, 'w', encoding='utf-8') as tf:
-            for line in sf:
-                line = json.loads(line)
-                if not line:
-                    continue
-                text = line['text']
-                if is_clean:
-                    text = clean_text(text)
-                entities = line['label']
-                entity_dict = {}
-                for entity in entities:
-                    start, end, tag = entity
-                    word = text[start: end + 1]
-                    if tag not in entity_dict:
-                        entity_dict[tag] = {
-                            word: [[start, end]]
-                        }
-                    else:
-                        if word not in entity_dict[tag]:
-                            entity_dict[tag][word] = [[start, end]]
-                        else:
-                            entity_dict[tag][word].append([start, end])
-
-                tf.write(json.dumps({
-                    'text': text,
-                    'label': entity_dict
-                }, ensure_ascii=False) + '\n')
-    
-    def _split2json(self, source, target, is_clean=False):
+        from .util.arrow import ArrowWriter
+
+        with open(source, "r", encoding="utf-8") as sf:
+            chunks = iter_chunks(iter_records(sf, record_type), chunk_size)
+            outputs = map_chunks(partial(convert_chunk_list, convert_record), chunks, workers)
+            first_records = next(outputs, list())
+            # 第一块中有offsets时写入offsets列，之后的块有offsets而第一块没有时报错
+            with_offsets = any(offsets is not None for _, _, offsets in first_records)
+            with ArrowWriter(target, with_offsets) as writer:
+                writer.write(first_records)
+                for records in outputs:
+                    writer.write(records)
+
+    def _arrow2json(self, source, target, is_clean=False, clean_table=None):
         """
-        split格式转json格式
+        arrow格式转json格式，输出始终为{"text", "labels"}：split格式转换来的表中
+        labels已经是整段文本上的实体，offsets不再输出
         Args:
-            source(str): split格式的文件路径
+            source(str): arrow格式的文件路径
             target(str): json格式的文件路径
         Returns:
             None
         """
-        with open(source, 'r', encoding='utf-8') as sf, \
-                open(target, 'w', encoding='utf-8') as tf:
-            for line in sf:
-                line = json.loads(line)
-                if not line:
-                    continue
-                text = line['text']
-                sent_list = line['sents']
-                tag_lists = line['labels']
-                offset_list = line['offsets']
-                if is_clean:
-                    text = clean_text(text)
-                
-                entity_list = recover(tag_lists, offset_list)
+        from .util.arrow import iter_arrow_records, load_arrow_table
 
-                tf.write(json.dumps({
+        table = load_arrow_table(source)
+        with open(target, "w", encoding="utf-8", buffering=1 << 20) as tf:
+            for text, entities, _ in iter_arrow_records(table):
+                if is_clean:
+                    text = clean_text(text, clean_table)
+                record = {
                     "text": text,
-                    "labels": entity_list
-                }, ensure_ascii=False) + "\n")
+                    "labels": entities
+                }
+                tf.write(fast_json.dumps(record) + "\n")
+
+
+def convert_chunk(convert_record, chunk):
+    """
+    转换一块记录，返回拼接后的输出
+    """
+    return "".join([convert_record(record) for record in chunk])
+
+
+def convert_chunk_list(convert_record, chunk):
+    """
+    转换一块记录，返回结果列表，跳过空记录
+    """
+    return [output for output in map(convert_record, chunk) if output is not None]
+
+
+def get_conll_output(text, tag_list):
+    lines = [f"{word}\t{tag}\n" for word, tag in zip(text, tag_list)]
+    lines.append("\n")
+    return "".join(lines)
+
+
+def get_tag_entities(block, prefixes_begin, prefixes_inside, delimiter="\t"):
+    """
+    从conll格式的一条记录中解析实体
+    Args:
+        block(list): 行列表，每行为word{delimiter}tag
+        prefixes_begin(tuple): 实体开始的前缀
+        prefixes_inside(tuple): 实体中间和结尾的前缀
+        delimiter(str): 字和标签的分隔符
+    Returns:
+        text(str): 文本
+        entities(list): [[start, end, tag], ...]
+    """
+    word_list = list()
+    entities = list()
+    pre_o = True
+    for idx, line in enumerate(block):
+        word, tag = line.split(delimiter)
+        word_list.append(word)
+        if tag != "O":
+            prefix, tname = tag.split("-")
+            if prefix in prefixes_begin:
+                entities.append([idx, idx + 1, tname])
+            elif prefix in prefixes_inside:
+                if pre_o or \
+                        (entities and entities[-1][-1] != tname):
+                    entities.append([idx, idx + 1, tname])
+                else:
+                    entities[-1][1] += 1
+            else:
+                raise ValueError(f"错误标签：{line}")
+            pre_o = False
+        else:
+            pre_o = True
+    return "".join(word_list), entities
+
+
+def json2bio(line, is_clean=False, clean_table=None):
+    """
+    json格式转bio格式
+    Args:
+        line(str): json格式的一行
+        is_clean(bool): 是否清理文本
+        clean_table(dict): 清理用的转换表，默认为全角转半角和空白归一化
+    Returns:
+        output(str): bio格式的一条记录
+    """
+    line = fast_json.loads(line)
+    if not line:
+        return ""
+    text = line['text']
+    if is_clean:
+        text = clean_text(text, clean_table)
+    entities = line['labels']
+    tag_list = ['O'] * len(text)
+    for entity in entities:
+        start, end, tag = entity
+        tag_list[start] = f"B-{tag}"
+        for i in range(start + 1, end):
+            tag_list[i] = f"I-{tag}"
+    return get_conll_output(text, tag_list)
+
+
+def bio2json(block, is_clean=False, clean_table=None):
+    """
+    bio格式转json格式
+    Args:
+        block(list): bio格式的一条记录
+        is_clean(bool): 是否清理文本
+        clean_table(dict): 清理用的转换表，默认为全角转半角和空白归一化
+    Returns:
+        output(str): json格式的一行
+    """
+    text, entities = get_tag_entities(block, ("B",), ("I",))
+    if is_clean:
+        text = clean_text(text, clean_table)
+    return fast_json.dumps({
+        "text": text,
+        "labels": entities
+    }) + "\n"
+
+
+def json2bies(line, is_clean=False, clean_table=None):
+    """
+    json格式转bies格式
+    Args:
+        line(str): json格式的一行
+        is_clean(bool): 是否清理文本
+        clean_table(dict): 清理用的转换表，默认为全角转半角和空白归一化
+    Returns:
+        output(str): bies格式的一条记录
+    """
+    line = fast_json.loads(line)
+    if not line:
+        return ""
+    text = line['text']
+    if is_clean:
+        text = clean_text(text, clean_table)
+    entities = line['labels']
+    tag_list = ['O'] * len(text)
+    for entity in entities:
+        start, end, tag = entity
+        if start + 1 == end:
+            tag_list[start] = f"S-{tag}"
+            continue
+        else:
+            tag_list[start] = f"B-{tag}"
+        for i in range(start + 1, end - 1):
+            tag_list[i] = f"I-{tag}"
+        tag_list[end - 1] = f"E-{tag}"
+    return get_conll_output(text, tag_list)
+
+
+def bies2json(block, is_clean=False, clean_table=None):
+    """
+    bies格式转json格式
+    Args:
+        block(list): bies格式的一条记录
+        is_clean(bool): 是否清理文本
+        clean_table(dict): 清理用的转换表，默认为全角转半角和空白归一化
+    Returns:
+        output(str): json格式的一行
+    """
+    text, entities = get_tag_entities(block, ("B", "S"), ("I", "E"))
+    if is_clean:
+        text = clean_text(text, clean_table)
+    return fast_json.dumps({
+        "text": text,
+        "labels": entities
+    }) + "\n"
+
+
+def clue2json(line, is_clean=False, clean_table=None):
+    """
+    clue格式转json格式
+    Args:
+        line(str): clue格式的一行
+        is_clean(bool): 是否清理文本
+        clean_table(dict): 清理用的转换表，默认为全角转半角和空白归一化
+    Returns:
+        output(str): json格式的一行
+    """
+    line = fast_json.loads(line)
+    if not line:
+        return ""
+    text = line['text']
+    if is_clean:
+        text = clean_text(text, clean_table)
+    entities = line['label']
+    entity_list = []
+    for tag in entities:
+        for item in entities[tag]:
+            pos_list = entities[tag][item]
+            for pos in pos_list:
+                pos[-1] += 1
+                pos.append(tag)
+                entity_list.append(pos)
+    return fast_json.dumps({
+        "text": text,
+        "labels": entity_list
+    }) + "\n"
+
+
+def json2clue(line, is_clean=False, clean_table=None):
+    """
+    json格式转clue格式，clue格式的结束位置包含在实体内
+    Args:
+        line(str): json格式的一行
+        is_clean(bool): 是否清理文本
+        clean_table(dict): 清理用的转换表，默认为全角转半角和空白归一化
+    Returns:
+        output(str): clue格式的一行
+    """
+    line = fast_json.loads(line)
+    if not line:
+        return ""
+    text = line['text']
+    if is_clean:
+        text = clean_text(text, clean_table)
+    entities = line['labels']
+    entity_dict = {}
+    for entity in entities:
+        start, end, tag = entity
+        word = text[start: end]
+        if tag not in entity_dict:
+            entity_dict[tag] = {
+                word: [[start, end - 1]]
+            }
+        else:
+            if word not in entity_dict[tag]:
+                entity_dict[tag][word] = [[start, end - 1]]
+            else:
+                entity_dict[tag][word].append([start, end - 1])
+    return fast_json.dumps({
+        'text': text,
+        'label': entity_dict
+    }) + '\n'
+
+
+def get_split_entities(line):
+    """
+    split格式中各片段的实体加上偏移后去重
+    Args:
+        line(dict): split格式的一条记录
+    Returns:
+        entity_list(list): 按起始位置排序的实体列表
+    """
+    entity_list = list()
+    for entities, offset in zip(line['label_lists'], line['offsets']):
+        for start, end, tag in entities:
+            entity_list.append([start + offset, end + offset, tag])
+    entity_list = merge_entities(entity_list)
+    entity_list.sort(key=lambda x: x[0])
+    return entity_list
+
+
+def split2json(line, is_clean=False, clean_table=None):
+    """
+    split格式转json格式，各片段的实体加上偏移后去重
+    Args:
+        line(str): split格式的一行
+        is_clean(bool): 是否清理文本
+        clean_table(dict): 清理用的转换表，默认为全角转半角和空白归一化
+    Returns:
+        output(str): json格式的一行
+    """
+    line = fast_json.loads(line)
+    if not line:
+        return ""
+    text = line['text']
+    if is_clean:
+        text = clean_text(text, clean_table)
+    entity_list = get_split_entities(line)
+    return fast_json.dumps({
+        "text": text,
+        "labels": entity_list
+    }) + "\n"
+
+
+def json2split(line, is_clean=False, max_len=30, overlap_len=10, clean_table=None):
+    """
+    json格式转split格式
+    Args:
+        line(str): json格式的一行
+        is_clean(bool): 是否清理文本
+        max_len(int): 片段最大长度
+        overlap_len(int): 片段重叠长度
+        clean_table(dict): 清理用的转换表，默认为全角转半角和空白归一化
+    Returns:
+        output(str): split格式的一行
+    """
+    line = fast_json.loads(line)
+    if not line:
+        return ""
+    text = line['text']
+    if is_clean:
+        text = clean_text(text, clean_table)
+    tag_list = ["O"] * len(text)
+    entities = line['labels']
+    for entity in entities:
+        start, end, tag = entity
+        tag_list[start] = f"B-{tag}"
+        for i in range(start+1, end):
+            tag_list[i] = f"I-{tag}"
+
+    sent_list, entity_lists, offset_list = cut(text, tag_list, max_len, overlap_len)
+
+    return fast_json.dumps({
+        'text': text,
+        'sents': sent_list,
+        'label_lists': entity_lists,
+        'offsets': offset_list
+    }) + '\n'
+
+
+def json2many(line, is_clean=False, clean_table=None):
+    """
+    json格式转many格式，每个实体单独成为一条记录，之后是原记录
+    Args:
+        line(str): json格式的一行
+        is_clean(bool): 是否清理文本
+        clean_table(dict): 清理用的转换表，默认为全角转半角和空白归一化
+    Returns:
+        output(str): many格式的多行
+    """
+    line = fast_json.loads(line)
+    if not line:
+        return ""
+    text = line['text']
+    if is_clean:
+        text = clean_text(text, clean_table)
+    entities = line['labels']
+
+    output_list = list()
+    for entity in entities:
+        start, end, tag = entity
+        tmp_text = text[start: end]
+        tmp_end = end - start
+        output_list.append(fast_json.dumps({
+            "text": tmp_text,
+            "labels": [[0, tmp_end, tag]]
+        }) + "\n")
+    output_list.append(fast_json.dumps(line) + "\n")
+    return "".join(output_list)
+
+
+def json2arrow(line, is_clean=False, clean_table=None):
+    """
+    json格式的一行转为arrow记录，split格式的offsets会一起保存
+    Args:
+        line(str): json格式的一行
+        is_clean(bool): 是否清理文本
+        clean_table(dict): 清理用的转换表，默认为全角转半角和空白归一化
+    Returns:
+        record(tuple): (text, entities, offsets)
+    """
+    line = fast_json.loads(line)
+    if not line:
+        return None
+    text = line['text']
+    if is_clean:
+        text = clean_text(text, clean_table)
+    if 'labels' in line:
+        entities = line['labels']
+    else:
+        entities = get_split_entities(line)
+    return text, entities, line.get('offsets')
+
+
+def conll2arrow(block, is_clean=False, clean_table=None):
+    """
+    bio/bies格式的一条记录转为arrow记录
+    Args:
+        block(list): bio/bies格式的一条记录
+        is_clean(bool): 是否清理文本
+        clean_table(dict): 清理用的转换表，默认为全角转半角和空白归一化
+    Returns:
+        record(tuple): (text, entities, None)
+    """
+    text, entities = get_tag_entities(block, ("B", "S"), ("I", "E"))
+    if is_clean:
+        text = clean_text(text, clean_table)
+    return text, entities, None
+
+
+# 转换类型 - (记录类型, 单条记录的转换函数)
+CONVERTERS = {
+    "json2bio": ("line", json2bio),
+    "bio2json": ("block", bio2json),
+    "json2bies": ("line", json2bies),
+    "bies2json": ("block", bies2json),
+    "json2clue": ("line", json2clue),
+    "clue2json": ("line", clue2json),
+    "json2split": ("line", json2split),
+    "split2json": ("line", split2json),
+    "json2many": ("line", json2many)
+}
+
+
+def parse_json_record(line):
+    """
+    json格式的一行解析为统计用的记录，split格式的实体加上偏移
+    Args:
+        line(str): json格式的一行
+    Returns:
+        record(tuple): (text, entities, None)，没有文本时为None
+    """
+    line = fast_json.loads(line)
+    if not line or not line.get('text'):
+        return None
+    if 'labels' in line:
+        entities = line['labels']
+    elif 'label_lists' in line:
+        entities = get_split_entities(line)
+    else:
+        entities = list()
+    return line['text'], entities, None
+
+
+def parse_conll_record(block, delimiter="\t"):
+    """
+    conll格式的一条记录解析为统计用的记录
+    Args:
+        block(list): 行列表，每行为word{delimiter}tag
+        delimiter(str): 分隔符
+    Returns:
+        record(tuple): (text, entities, labels)
+    """
+    labels = [line.split(delimiter)[1] for line in block]
+    text, entities = get_tag_entities(block, ("B", "S"), ("I", "E"), delimiter)
+    return text, entities, labels
+
+
+class BaseFormat:
+    """
+    数据集统计的公共部分，单遍流式统计，不把整个数据集加载到内存
+    Args:
+        workers(int): 统计的进程数
+        chunk_size(int): 每个进程每次统计的记录数
+    """
+    def __init__(self, workers=1, chunk_size=10000):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._stats = None
+
+    def _compute_stats(self):
+        raise NotImplementedError
+
+    def _compute_file_stats(self, data_file, record_type, parse_record):
+        stats = NerStats()
+        with open(data_file, "r", encoding="utf-8") as df:
+            chunks = iter_chunks(iter_records(df, record_type), self.chunk_size)
+            for chunk_stats in map_chunks(partial(compute_chunk_stats, parse_record), chunks, self.workers):
+                stats.merge(chunk_stats)
+        return stats
 
-    def _json2split(self, source, target, is_clean=False, max_len=30, overlap_len=10):
-        """
-        json格式转split格式
-        Args:
-            source(str): json格式的文件路径
-            target(str): split格式的文件路径
-        Returns:
-            None
-        """
-        with open(source, 'r', encoding='utf-8') as sf, \
-                open(target, 'w', encoding='utf-8') as tf:
-            for line in sf:
-                line = json.loads(line)
-                if not line:
-                    continue
-                text = line['text']
-                if is_clean:
-                    text = clean_text(text)
-                tag_list = ["O"] * len(text)
-                entities = line['labels']
-                for entity in entities:
-                    start, end, tag = entity
-                    tag_list[start] = f"B-{tag}"
-                    for i in range(start+1, end):
-                        tag_list[i] = f"I-{tag}"
-                
-                sent_list, entity_lists, offset_list = cut(text, tag_list, max_len, overlap_len)
-
-                tf.write(json.dumps({
-                    'text': text,
-                    'sents': sent_list,
-                    'label_lists': entity_lists,
-                    'offsets': offset_list
-                }, ensure_ascii=False) + '\n')
-    
-    def _json2many(self, source, target, is_clean=False):
+    def get_stats(self):
         """
-        json格式转many格式
-        Args:
-            source(str): json格式的文件路径
-            target(str): many格式的文件路径
         Returns:
-            None
+            stats(NerStats): 数据集的统计，只计算一次
         """
-        with open(source, 'r', encoding='utf-8') as sf, \
-                open(target, 'w', encoding='utf-8') as tf:
-            for line in sf:
-                line = json.loads(line)
-                if not line:
-                    continue
-                text = line['text']
-                if is_clean:
-                    text = clean_text(text)
-                entities = line['labels']
-
-                for entity in entities:
-                    start, end, tag = entity
-                    tmp_text = text[start: end]
-                    tmp_end = end - start
-                    tf.write(json.dumps({
-                        "text": tmp_text,
-                        "labels": [[0, tmp_end, tag]]
-                    }, ensure_ascii=False) + "\n")
-                
-                tf.write(json.dumps(line, ensure_ascii=False) + "\n")          
-
-
-class JsonFormat:
-    def __init__(self, data_file) -> None:
-        self._data = self.load(data_file)
-
-    def load(self, data_file):
-        datas = list()
-        with open(data_file, "r", encoding="utf-8") as df:
-            for line in df:
-                line = json.loads(line)
-                if not line:
-                    continue
-                datas.append(line)
-        return datas
-
-    def get_text(self):
-        text_list = list()
-        for data in self._data:
-            text = data.get("text")
-            if text:
-                text_list.append(text)
-        return text_list
-
-    def get_text_len(self):
-        text_list = self.get_text()
-        return [len(text) for text in text_list]
-    
-    def get_label_dict(self):
-        label_dict = defaultdict(int)
-        for data in self._data:
-            labels = data.get("labels")
-            for label in labels:
-                _, _, tag = label
-                label_dict[tag] += 1
-        return label_dict
+        if self._stats is None:
+            self._stats = self._compute_stats()
+        return self._stats
 
     def size(self):
-        return len(self._data)
-    
+        return self.get_stats().count
+
     def statistics(self):
-        len_list = self.get_text_len()
-        len_array = np.array(sorted(len_list))
-        length = len_array.size
-        len_mean = np.mean(len_array)
-        len_std = np.std(len_array)
-        len_min = len_array[0]
-        len_50 = len_array[int(length * 0.5)]
-        len_70 = len_array[int(length * 0.7)]
-        len_90 = len_array[int(length * 0.9)]
-        len_max = len_array[-1]
-        print(f"count:\t{length}")
-        print(f"mean:\t{round(len_mean, 2)}")
-        print(f"std:\t{round(len_std, 2)}")
-        print(f"min:\t{len_min}")
-        print(f"50%:\t{round(len_50, 2)}")
-        print(f"70%:\t{round(len_70, 2)}")
-        print(f"90%:\t{round(len_90, 2)}")
-        print(f"max:\t{len_max}")
-    
+        stats = self.get_stats()
+        summary = stats.summary()
+        for key, value in summary["text_len"].items():
+            print(f"{key}:\t{value}")
+        print("entity len:")
+        for key, value in summary["entity_len"].items():
+            print(f"  {key}:\t{value}")
+        print(f"nested:\t{summary['nested']}")
+        print(f"overlap:\t{summary['overlap']}")
+        return summary
+
     def draw_histogram(self, num_bins=100, density=False):
-        len_list = self.get_text_len()
-        len_list = np.array(len_list)
-        visual.draw_histogram(len_list, num_bins=num_bins, density=density)
+        len_items = self.get_stats().text_len_hist.items()
+        len_list = np.array([item[0] for item in len_items])
+        count_list = np.array([item[1] for item in len_items])
+        from ..tool import visual
+        visual.draw_histogram(len_list, num_bins=num_bins, density=density, weights=count_list)
 
     def draw_hbar(self):
         label_dict = self.get_label_dict()
@@ -437,83 +571,104 @@ class JsonFormat:
         label_list = sorted(label_list, key=lambda i: i[1], reverse=True)
         labels = [i[0] for i in label_list]
         datas = [i[1] for i in label_list]
+        from ..tool import visual
         visual.draw_hbar(labels, datas)
 
 
-class ConllFormat:
-    def __init__(self, data_file, delimiter) -> None:
-        self._data = self.load(data_file, delimiter)
+class JsonFormat(BaseFormat):
+    """
+    json格式数据集的统计，文件后缀为.arrow时按arrow格式内存映射加载，统计直接在列上进行
+    Args:
+        data_file(str): 文件路径
+        workers(int): 统计的进程数
+        chunk_size(int): 每个进程每次统计的记录数
+    """
+    def __init__(self, data_file, workers=1, chunk_size=10000) -> None:
+        super().__init__(workers, chunk_size)
+        self._data_file = data_file
+        self._table = None
+        if str(data_file).endswith(".arrow"):
+            from .util.arrow import load_arrow_table
+            self._table = load_arrow_table(data_file)
+
+    def _compute_stats(self):
+        if self._table is None:
+            return self._compute_file_stats(self._data_file, "line", parse_json_record)
+        from .util.arrow import iter_arrow_records
+        stats = NerStats()
+        for text, entities, _ in iter_arrow_records(self._table):
+            if text:
+                stats.update(text, entities)
+        return stats
 
-    def load(self, data_file, delimiter):
-        datas = list()
-        words = list()
-        labels = list()
-        with open(data_file, "r", encoding="utf-8") as df:
-            for line in df:
-                line = line.rstrip()
-                if not line:
-                    if words:
-                        datas.append(("".join(words), labels))
-                        words = list()
-                        labels = list()
-                else:
-                    word, label = line.split(delimiter)
-                    words.append(word)
-                    labels.append(label)
-        return datas
+    def get_text(self):
+        if self._table is not None:
+            return [text for text in self._table.column("text").to_pylist() if text]
+        return list(self._iter_text())
+
+    def _iter_text(self):
+        """
+        逐行读取文件中的非空文本
+        """
+        with open(self._data_file, "r", encoding="utf-8") as df:
+            for line in iter_lines(df):
+                record = parse_json_record(line)
+                if record is not None:
+                    yield record[0]
+
+    def get_text_len(self):
+        if self._table is not None:
+            import pyarrow.compute as pc
+            len_list = pc.utf8_length(self._table.column("text")).to_pylist()
+            return [text_len for text_len in len_list if text_len]
+        return [len(text) for text in self._iter_text()]
+
+    def get_label_dict(self):
+        if self._table is not None:
+            from .util.arrow import get_tag_values
+            return defaultdict(int, get_tag_values(self._table))
+        return defaultdict(int, self.get_stats().tag_counter)
+
+
+class ConllFormat(BaseFormat):
+    """
+    conll格式数据集的统计
+    Args:
+        data_file(str): 文件路径
+        delimiter(str): 字和标签的分隔符
+        workers(int): 统计的进程数
+        chunk_size(int): 每个进程每次统计的记录数
+    """
+    def __init__(self, data_file, delimiter, workers=1, chunk_size=10000) -> None:
+        super().__init__(workers, chunk_size)
+        self._data_file = data_file
+        self._delimiter = delimiter
+
+    def _compute_stats(self):
+        parse_record = partial(parse_conll_record, delimiter=self._delimiter)
+        return self._compute_file_stats(self._data_file, "block", parse_record)
 
     def get_text(self):
-        text_list = list()
-        for data in self._data:
-            text = data[0]
-            if text:
-                text_list.append(text)
-        return text_list
+        return list(self._iter_text())
+
+    def _iter_text(self):
+        """
+        逐条读取文件中的非空文本
+        """
+        with open(self._data_file, "r", encoding="utf-8") as df:
+            for block in iter_blocks(df):
+                text = "".join([line.split(self._delimiter)[0] for line in block])
+                if text:
+                    yield text
 
     def get_text_len(self):
-        text_list = self.get_text()
-        return [len(text) for text in text_list]
-    
+        return [len(text) for text in self._iter_text()]
+
     def get_label_dict(self):
-        label_dict = defaultdict(int)
-        for data in self._data:
-            labels = data[1]
-            for label in labels:
-                label_dict[label] += 1
-        return label_dict
+        return defaultdict(int, self.get_stats().label_counter)
 
-    def size(self):
-        return len(self._data)
-    
-    def statistics(self):
-        len_list = self.get_text_len()
-        len_array = np.array(sorted(len_list))
-        length = len_array.size
-        len_mean = np.mean(len_array)
-        len_std = np.std(len_array)
-        len_min = len_array[0]
-        len_50 = len_array[int(length * 0.5)]
-        len_70 = len_array[int(length * 0.7)]
-        len_90 = len_array[int(length * 0.9)]
-        len_max = len_array[-1]
-        print(f"count:\t{length}")
-        print(f"mean:\t{round(len_mean, 2)}")
-        print(f"std:\t{round(len_std, 2)}")
-        print(f"min:\t{len_min}")
-        print(f"50%:\t{round(len_50, 2)}")
-        print(f"70%:\t{round(len_70, 2)}")
-        print(f"90%:\t{round(len_90, 2)}")
-        print(f"max:\t{len_max}")
-    
-    def draw_histogram(self, num_bins=100, density=False):
-        len_list = self.get_text_len()
-        len_list = np.array(len_list)
-        visual.draw_histogram(len_list, num_bins=num_bins, density=density)
 
-    def draw_hbar(self):
-        label_dict = self.get_label_dict()
-        label_list = label_dict.items()
-        label_list = sorted(label_list, key=lambda i: i[1], reverse=True)
-        labels = [i[0] for i in label_list]
-        datas = [i[1] for i in label_list]
-        visual.draw_hbar(labels, datas)
+ARROW_CONVERTERS = {
+    "json2arrow": ("line", json2arrow),
+    "conll2arrow": ("block", conll2arrow)
+}
@@ -33,9 +33,12 @@ class AlbertTinySoftmax(AlbertPreTrainedModel):
         head_mask=None,
         inputs_embeds=None,
         labels=None,
+        label_mask=None,
+        input_len=None,
         output_attentions=None,
         output_hidden_states=None,
         return_dict=None,
+        output_confidence=False,
     ):
 
         outputs = self.model(
@@ -57,16 +60,22 @@ class AlbertTinySoftmax(AlbertPreTrainedModel):
 
         if labels is not None:
             output = self.loss_func(logits.view(-1, self.num_labels), labels.view(-1))
+        elif output_confidence:
+            # 输出每个位置预测标签的概率
+            confidence, output = torch.softmax(logits, dim=-1).max(dim=-1)
+            output = (output, confidence)
         else:
-            output = logits
+            output = logits.argmax(dim=-1)
 
         return output
 
 
 class AlbertTinyCrf(AlbertPreTrainedModel):
-    def __init__(self, config, label_size):
+    def __init__(self, config, label_size=None):
         super().__init__(config)
         self.num_labels = config.num_labels
+        if label_size is None:
+            label_size = config.num_labels
 
         self.model = AlbertModel(config, add_pooling_layer=False)
         self.dropout = nn.Dropout(config.hidden_dropout_prob)
@@ -83,9 +92,12 @@ class AlbertTinyCrf(AlbertPreTrainedModel):
         head_mask=None,
         inputs_embeds=None,
         labels=None,
+        label_mask=None,
+        input_len=None,
         output_attentions=None,
         output_hidden_states=None,
         return_dict=None,
+        output_confidence=False,
     ):
         outputs = self.model(
             input_ids,
@@ -106,6 +118,9 @@ class AlbertTinyCrf(AlbertPreTrainedModel):
 
         if labels is not None:
             output = -self.crf(emissions=logits, tags=labels, mask=attention_mask.byte())
+        elif output_confidence:
+            # 输出最优路径上每个位置的边缘概率
+            output = self.crf.decode_with_confidence(emissions=logits, mask=attention_mask.byte())
         else:
             output = self.crf.decode(emissions=logits, mask=attention_mask.byte())
             output = pad_sequence([torch.tensor(o) for o in output], batch_first=True)
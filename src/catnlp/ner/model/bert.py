@@ -19,17 +19,39 @@ from ..loss.dice_loss import DiceLoss
 from ..loss.focal_loss import FocalLoss
 
 
+def packed_lstm(lstm, sequence_output, input_len=None):
+    """
+    按真实长度打包后过LSTM，跳过padding部分的循环计算
+    Args:
+        lstm(LSTM): batch_first的LSTM
+        sequence_output(Tensor): 编码器输出，(batch_size, max_length, hidden_size)
+        input_len(Tensor): 每条样本的真实长度，为None时不打包
+    Returns:
+        lstm_output(Tensor): LSTM输出，只补齐到batch内的最大长度，(batch_size, seq_len, hidden_size)
+    """
+    if input_len is None:
+        lstm_output, _ = lstm(sequence_output)
+        return lstm_output
+    packed_output = pack_padded_sequence(sequence_output,
+                                         input_len.cpu(),
+                                         batch_first=True,
+                                         enforce_sorted=False)
+    lstm_output, _ = lstm(packed_output)
+    lstm_output, _ = pad_packed_sequence(lstm_output, batch_first=True)
+    return lstm_output
+
+
 class BertSoftmax(BertPreTrainedModel):
 
     def __init__(self, config):
         super().__init__(config)
         self.num_labels = config.num_labels
 
-        self.bert = BertModel(config, add_pooling_layer=False)
+        self.bert = BertModel(config)
         self.dropout = nn.Dropout(config.hidden_dropout_prob)
         self.classifier = nn.Linear(config.hidden_size, config.num_labels)
         self.loss_func = CrossEntropyLoss()
-        self.init_weights()
+        self.apply(self.init_weights)
 
     def forward(
         self,
@@ -45,6 +67,7 @@ class BertSoftmax(BertPreTrainedModel):
         output_attentions=None,
         output_hidden_states=None,
         return_dict=None,
+        output_confidence=False,
     ):
 
         outputs = self.bert(
@@ -66,6 +89,10 @@ class BertSoftmax(BertPreTrainedModel):
 
         if labels is not None:
             output = self.loss_func(logits.view(-1, self.num_labels), labels.view(-1))
+        elif output_confidence:
+            # 输出每个位置预测标签的概率
+            confidence, output = torch.softmax(logits, dim=-1).max(dim=-1)
+            output = (output, confidence)
         else:
             output = logits.argmax(dim=-1)
 
@@ -77,11 +104,11 @@ class BertCrf(BertPreTrainedModel):
         super().__init__(config)
         self.num_labels = config.num_labels
 
-        self.bert = BertModel(config, add_pooling_layer=False)
+        self.bert = BertModel(config)
         self.dropout = nn.Dropout(config.hidden_dropout_prob)
         self.classifier = nn.Linear(config.hidden_size, self.num_labels)
         self.crf = CRF(num_tags=self.num_labels, batch_first=True)
-        self.init_weights()
+        self.apply(self.init_weights)
 
     def forward(
         self,
@@ -97,6 +124,7 @@ class BertCrf(BertPreTrainedModel):
         output_attentions=None,
         output_hidden_states=None,
         return_dict=None,
+        output_confidence=False,
     ):
         outputs = self.bert(
             input_ids,
@@ -120,6 +148,9 @@ class BertCrf(BertPreTrainedModel):
         if labels is not None:
             # output = -self.crf(emissions=logits, tags=labels, mask=attention_mask)
             output = -self.crf(emissions=logits[:, :dim2, :], tags=labels[:, :dim2], mask=attention_mask[:, :dim2])
+        elif output_confidence:
+            # 输出最优路径上每个位置的边缘概率
+            output = self.crf.decode_with_confidence(emissions=logits[:, :dim2, :], mask=attention_mask[:, :dim2])
         else:
             # output = self.crf.decode(emissions=logits, mask=attention_mask)
             output = self.crf.decode(emissions=logits[:, :dim2, :], mask=attention_mask[:, :dim2])
@@ -156,6 +187,7 @@ class BertLstmCrf(BertPreTrainedModel):
         output_attentions=None,
         output_hidden_states=None,
         return_dict=None,
+        output_confidence=False,
     ):
         outputs = self.bert(
             input_ids,
@@ -172,12 +204,16 @@ class BertLstmCrf(BertPreTrainedModel):
         sequence_output = outputs[0]
 
         sequence_output = self.dropout(sequence_output)
-        lstm_output, _ = self.lstm(sequence_output)
+        lstm_output = packed_lstm(self.lstm, sequence_output, input_len)
         logits = self.classifier(lstm_output)
-        attention_mask = attention_mask.byte()
+        seq_len = logits.size(1)
+        attention_mask = attention_mask[:, :seq_len].byte()
 
         if labels is not None:
-            output = -self.crf(emissions=logits, tags=labels, mask=attention_mask)
+            output = -self.crf(emissions=logits, tags=labels[:, :seq_len], mask=attention_mask)
+        elif output_confidence:
+            # 输出最优路径上每个位置的边缘概率
+            output = self.crf.decode_with_confidence(emissions=logits, mask=attention_mask)
         else:
             output = self.crf.decode(emissions=logits, mask=attention_mask)
             output = pad_sequence([torch.tensor(o) for o in output], batch_first=True, padding_value=0)
@@ -267,6 +303,8 @@ class BertBiaffine(BertPreTrainedModel):
         self.end_layer = torch.nn.Sequential(torch.nn.Linear(in_features=hidden_size, out_features=200),
                                             torch.nn.ReLU())
         self.biaffne_layer = biaffine(200, config.num_labels)
+        # 只计算长度不超过max_span_len的span，输出为(batch_size, seq_len, max_span_len, num_labels)的带状矩阵
+        self.max_span_len = getattr(config, "max_span_len", None)
         loss_name = config.loss_name
         if loss_name == "dice":
             self.loss_func = DiceLoss(reduction="none")
@@ -306,22 +344,26 @@ class BertBiaffine(BertPreTrainedModel):
         sequence_output = outputs[0]
 
         sequence_output = self.dropout(sequence_output)
-        # todo
-        sequence_output = sequence_output
-        
-        sequence_output, _ = self.lstm(sequence_output)
+        # 只在batch内的最大长度上计算，span打分是长度的平方
+        sequence_output = packed_lstm(self.lstm, sequence_output, input_len)
+        seq_len = sequence_output.size(1)
 
         start_logits = self.start_layer(sequence_output) 
         end_logits = self.end_layer(sequence_output) 
 
-        span_logits = self.biaffne_layer(start_logits, end_logits)
+        span_logits = self.biaffne_layer(start_logits, end_logits, self.max_span_len)
         span_logits = span_logits.contiguous()
 
         if labels is not None:
-            labels = labels.view(size=(-1,))
+            labels = labels[:, :seq_len, :seq_len]
+            label_mask = label_mask[:, :seq_len, :seq_len]
+            if self.max_span_len:
+                labels, valid = to_band(labels, span_logits.size(2))
+                label_mask = to_band(label_mask, span_logits.size(2))[0] * valid
+            labels = labels.reshape(-1)
             span_logits = span_logits.view(size=(-1, self.num_labels))
             span_loss = self.loss_func(input=span_logits, target=labels)
-            label_mask = label_mask.view(size=(-1,))
+            label_mask = label_mask.reshape(-1)
             span_loss *= label_mask
             output = span_loss.sum() / label_mask.sum()
         else:
@@ -340,11 +382,13 @@ class biaffine(nn.Module):
         self.U = torch.nn.Parameter(torch.randn(in_size + int(bias_x),out_size,in_size + int(bias_y)))
         # self.U1 = self.U.view(size=(in_size + int(bias_x),-1))
         #U.shape = [in_size,out_size,in_size]  
-    def forward(self, x, y):
+    def forward(self, x, y, max_span_len=None):
         if self.bias_x:
             x = torch.cat((x, torch.ones_like(x[..., :1])), dim=-1)
         if self.bias_y:
             y = torch.cat((y, torch.ones_like(y[..., :1])), dim=-1)
+        if max_span_len:
+            return self.band_forward(x, y, max_span_len)
         
         """
         batch_size,seq_len,hidden=x.shape
@@ -357,3 +401,42 @@ class biaffine(nn.Module):
         """
         bilinar_mapping = torch.einsum('bxi,ioj,byj->bxyo', x, self.U, y)
         return bilinar_mapping
+
+    def band_forward(self, x, y, max_span_len):
+        """
+        只计算j - i < max_span_len的带状区域，先算xU再与窗口内的y相乘
+        Args:
+            x(Tensor): 加上偏置后的起始表示，(batch_size, seq_len, in_size + 1)
+            y(Tensor): 加上偏置后的结束表示，(batch_size, seq_len, in_size + 1)
+            max_span_len(int): 最大span长度
+        Returns:
+            bilinar_mapping(Tensor): (batch_size, seq_len, span_len, out_size)，
+                [b, i, k]对应span(i, i + k)，超出序列的位置为0，span_len = min(max_span_len, seq_len)
+        """
+        seq_len = x.size(1)
+        span_len = min(max_span_len, seq_len)
+        # (batch_size, seq_len, out_size, in_size + 1)
+        x_u = torch.einsum('bxi,ioj->bxoj', x, self.U)
+        # (batch_size, seq_len, in_size + 1, span_len)
+        y_band = F.pad(y, (0, 0, 0, span_len - 1)).unfold(1, span_len, 1)
+        bilinar_mapping = torch.matmul(x_u, y_band)
+        return bilinar_mapping.transpose(2, 3)
+
+
+def to_band(matrix, span_len):
+    """
+    把(batch_size, seq_len, seq_len, ...)的矩阵转为带状表示
+    Args:
+        matrix(Tensor): 稠密矩阵，如span标签
+        span_len(int): 带宽
+    Returns:
+        band(Tensor): (batch_size, seq_len, span_len, ...)，[b, i, k]对应matrix[b, i, i + k]
+        valid(Tensor): (seq_len, span_len)，i + k是否在序列内
+    """
+    seq_len = matrix.size(1)
+    end_index = torch.arange(seq_len, device=matrix.device)[:, None] + \
+        torch.arange(span_len, device=matrix.device)[None, :]
+    valid = end_index < seq_len
+    start_index = torch.arange(seq_len, device=matrix.device)[:, None]
+    band = matrix[:, start_index, end_index.clamp(max=seq_len - 1)]
+    return band, valid.to(matrix.dtype)
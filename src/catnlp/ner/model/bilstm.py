@@ -1,19 +1,20 @@
 # -*- coding: utf-8 -*-
 
+import numpy as np
 import torch
 import torch.nn as nn
 from torch.nn.utils.rnn import pack_padded_sequence, \
-    pad_packed_sequence
+    pad_packed_sequence, pad_sequence
 
 from ...layer.decoder.crf import CRF
 
 
-class BiLstmSoftmax(nn.Module):
+class BiLstmBase(nn.Module):
     """
-    BiLSTM_Softmax模型
+    BiLSTM编码部分，预测时没有预训练词向量(config中没有embed)，权重从模型文件加载
     """
     def __init__(self, config):
-        super(BiLstmSoftmax, self).__init__()
+        super(BiLstmBase, self).__init__()
         self.word_size = config['word_size']
         self.word_dim = config['word_dim']
         self.hidden_dim = config['hidden_dim']
@@ -24,11 +25,14 @@ class BiLstmSoftmax(nn.Module):
         self.rnn_input_dropout = nn.Dropout(dropout)
         self.rnn_output_dropout = nn.Dropout(dropout)
 
+        embed = config.get('embed')
+        if embed is None:
+            embed = np.zeros([self.word_size, self.word_dim], dtype=np.float32)
         self.embedding = nn.Embedding(
             self.word_size,
             self.word_dim,
             padding_idx=0).\
-            from_pretrained(torch.from_numpy(config['embed'])).float()
+            from_pretrained(torch.from_numpy(embed)).float()
         self.lstm = nn.LSTM(self.word_dim, self.hidden_dim // 2,
                             num_layers=self.num_layer,
                             # dropout=dropout,
@@ -36,82 +40,98 @@ class BiLstmSoftmax(nn.Module):
                             bidirectional=True)
 
         self.hidden2tag = nn.Linear(self.hidden_dim, self.label_size)
-        self.loss = nn.CrossEntropyLoss(ignore_index=0)
 
-    def forward(self, word_batch, label_batch=None):
-        masks = word_batch.gt(0)
-        len_list = masks.sum(dim=1)
+    def get_emission(self, word_batch):
+        """
+        Args:
+            word_batch(Tensor): (batch, seq_len)，0为pad
+        Returns:
+            emission(Tensor): (batch, seq_len, label_size)
+        """
+        len_list = word_batch.gt(0).sum(dim=1)
         word_embeds = self.embedding(word_batch)
         word_embeds = self.rnn_input_dropout(word_embeds)
         packed_words = pack_padded_sequence(word_embeds,
-                                            len_list,
+                                            len_list.cpu(),
                                             batch_first=True,
                                             enforce_sorted=False)
         lstm_output, _ = self.lstm(packed_words)
-        lstm_output, _ = pad_packed_sequence(lstm_output)
-        lstm_output = lstm_output.transpose(1, 0)
+        lstm_output, _ = pad_packed_sequence(lstm_output,
+                                             batch_first=True,
+                                             total_length=word_batch.size(1))
         lstm_output = self.rnn_output_dropout(lstm_output)
         # lstm_output = self.norm(lstm_output)
-        emission = self.hidden2tag(lstm_output)
-        if label_batch:
-            active_masks = masks.reshape(-1)
-            active_logits = emission.reshape(-1, self.label_size)[active_masks]
-            active_labels = label_batch.reshape(-1)[active_masks]
-            loss = self.loss(active_logits, active_labels)
-            return loss
-        else:
-            seq_list = torch.argmax(emission, dim=2)
-            return seq_list, len_list
+        return self.hidden2tag(lstm_output)
+
+    def evaluate(self, word_batch, label_batch):
+        """
+        一次前向同时得到损失和预测，验证时在no_grad下调用，训练时损失可以反向传播
+        Args:
+            word_batch(Tensor): (batch, seq_len)
+            label_batch(Tensor): (batch, seq_len)
+        Returns:
+            loss(Tensor): 损失
+            pred_ids(Tensor): (batch, seq_len)的预测标签id，pad位置为0
+        """
+        masks = word_batch.gt(0)
+        emission = self.get_emission(word_batch)
+        loss = self.get_loss(emission, label_batch, masks)
+        with torch.no_grad():
+            pred_ids = self.decode(emission.detach(), masks)
+        if not isinstance(pred_ids, torch.Tensor):
+            pred_ids = pad_sequence([torch.tensor(seq, dtype=torch.long) for seq in pred_ids],
+                                    batch_first=True, padding_value=0)
+        return loss, pred_ids
 
 
-class BiLstmCrf(nn.Module):
+class BiLstmSoftmax(BiLstmBase):
     """
-    BiLSTM_CRF模型
+    BiLSTM_Softmax模型
     """
     def __init__(self, config):
-        super(BiLstmCrf, self).__init__()
-        self.word_size = config['word_size']
-        self.word_dim = config['word_dim']
-        self.hidden_dim = config['hidden_dim']
-        self.num_layer = config['num_layer']
-        self.label_size = config['label_size']
-        dropout = config['dropout']
+        super(BiLstmSoftmax, self).__init__(config)
+        self.loss = nn.CrossEntropyLoss(ignore_index=0)
 
-        self.rnn_input_dropout = nn.Dropout(dropout)
-        self.rnn_output_dropout = nn.Dropout(dropout)
+    def forward(self, word_batch, label_batch=None):
+        masks = word_batch.gt(0)
+        len_list = masks.sum(dim=1)
+        emission = self.get_emission(word_batch)
+        if label_batch is not None:
+            return self.get_loss(emission, label_batch, masks)
+        else:
+            seq_list = self.decode(emission, masks)
+            return seq_list, len_list
 
-        self.embedding = nn.Embedding(
-            self.word_size,
-            self.word_dim,
-            padding_idx=0).\
-            from_pretrained(torch.from_numpy(config['embed'])).float()
-        self.lstm = nn.LSTM(self.word_dim, self.hidden_dim // 2,
-                            num_layers=self.num_layer,
-                            # dropout=dropout,
-                            batch_first=True,
-                            bidirectional=True)
+    def get_loss(self, emission, label_batch, masks):
+        active_masks = masks.reshape(-1)
+        active_logits = emission.reshape(-1, self.label_size)[active_masks]
+        active_labels = label_batch.reshape(-1)[active_masks]
+        return self.loss(active_logits, active_labels)
 
-        self.hidden2tag = nn.Linear(self.hidden_dim, self.label_size)
+    def decode(self, emission, masks):
+        return torch.argmax(emission, dim=2)
+
+
+class BiLstmCrf(BiLstmBase):
+    """
+    BiLSTM_CRF模型
+    """
+    def __init__(self, config):
+        super(BiLstmCrf, self).__init__(config)
         self.crf = CRF(self.label_size, batch_first=True)
 
     def forward(self, word_batch, label_batch=None):
         masks = word_batch.gt(0)
         len_list = masks.sum(dim=1)
-        word_embeds = self.embedding(word_batch)
-        word_embeds = self.rnn_input_dropout(word_embeds)
-        packed_words = pack_padded_sequence(word_embeds,
-                                            len_list.cpu(),
-                                            batch_first=True,
-                                            enforce_sorted=False)
-        lstm_output, _ = self.lstm(packed_words)
-        lstm_output, _ = pad_packed_sequence(lstm_output)
-        lstm_output = lstm_output.transpose(1, 0)
-        lstm_output = self.rnn_output_dropout(lstm_output)
-        # lstm_output = self.norm(lstm_output)
-        emission = self.hidden2tag(lstm_output)
+        emission = self.get_emission(word_batch)
         if label_batch is not None:
-            loss = self.crf(emission, label_batch, masks)
-            return -loss
+            return self.get_loss(emission, label_batch, masks)
         else:
-            seq_list = self.crf.decode(emission, masks)
+            seq_list = self.decode(emission, masks)
             return seq_list, len_list
+
+    def get_loss(self, emission, label_batch, masks):
+        return -self.crf(emission, label_batch, masks)
+
+    def decode(self, emission, masks):
+        return self.crf.decode(emission, masks)
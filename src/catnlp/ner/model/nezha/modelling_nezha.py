@@ -338,8 +338,10 @@ class NeZhaSelfAttention(nn.Module):
         self.query = nn.Linear(config.hidden_size, self.all_head_size)
         self.key = nn.Linear(config.hidden_size, self.all_head_size)
         self.value = nn.Linear(config.hidden_size, self.all_head_size)
-        self.relative_positions_embeddings = _generate_relative_positions_embeddings(
-            length=512, depth=self.attention_head_size, max_relative_position=config.max_relative_position).cuda()
+        # 不保存到state_dict，随模型移动到对应设备
+        self.register_buffer("relative_positions_embeddings", _generate_relative_positions_embeddings(
+            length=512, depth=self.attention_head_size, max_relative_position=config.max_relative_position),
+            persistent=False)
         self.dropout = nn.Dropout(config.attention_probs_dropout_prob)
 
     def transpose_for_scores(self, x):
@@ -348,9 +350,6 @@ class NeZhaSelfAttention(nn.Module):
         return x.permute(0, 2, 1, 3)
 
     def forward(self, hidden_states, attention_mask):
-        device = 'cpu'
-        if hidden_states.is_cuda:
-            device = hidden_states.get_device()
         mixed_query_layer = self.query(hidden_states)
         mixed_key_layer = self.key(hidden_states)
         mixed_value_layer = self.value(hidden_states)
@@ -363,8 +362,7 @@ class NeZhaSelfAttention(nn.Module):
         attention_scores = torch.matmul(query_layer, key_layer.transpose(-1, -2))
         batch_size, num_attention_heads, from_seq_length, to_seq_length = attention_scores.size()
 
-        relations_keys = self.relative_positions_embeddings.detach().clone()[:to_seq_length, :to_seq_length, :].to(
-            device)
+        relations_keys = self.relative_positions_embeddings[:to_seq_length, :to_seq_length, :]
         # relations_keys = embeddings.clone().detach().to(device)
         query_layer_t = query_layer.permute(2, 0, 1, 3)
         query_layer_r = query_layer_t.contiguous().view(from_seq_length, batch_size * num_attention_heads,
@@ -387,8 +385,7 @@ class NeZhaSelfAttention(nn.Module):
 
         context_layer = torch.matmul(attention_probs, value_layer)
 
-        relations_values = self.relative_positions_embeddings.clone()[:to_seq_length, :to_seq_length, :].to(
-            device)
+        relations_values = self.relative_positions_embeddings[:to_seq_length, :to_seq_length, :]
         attention_probs_t = attention_probs.permute(2, 0, 1, 3)
         attentions_probs_r = attention_probs_t.contiguous().view(from_seq_length, batch_size * num_attention_heads,
                                                                  to_seq_length)
@@ -1,8 +1,12 @@
 # -*- coding:utf-8 -*-
 
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from .predict_plm import PredictPlm
+from .predict_lstm import PredictLstm
+from .predict_ensemble import PredictEnsemble
 from .predict_dict import PredictDict
 from .predict_re import PredictRe
 # from .train_lstm import LstmTrain
@@ -13,12 +17,211 @@ class NerPredict:
         logging.info(config)
         if type == "plm":
             self.ner_service = PredictPlm(config)
+        elif type == "lstm":
+            self.ner_service = PredictLstm(config)
         elif type == "dict":
             self.ner_service = PredictDict(config)
         elif type == "re":
             self.ner_service = PredictRe(config)
+        elif type == "ensemble":
+            self.ner_service = PredictEnsemble(config)
+        elif type == "cascade":
+            self.ner_service = PredictCascade(config)
         # else:
         #     ner_train = LstmTrain(config)
         #     ner_train.train()
     def predict(self, text):
         return self.ner_service.predict(text)
+
+    def predict_batch(self, texts):
+        return self.ner_service.predict_batch(texts)
+
+    def get_stats(self):
+        if hasattr(self.ner_service, "get_stats"):
+            return self.ner_service.get_stats()
+        return None
+
+
+class NerPipeline:
+    """
+    组合多个预测服务，一个batch内各服务在线程池中并发执行，
+    模型前向释放GIL时词典和正则匹配可以与之重叠
+    Args:
+        predict_config(dict): 预测配置，key为服务类型(plm|lstm|dict|re|ensemble|cascade)
+        max_workers(int): 线程数，默认为服务数
+    """
+    def __init__(self, predict_config, max_workers=None):
+        self.types = list(predict_config)
+        self.ner_services = list()
+        for type in self.types:
+            self.ner_services.append(NerPredict(predict_config[type], type=type))
+        if max_workers is None:
+            max_workers = len(self.ner_services)
+        self.executor = None
+        if max_workers > 1 and len(self.ner_services) > 1:
+            self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def predict(self, text):
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts):
+        """
+        批量预测
+        Args:
+            texts(list): 文本列表
+        Returns:
+            entity_lists(list): 每条文本的实体列表，按配置顺序拼接各服务的结果，未去冲突
+        """
+        if self.executor:
+            futures = [self.executor.submit(ner_service.predict_batch, texts) for ner_service in self.ner_services]
+            service_entity_lists = [future.result() for future in futures]
+        else:
+            service_entity_lists = [ner_service.predict_batch(texts) for ner_service in self.ner_services]
+        entity_lists = list()
+        for i in range(len(texts)):
+            entity_list = list()
+            for tmp_entity_lists in service_entity_lists:
+                entity_list += tmp_entity_lists[i]
+            entity_lists.append(entity_list)
+        return entity_lists
+
+    def get_stats(self):
+        """
+        获得各服务的统计信息
+        Returns:
+            stats(dict): 服务类型 - 统计信息，只包括有统计的服务
+        """
+        stats = dict()
+        for type, ner_service in zip(self.types, self.ner_services):
+            service_stats = ner_service.get_stats()
+            if service_stats is not None:
+                stats[type] = service_stats
+        return stats
+
+
+class PredictCascade:
+    """
+    级联预测：按顺序执行各阶段，只有未被前面阶段接受的文本才进入后面的阶段，
+    通常把词典、正则和小模型放在前面，大模型放在最后兜底
+    Args:
+        config(dict): 级联配置
+            stages(list): 阶段列表，每个阶段包括
+                name(str): 阶段名
+                services(dict): 本阶段的预测配置，格式同NerPipeline
+                accept(dict): 接受条件，都满足时文本不再进入后面的阶段，最后一个阶段接受所有文本
+                    coverage(float): 实体覆盖的非空白字符比例不低于该值
+                    min_confidence(float): 本阶段实体的置信度都不低于该值，没有置信度的实体视为1
+                    min_entities(int): 本阶段至少预测出的实体数，默认1
+                keep(bool): 文本进入后面的阶段时是否保留本阶段的实体，默认True
+            max_workers(int): 每个阶段内的线程数
+    """
+    def __init__(self, config):
+        stage_configs = config.get("stages")
+        if not stage_configs:
+            raise ValueError("级联预测至少需要一个阶段")
+        max_workers = config.get("max_workers")
+        self.stages = list()
+        for idx, stage_config in enumerate(stage_configs):
+            if not stage_config.get("services"):
+                raise ValueError(f"级联第{idx}个阶段没有配置services")
+            self.stages.append({
+                "name": stage_config.get("name", f"stage{idx}"),
+                "pipeline": NerPipeline(stage_config["services"], max_workers=max_workers),
+                "accept": stage_config.get("accept") or dict(),
+                "keep": stage_config.get("keep", True)
+            })
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = dict()
+        for stage in self.stages:
+            self.stats[stage["name"]] = {"input": 0, "resolved": 0, "seconds": 0.0}
+
+    def get_stats(self):
+        """
+        获得各阶段的统计信息
+        Returns:
+            stats(dict): 阶段名 - {input: 输入文本数, resolved: 本阶段接受的文本数, seconds: 耗时}
+        """
+        return {name: dict(stage_stats) for name, stage_stats in self.stats.items()}
+
+    def predict(self, text):
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts):
+        """
+        批量预测
+        Args:
+            texts(list): 文本列表
+        Returns:
+            entity_lists(list): 每条文本的实体列表，包括接受该文本的阶段及之前保留的阶段的实体，未去冲突
+        """
+        entity_lists = [list() for _ in texts]
+        pending = list(range(len(texts)))
+        for stage_idx, stage in enumerate(self.stages):
+            if not pending:
+                break
+            stage_stats = self.stats[stage["name"]]
+            stage_stats["input"] += len(pending)
+            start = time.perf_counter()
+            stage_entity_lists = stage["pipeline"].predict_batch([texts[idx] for idx in pending])
+            is_last = stage_idx == len(self.stages) - 1
+            next_pending = list()
+            for idx, stage_entity_list in zip(pending, stage_entity_lists):
+                if is_last or self.accept(texts[idx], entity_lists[idx], stage_entity_list, stage["accept"]):
+                    entity_lists[idx] += stage_entity_list
+                    stage_stats["resolved"] += 1
+                else:
+                    if stage["keep"]:
+                        entity_lists[idx] += stage_entity_list
+                    next_pending.append(idx)
+            stage_stats["seconds"] += time.perf_counter() - start
+            pending = next_pending
+        return entity_lists
+
+    def accept(self, text, entity_list, stage_entity_list, accept_config):
+        """
+        判断本阶段的结果是否可以接受
+        Args:
+            text(str): 文本
+            entity_list(list): 之前阶段保留的实体
+            stage_entity_list(list): 本阶段的实体
+            accept_config(dict): 接受条件
+        Returns:
+            is_accepted(bool): 是否接受
+        """
+        if len(stage_entity_list) < accept_config.get("min_entities", 1):
+            return False
+        min_confidence = accept_config.get("min_confidence")
+        if min_confidence is not None:
+            for entity in stage_entity_list:
+                if len(entity) > 3 and entity[3] < min_confidence:
+                    return False
+        coverage = accept_config.get("coverage")
+        if coverage is not None and get_coverage(text, entity_list + stage_entity_list) < coverage:
+            return False
+        return True
+
+
+def get_coverage(text, entity_list):
+    """
+    实体覆盖的非空白字符比例，重叠部分只算一次
+    Args:
+        text(str): 文本
+        entity_list(list): [[start, end, tag, ...], ...]
+    Returns:
+        coverage(float): 覆盖比例，文本全为空白时为1
+    """
+    covered = [False] * len(text)
+    for entity in entity_list:
+        for i in range(entity[0], min(entity[1], len(text))):
+            covered[i] = True
+    total = 0
+    hits = 0
+    for c, is_covered in zip(text, covered):
+        if not c.isspace():
+            total += 1
+            hits += is_covered
+    if total == 0:
+        return 1.0
+    return hits / total
@@ -1,29 +1,148 @@
 # -*- coding: utf-8 -*-
 
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
 import ahocorasick
 
 from ..common.load_file import load_dict_file
 
 
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+
 class PredictDict:
+    """
+    词典预测：所有类别的词典合并为一个自动机，预测时只扫描一遍文本
+    Args:
+        config(dict): 词典配置，支持两种格式
+            {tag: dict_file, ...}
+            {"cache": cache_dir, "tags": {tag: dict_file, ...}}，构建好的自动机按词典内容的哈希缓存到cache_dir
+    """
     def __init__(self, config) -> None:
-        self.tag_service = dict()
-        for tag in config:
-            self.tag_service[tag] = ahocorasick.Automaton()
-            tag_file = config[tag]
-            dict_list = load_dict_file(tag_file)
-            for word in dict_list:
-                self.tag_service[tag].add_word(word, word)
-            self.tag_service[tag].make_automaton()
+        if "tags" in config:
+            tag_files = config["tags"]
+            cache_dir = config.get("cache")
+        else:
+            tag_files = config
+            cache_dir = None
+        self.tag_list = list(tag_files)
+        self.automaton = self._load_automaton(tag_files, cache_dir)
+
+    def _load_automaton(self, tag_files, cache_dir=None):
+        """
+        加载自动机，有缓存时直接反序列化
+        Args:
+            tag_files(dict): 类别 - 词典文件
+            cache_dir(str): 缓存目录
+        Returns:
+            automaton(Automaton): 合并后的自动机
+        """
+        if not cache_dir:
+            return self._build_automaton(tag_files)
+        cache_file = Path(cache_dir) / f"dict_{get_content_hash(tag_files)}.pkl"
+        if cache_file.exists():
+            logger.info(f"加载词典缓存：{cache_file}")
+            with open(cache_file, "rb") as cf:
+                return pickle.load(cf)
+        automaton = self._build_automaton(tag_files)
+        save_pickle(automaton, cache_file)
+        logger.info(f"保存词典缓存：{cache_file}")
+        return automaton
 
+    def _build_automaton(self, tag_files):
+        """
+        构建自动机，值为(类别, 长度, 优先级)的元组，同一个词可以属于多个类别
+        Args:
+            tag_files(dict): 类别 - 词典文件，优先级为配置中的顺序
+        Returns:
+            automaton(Automaton): 合并后的自动机
+        """
+        word_dict = dict()
+        for priority, tag in enumerate(tag_files):
+            for word in load_dict_file(tag_files[tag]):
+                values = word_dict.setdefault(word, list())
+                if not values or values[-1][0] != tag:
+                    values.append((tag, len(word), priority))
+        automaton = ahocorasick.Automaton()
+        for word, values in word_dict.items():
+            automaton.add_word(word, tuple(values))
+        automaton.make_automaton()
+        return automaton
 
     def predict(self, text):
+        """
+        预测，每个类别内取最左最长的不重叠匹配，不同类别之间允许重叠
+        Args:
+            text(str): 文本
+        Returns:
+            entity_list(list): 按(优先级, 起始位置)排序的实体列表
+        """
+        match_lists = [list() for _ in self.tag_list]
+        for end, values in self.automaton.iter(text):
+            end += 1
+            for _, length, priority in values:
+                match_lists[priority].append((end - length, end))
+
         entity_list = list()
-        for tag in self.tag_service:
-            tmp_entities = list(self.tag_service[tag].iter_long(text))
-            for tmp_entity in tmp_entities:
-                end, word = tmp_entity
-                end += 1
-                start = end - len(word)
-                entity_list.append([start, end, tag])
+        for tag, match_list in zip(self.tag_list, match_lists):
+            match_list.sort(key=lambda x: (x[0], -x[1]))
+            last_end = 0
+            for start, end in match_list:
+                if start >= last_end:
+                    entity_list.append([start, end, tag])
+                    last_end = end
         return entity_list
+
+    def predict_batch(self, texts):
+        """
+        批量预测
+        Args:
+            texts(list): 文本列表
+        Returns:
+            entity_lists(list): 每条文本的实体列表
+        """
+        return [self.predict(text) for text in texts]
+
+
+def get_content_hash(tag_files):
+    """
+    根据类别顺序和词典内容计算哈希，词典变化后缓存自动失效
+    Args:
+        tag_files(dict): 类别 - 词典文件
+    Returns:
+        content_hash(str): sha1
+    """
+    sha1 = hashlib.sha1(f"{CACHE_VERSION}".encode("utf-8"))
+    for tag in tag_files:
+        sha1.update(f"\0{tag}\0".encode("utf-8"))
+        with open(tag_files[tag], "rb") as df:
+            for chunk in iter(lambda: df.read(1 << 20), b""):
+                sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def save_pickle(obj, target):
+    """
+    先写临时文件再重命名，避免多个进程同时启动时读到不完整的缓存
+    Args:
+        obj(object): 对象
+        target(Path): 文件路径
+    """
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_file = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tf:
+            pickle.dump(obj, tf, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, target)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
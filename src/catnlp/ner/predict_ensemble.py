@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .predict_plm import PredictPlm
+from .util.conflict import vote_interval_scheduling
+from .util.merge import merge_tag_lists
+
+
+logger = logging.getLogger(__name__)
+
+
+class PredictEnsemble:
+    """
+    多模型集成预测：共用一份分词结果，多个模型并发前向，在内存中合并标签序列
+    Args:
+        config(dict): 集成配置
+            models(list): 每个模型的PredictPlm配置，可额外设置weight
+            method(str): 合并策略(longest|most|maximum|weighted|vote|confidence)，默认vote，
+                confidence按权重乘以实体置信度投票
+            format(str): 合并使用的标签格式(bio|bies)
+            max_workers(int): 并发线程数，默认为模型数，模型在不同GPU上时收益最大
+    """
+    def __init__(self, config) -> None:
+        model_configs = config.get("models")
+        if not model_configs:
+            raise ValueError("集成预测至少需要一个模型")
+        self.method = config.get("method", "vote")
+        self.format = config.get("format", "bio")
+        self.weight_list = [model_config.get("weight", 1) for model_config in model_configs]
+        if self.method == "confidence":
+            model_configs = [dict(model_config, confidence=True) for model_config in model_configs]
+        self.models = [PredictPlm(model_config) for model_config in model_configs]
+        self._check_models()
+        max_workers = config.get("max_workers", len(self.models))
+        self.executor = None
+        if max_workers > 1 and len(self.models) > 1:
+            self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        logger.info(f"集成模型数：{len(self.models)}，合并策略：{self.method}")
+
+    def _check_models(self):
+        """
+        共用分词结果要求各模型的词表、最大长度和大小写处理一致
+        """
+        base = self.models[0]
+        base_vocab = base.tokenizer.get_vocab()
+        for model in self.models[1:]:
+            if model.max_seq_length != base.max_seq_length:
+                raise ValueError(f"集成模型的max_length不一致：{model.max_seq_length} != {base.max_seq_length}")
+            if model.do_lower != base.do_lower:
+                raise ValueError("集成模型的do_lower_case不一致")
+            if model.tokenizer.get_vocab() != base_vocab:
+                raise ValueError("集成模型的词表不一致，无法共用分词结果")
+
+    def _predict_tags(self, model, texts, inputs):
+        outputs = model.forward(inputs)
+        tag_lists = model.get_labels(texts, outputs)
+        # 各解码方式的标签序列长度不同，统一对齐到文本长度
+        aligned_tag_lists = list()
+        for text, tag_list in zip(texts, tag_lists):
+            tag_list = tag_list[:len(text)]
+            aligned_tag_lists.append(tag_list + ["O"] * (len(text) - len(tag_list)))
+        return aligned_tag_lists
+
+    def _predict_entities(self, model, texts, inputs):
+        outputs = model.forward(inputs)
+        return model.postprocess(texts, outputs)
+
+    def predict(self, text):
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts):
+        """
+        批量预测
+        Args:
+            texts(list): 文本列表
+        Returns:
+            entity_lists(list): 每条文本的实体列表
+        """
+        inputs = self.models[0].preprocess(texts)
+        if self.method == "confidence":
+            return self._predict_batch_confidence(texts, inputs)
+        if self.executor:
+            model_tag_lists = list(self.executor.map(
+                lambda model: self._predict_tags(model, texts, inputs), self.models))
+        else:
+            model_tag_lists = [self._predict_tags(model, texts, inputs) for model in self.models]
+
+        entity_lists = list()
+        for i, text in enumerate(texts):
+            tag_lists = [tag_lists[i] for tag_lists in model_tag_lists]
+            tag_list = merge_tag_lists(tag_lists, self.method, self.weight_list, self.format)
+            entity_lists.append(self.models[0].get_entity_list(text, tag_list))
+        return entity_lists
+
+    def _predict_batch_confidence(self, texts, inputs):
+        """
+        置信度加权投票：相同实体的权重乘以置信度后累加，再按票数和长度贪心去冲突
+        Returns:
+            entity_lists(list): [[start, end, tag, confidence], ...]，confidence为加权平均置信度
+        """
+        if self.executor:
+            model_entity_lists = list(self.executor.map(
+                lambda model: self._predict_entities(model, texts, inputs), self.models))
+        else:
+            model_entity_lists = [self._predict_entities(model, texts, inputs) for model in self.models]
+
+        total_weight = sum(self.weight_list)
+        entity_lists = list()
+        for i in range(len(texts)):
+            interval_list = list()
+            for weight, entity_lists_ in zip(self.weight_list, model_entity_lists):
+                for start, end, tag, confidence in entity_lists_[i]:
+                    interval_list.append({
+                        "start": start,
+                        "end": end,
+                        "len": end - start,
+                        "tag": tag,
+                        "weight": weight * confidence
+                    })
+            scheduling_list = vote_interval_scheduling(interval_list)
+            entity_list = [[x["start"], x["end"], x["tag"], x["weight"] / total_weight] for x in scheduling_list]
+            entity_list.sort(key=lambda x: x[0])
+            entity_lists.append(entity_list)
+        return entity_lists
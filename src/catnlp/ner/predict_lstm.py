@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+from torch.nn.utils.rnn import pad_sequence
+
+from .model.bilstm import BiLstmCrf, BiLstmSoftmax
+from .util.decode import TagDecoder
+from .util.vocab import Vocab
+
+
+logger = logging.getLogger(__name__)
+
+
+class LstmEmission(nn.Module):
+    """
+    只包括编码部分，用于TorchScript跟踪，CRF解码仍在python中进行
+    """
+    def __init__(self, model):
+        super(LstmEmission, self).__init__()
+        self.model = model
+
+    def forward(self, word_batch):
+        return self.model.get_emission(word_batch)
+
+
+class PredictLstm:
+    """
+    BiLSTM模型预测，模型包为LstmTrain的输出目录：config.json、word.txt、label.txt和模型文件
+    Args:
+        config(dict): 预测配置
+            model_path(str): 模型包目录
+            device(str): 设备，默认cpu
+            max_length(int): 文本最大长度，超过的部分不预测，默认不截断
+            quantize(bool): 是否对LSTM和Linear做动态int8量化，只支持cpu
+            torchscript(bool): 是否用TorchScript跟踪编码部分，不能与quantize同时使用
+    """
+    def __init__(self, config) -> None:
+        model_path = Path(config.get("model_path"))
+        with open(model_path / "config.json", "r", encoding="utf-8") as cf:
+            model_cfg = json.load(cf)
+        self.vocab = Vocab(pad="<pad>", unk="<unk>")
+        self.vocab.load_vocab(model_path / "word.txt", model_path / "label.txt")
+        self.label_list = [self.vocab.get_label(idx) for idx in range(self.vocab.get_label_size())]
+        logger.info(self.label_list)
+        self.decoder = TagDecoder(self.label_list)
+        model_cfg["word_size"] = self.vocab.get_word_size()
+        model_cfg["label_size"] = self.vocab.get_label_size()
+
+        model_name = model_cfg["name"].lower()
+        if model_name == "bilstm_softmax":
+            model = BiLstmSoftmax(model_cfg)
+        elif model_name == "bilstm_crf":
+            model = BiLstmCrf(model_cfg)
+        else:
+            raise ValueError(f"没有对应的模型: {model_cfg['name']}")
+        model_file = model_path / model_cfg.get("model_file", f"{model_name}.pt")
+        model.load_state_dict(torch.load(model_file, map_location="cpu"))
+        model.eval()
+
+        self.device = config.get("device", "cpu")
+        self.max_length = config.get("max_length")
+        if config.get("quantize", False):
+            if self.device != "cpu":
+                raise ValueError("动态量化只支持cpu")
+            model = torch.ao.quantization.quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+        self.model = model.to(torch.device(self.device))
+        self.get_emission = self.model.get_emission
+        if config.get("torchscript", False) and config.get("quantize", False):
+            # 量化后的LSTM跟踪时会固定batch大小
+            logger.warning("动态量化的模型不支持TorchScript跟踪，使用eager模式")
+        elif config.get("torchscript", False):
+            example = torch.ones([2, 8], dtype=torch.long, device=self.device)
+            example[1, 4:] = 0
+            with torch.inference_mode():
+                self.get_emission = torch.jit.trace(LstmEmission(self.model), example, check_trace=False)
+
+    def predict(self, text):
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts):
+        """
+        批量预测
+        Args:
+            texts(list): 文本列表
+        Returns:
+            entity_lists(list): 每条文本的实体列表
+        """
+        entity_lists = [list() for _ in texts]
+        indices = [idx for idx, text in enumerate(texts) if text]
+        if not indices:
+            return entity_lists
+        word_batch = self.preprocess([texts[idx] for idx in indices])
+        pred_ids, len_list = self.forward(word_batch)
+        for idx, entity_list in zip(indices, self.decoder.decode(pred_ids, len_list)):
+            entity_lists[idx] = entity_list
+        return entity_lists
+
+    def preprocess(self, texts):
+        """
+        文本转为补齐的单词索引，pad为0
+        """
+        if self.max_length:
+            texts = [text[: self.max_length] for text in texts]
+        word_ids = [torch.from_numpy(self.vocab.encode(list(text))) for text in texts]
+        return pad_sequence(word_ids, batch_first=True, padding_value=0)
+
+    def forward(self, word_batch):
+        """
+        Args:
+            word_batch(Tensor): (batch, seq_len)
+        Returns:
+            pred_ids(ndarray|list): 预测标签id，softmax为(batch, seq_len)数组，CRF为每条文本的id列表
+            len_list(list): 每条文本的长度
+        """
+        word_batch = word_batch.to(self.device)
+        with torch.inference_mode():
+            masks = word_batch.gt(0)
+            emission = self.get_emission(word_batch)
+            pred_ids = self.model.decode(emission, masks)
+        if isinstance(pred_ids, torch.Tensor):
+            pred_ids = pred_ids.cpu().numpy()
+        return pred_ids, masks.sum(dim=1).tolist()
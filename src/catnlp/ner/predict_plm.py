@@ -26,11 +26,11 @@ from transformers import (
     AutoConfig,
     AutoTokenizer
 )
-import numpy as np
 
 from ..common.load_file import load_label_file
 from .model.albert_tiny import AlbertTinyCrf, AlbertTinySoftmax
 from .model.bert import BertBiaffine, BertCrf, BertSoftmax, BertLstmCrf
+from .util.decode import TagDecoder, entities_to_tags, get_biaffine_entities
 from .util.tokenizer import NerBertTokenizer
 from .util.split import merge_entities
 
@@ -45,7 +45,8 @@ class PredictPlm:
         label_file = Path(config.get("model_path")) / "label.txt"
         self.label_list = load_label_file(label_file)
         self.label_to_id = {label: idx for idx, label in enumerate(self.label_list)}
-        print(self.label_to_id)
+        self.decoder = TagDecoder(self.label_list, pad_id=0)
+        logger.info(self.label_to_id)
         self.tokenizer = AutoTokenizer.from_pretrained(config.get("model_path"), use_fast=True)
         pretrained_config = AutoConfig.from_pretrained(config.get("model_path"), num_labels=len(self.label_list))
 
@@ -66,6 +67,9 @@ class PredictPlm:
         else:
             raise ValueError
         pretrained_config.loss_name = None
+        # 训练时保存在config.json中，预测配置可以覆盖
+        self.max_span_len = config.get("max_span_len", getattr(pretrained_config, "max_span_len", None))
+        pretrained_config.max_span_len = self.max_span_len
         self.model = model_func.from_pretrained(
             config.get("model_path"),
             config=pretrained_config
@@ -74,8 +78,12 @@ class PredictPlm:
         self.model.to(torch.device(self.device))
         self.model.eval()
         self.decode_type = config.get("decode_type")
+        # 为每个实体输出置信度：CRF为实体内各位置边缘概率的最小值，softmax为预测概率的最小值，biaffine为span的概率
+        self.confidence = config.get("confidence", False)
     
     def get_labels(self, texts, predictions):
+        if isinstance(predictions, tuple):
+            predictions = predictions[0]
         # Transform predictions and references tensos to numpy arrays
         if self.device == "cpu":
             y_pred = predictions.detach().clone().numpy()
@@ -91,61 +99,50 @@ class PredictPlm:
     def get_biaffine_labels(self, texts, y_pred):
         preds = list()
         for text, pred in zip(texts, y_pred):
-            pred_entities = list()
             text_len = min(self.max_seq_length - 1, len(text) + 1)
-            for i in range(1, text_len):
-                for j in range(i, text_len):
-                    pred_scores = pred[i][j]
-                    pred_label_id = np.argmax(pred_scores)
-                    if pred_label_id > 0:
-                        pred_entities.append([i-1, j, self.label_list[pred_label_id], pred_scores[pred_label_id]])
-
-            pred_entities = sorted(pred_entities, reverse=True, key=lambda x:x[3])
-            new_pred_entities = list()
-            for pred_entity in pred_entities:
-                start, end, tag, _ = pred_entity
-                flag = True
-                for new_pred_entity in new_pred_entities:
-                    new_start, new_end, _ = new_pred_entity
-                    if start < new_end and new_start < end:
-                        #for flat ner nested mentions are not allowed
-                        flag = False
-                        break
-                if flag:
-                    new_pred_entities.append([start, end, tag])
-
-            tmp_preds = ["O"] * text_len
-            for entity in new_pred_entities:
-                start, end, tag = entity
-                tmp_preds[start] = f"B-{tag}"
-                for i in range(start+1, end):
-                    tmp_preds[i] = f"I-{tag}"
-            preds.append(tmp_preds)
+            pred_entities = get_biaffine_entities(pred, text_len, self.label_list, self.max_span_len)
+            preds.append(entities_to_tags(pred_entities, text_len))
         return preds
 
     def get_general_labels(self, texts, y_pred):
-        # Remove ignored index (special tokens)
-        # preds = [
-        #     [self.label_list[p] for p in pred[1:] if p > 0]
-        #     for pred in y_pred
-        # ]
-        preds = list()
-        for text, pred in zip(texts, y_pred):
-            tmp_preds = list()
-            for t, p in zip(text, pred[1:]):
-                if p > 0:
-                    tmp_preds.append(self.label_list[p])
-                else:
-                    print("O")
-                    tmp_preds.append("O")
-            preds.append(tmp_preds)
-        return preds
+        # 跳过[CLS]，每条文本取前len(text)个标签
+        return self.decoder.to_tags(y_pred, self.get_decode_lengths(texts, y_pred), offset=1)
+
+    def get_decode_lengths(self, texts, y_pred):
+        """
+        每条文本解码到的位置(不包含)，第0个位置是[CLS]，超过max_length的部分不解码
+        """
+        width = y_pred.shape[1]
+        return [min(len(text) + 1, width) for text in texts]
     
     def predict(self, text):
-        inputs = self.preprocess([text])
-        outputs = self.model(**inputs)
-        entity_lists = self.postprocess([text], outputs)
-        return entity_lists[0]
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts):
+        """
+        批量预测
+        Args:
+            texts(list): 文本列表
+        Returns:
+            entity_lists(list): 每条文本的实体列表
+        """
+        inputs = self.preprocess(texts)
+        outputs = self.forward(inputs)
+        return self.postprocess(texts, outputs)
+
+    def forward(self, inputs):
+        """
+        不计算梯度的前向，输入会移动到本模型所在设备，便于多个模型共用一份分词结果
+        Args:
+            inputs(dict): preprocess的输出
+        Returns:
+            outputs(Tensor): 模型输出
+        """
+        inputs = {key: value.to(self.device) for key, value in inputs.items()}
+        if self.confidence and self.decode_type == "general":
+            inputs["output_confidence"] = True
+        with torch.no_grad():
+            return self.model(**inputs)
     
     def preprocess(self, text_list):
         input_ids, input_masks, input_len = self._to_features(text_list, self.tokenizer, self.max_seq_length)
@@ -153,11 +150,38 @@ class PredictPlm:
         return inputs
 
     def postprocess(self, texts, outputs):
-        entity_lists = list()
-        pred_lists = self.get_labels(texts, outputs)
-        for text, pred_list in zip(texts, pred_lists):
-            entity_list = self.get_entity_list(text, pred_list)
-            entity_lists.append(entity_list)
+        """
+        模型输出转为实体列表
+        Args:
+            texts(list): 文本列表
+            outputs(Tensor|tuple): 模型输出，开启confidence时general解码为(标签, 置信度)
+        Returns:
+            entity_lists(list): 每条文本的实体列表，开启confidence时为[[start, end, tag, confidence], ...]
+        """
+        if self.confidence and self.decode_type == "biaffine":
+            y_pred = outputs.detach().cpu().numpy()
+            entity_lists = list()
+            for text, pred in zip(texts, y_pred):
+                text_len = min(self.max_seq_length - 1, len(text) + 1)
+                entity_list = get_biaffine_entities(pred, text_len, self.label_list, self.max_span_len, return_score=True)
+                entity_list.sort(key=lambda x: x[0])
+                entity_lists.append([[start, end, tag, float(score)] for start, end, tag, score in entity_list])
+            return entity_lists
+
+        if self.decode_type == "general":
+            # 直接从标签id中抽取实体，不生成标签字符串
+            pred_ids = outputs[0] if isinstance(outputs, tuple) else outputs
+            pred_ids = pred_ids.detach().cpu().numpy()
+            entity_lists = self.decoder.decode(pred_ids, self.get_decode_lengths(texts, pred_ids), offset=1)
+        else:
+            entity_lists = [self.get_entity_list(text, pred_list)
+                            for text, pred_list in zip(texts, self.get_labels(texts, outputs))]
+        if isinstance(outputs, tuple):
+            confidences = outputs[1].detach().cpu().numpy()
+            for entity_list, confidence in zip(entity_lists, confidences):
+                # 第0个位置是[CLS]
+                for entity in entity_list:
+                    entity.append(float(confidence[entity[0] + 1: entity[1] + 1].min()))
         return entity_lists
     
     def get_entity_list(self, text, tag_list):
@@ -1,24 +1,118 @@
 # -*- coding: utf-8 -*-
 
 import re
+import time
 
-from ..common.load_file import load_re_file
+from ..common.load_file import load_re_patterns
 
 
 class PredictRe:
+    """
+    正则预测：加载时编译好每个类别的正则
+    Args:
+        config(dict): 正则配置，支持两种格式
+            {tag: re_file, ...}
+            {"backend": "re|regex", "merge": False, "tags": {tag: re_file, ...}}
+            merge为True时所有类别合并为一个带命名分组的正则，只扫描一遍文本，
+            此时不同类别的匹配不再重叠，同一位置优先匹配配置中靠前的类别
+    """
     def __init__(self, config) -> None:
+        if "tags" in config:
+            tag_files = config["tags"]
+            backend = config.get("backend", "re")
+            self.merge = config.get("merge", False)
+        else:
+            tag_files = config
+            backend = "re"
+            self.merge = False
+        self.backend = get_backend(backend)
+        self.tag_patterns = dict()
         self.tag_service = dict()
-        for tag in config:
-            re_file = config[tag]
-            self.tag_service[tag] = load_re_file(re_file)
+        for tag in tag_files:
+            self.tag_patterns[tag] = load_re_patterns(tag_files[tag])
+            self.tag_service[tag] = self.backend.compile("|".join(self.tag_patterns[tag]))
 
+        self.merged_service = None
+        self.group_to_tag = dict()
+        if self.merge:
+            group_list = list()
+            for idx, tag in enumerate(self.tag_patterns):
+                group = f"g{idx}"
+                self.group_to_tag[group] = tag
+                group_list.append(f"(?P<{group}>{'|'.join(self.tag_patterns[tag])})")
+            self.merged_service = self.backend.compile("|".join(group_list))
 
     def predict(self, text):
         entity_list = list()
+        if self.merged_service is not None:
+            for match in self.merged_service.finditer(text):
+                start, end = match.span()
+                entity_list.append([start, end, self.group_to_tag[match.lastgroup]])
+            return entity_list
+
         for tag in self.tag_service:
-            matches = re.finditer(self.tag_service[tag], text)
-            if matches:
-                for match in matches:
-                    start, end = match.span()
-                    entity_list.append([start, end, tag])
+            for match in self.tag_service[tag].finditer(text):
+                start, end = match.span()
+                entity_list.append([start, end, tag])
         return entity_list
+
+    def predict_batch(self, texts):
+        """
+        批量预测
+        Args:
+            texts(list): 文本列表
+        Returns:
+            entity_lists(list): 每条文本的实体列表
+        """
+        return [self.predict(text) for text in texts]
+
+    def profile_patterns(self, texts):
+        """
+        逐条正则统计匹配耗时，用于定位回溯严重的正则
+        Args:
+            texts(list): 文本列表
+        Returns:
+            result_list(list): 按总耗时降序排列，每项包括tag/pattern/total_ms/max_ms/matches
+        """
+        result_list = list()
+        for tag in self.tag_patterns:
+            for pattern in self.tag_patterns[tag]:
+                compiled = self.backend.compile(pattern)
+                total_time = 0.0
+                max_time = 0.0
+                matches = 0
+                for text in texts:
+                    start = time.perf_counter()
+                    matches += sum(1 for _ in compiled.finditer(text))
+                    elapsed = time.perf_counter() - start
+                    total_time += elapsed
+                    max_time = max(max_time, elapsed)
+                result_list.append({
+                    "tag": tag,
+                    "pattern": pattern,
+                    "total_ms": round(total_time * 1e3, 3),
+                    "max_ms": round(max_time * 1e3, 3),
+                    "matches": matches
+                })
+        result_list.sort(key=lambda x: x["total_ms"], reverse=True)
+        return result_list
+
+
+def get_backend(backend):
+    """
+    获得正则模块
+    Args:
+        backend(str): re|regex
+    Returns:
+        module(module): 正则模块
+    """
+    if backend == "re":
+        return re
+    elif backend == "regex":
+        try:
+            import regex
+        except ImportError:
+            raise RuntimeError("backend为regex时需要安装regex：pip install regex")
+        return regex
+    else:
+        raise ValueError(f"无效正则模块：{backend}")
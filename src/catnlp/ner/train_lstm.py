@@ -1,5 +1,6 @@
 # -*- coding:utf-8 -*-
 
+import json
 import os
 import logging
 from pathlib import Path
@@ -9,13 +10,15 @@ import numpy as np
 import torch
 import torch.optim as optim
 from torch.optim.lr_scheduler import ReduceLROnPlateau
+from torch.utils.data import Subset
 from torch.utils.tensorboard import SummaryWriter
 
 from .util.progressbar import ProgressBar
 from .util.vocab import Vocab
 from .util.embed import get_embed
 from .util.data import NerLstmDataset, NerLstmDataLoader
-from .util.score import get_f1
+from .util.score import NerScorer
+from .util.meter import PhaseTimer, StepProfiler, get_loss_module
 
 
 class LstmTrain:
@@ -38,13 +41,20 @@ class LstmTrain:
         delimiter = train_cfg["delimiter"]
         vocab = Vocab(pad="<pad>", unk="<unk>")
         vocab.build_vocab(train_file, dev_file,
-                          delimiter=delimiter, count=0)
+                          delimiter=delimiter, count=0,
+                          workers=train_cfg.get("vocab_workers", 1))
         output_dir = Path(train_cfg["output"])
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
         word_file = output_dir / "word.txt"
         label_file = output_dir / "label.txt"
         vocab.save_vocab(word_file, label_file)
+        # PredictLstm按行号加载词典，保存后读回检查索引一致
+        saved_vocab = Vocab(pad="<pad>", unk="<unk>")
+        saved_vocab.load_vocab(word_file, label_file)
+        if saved_vocab.get_word2id() != vocab.get_word2id() or \
+                saved_vocab.get_label2id() != vocab.get_label2id():
+            raise RuntimeError(f"词典文件读回后索引不一致：{word_file}, {label_file}")
 
         model_cfg['word_size'] = vocab.get_word_size()
         model_cfg['label_size'] = vocab.get_label_size()
@@ -53,12 +63,14 @@ class LstmTrain:
         train_data = NerLstmDataset(train_file, vocab, delimiter=delimiter)
         dev_data = NerLstmDataset(dev_file, vocab, delimiter=delimiter)
 
+        self.train_data = train_data
         self.train_loader = NerLstmDataLoader(train_data, train_cfg["batch"], shuffle=True, drop_last=True)
         self.dev_loader = NerLstmDataLoader(dev_data, train_cfg["batch"], shuffle=False, drop_last=False)
 
         # 构建word2vec
         model_cfg["embed"] = \
-            get_embed(train_cfg["embedding"], vocab, model_cfg["word_dim"])
+            get_embed(train_cfg["embedding"], vocab, model_cfg["word_dim"],
+                      format=train_cfg.get("embed_format", "word2vec"))
 
         # 构建模型
         logging.info(model_cfg)
@@ -79,8 +91,26 @@ class LstmTrain:
         summary_dir = output_dir / "summary/"
         self.writer = SummaryWriter(summary_dir)
         self.vocab = vocab
+        self.label_list = [vocab.get_label(idx) for idx in range(vocab.get_label_size())]
         self.train_cfg = train_cfg
+        # 训练集指标：online为训练时按batch累计(dropout下的预测，不额外前向)，
+        # sample为每个epoch结束后在train_eval_size条采样上评估，none为不评估
+        self.train_eval = train_cfg.get("train_eval", "online")
+        if self.train_eval not in ["online", "sample", "none"]:
+            raise ValueError(f"无效train_eval：{self.train_eval}")
+        self.train_eval_size = train_cfg.get("train_eval_size", 1000)
+        # profile配置存在时统计各阶段耗时，损失模块通过forward hook单独计时
+        self.profile_cfg = config.get("profile")
+        self.timer = PhaseTimer(enable=bool(self.profile_cfg), cuda=self.device.type == "cuda")
+        self.timer.watch(get_loss_module(self.model), "loss")
         self.output_model = output_dir / f"{model_name}.pt"
+        # 与word.txt、label.txt和模型文件一起组成PredictLstm使用的模型包
+        bundle_cfg = {key: value for key, value in model_cfg.items() if key != "embed"}
+        bundle_cfg["name"] = config["name"]
+        bundle_cfg["model_file"] = self.output_model.name
+        bundle_cfg["tag_format"] = train_cfg["tag_format"]
+        with open(output_dir / "config.json", "w", encoding="utf-8") as cf:
+            json.dump(bundle_cfg, cf, ensure_ascii=False, indent=2)
 
     def train(self):
         logging.info("开始训练")
@@ -95,42 +125,66 @@ class LstmTrain:
         scheduler = ReduceLROnPlateau(optimizer, 'max', verbose=True, patience=5)
 
         best_f1 = 0.0
+        global_step = 0
+        profile_epoch = self.profile_cfg.get("epoch", 0) if self.profile_cfg else -1
         for epoch in range(self.train_cfg["epoch"]):
             self.model.train()
             bar = ProgressBar(n_total=len(self.train_loader), desc='Training')
-            for step, batch in enumerate(self.train_loader):
-                word_batch, label_batch = batch
-                word_batch = word_batch.to(self.device)
-                label_batch = label_batch.to(self.device)
-                optimizer.zero_grad()
-                loss = self.model(word_batch, label_batch)
-                loss.backward()
-                optimizer.step()
-                bar(step=step, info={'loss': loss.item()})
+            train_scorer = NerScorer(self.label_list) if self.train_eval == "online" else None
+            train_loss = 0.0
+            train_profiler = StepProfiler(self.profile_cfg if epoch == profile_epoch else None, "train")
+            with train_profiler:
+                for step, batch in enumerate(self.timer.iter(self.train_loader, "data")):
+                    word_batch, label_batch = batch
+                    word_batch = word_batch.to(self.device)
+                    label_batch = label_batch.to(self.device)
+                    optimizer.zero_grad()
+                    with self.timer.phase("forward"):
+                        if train_scorer is not None:
+                            loss, pred_ids = self.model.evaluate(word_batch, label_batch)
+                        else:
+                            loss = self.model(word_batch, label_batch)
+                    with self.timer.phase("backward"):
+                        loss.backward()
+                    with self.timer.phase("optimizer"):
+                        optimizer.step()
+                    if train_scorer is not None:
+                        with self.timer.phase("f1"):
+                            train_scorer.update(label_batch, pred_ids, word_batch.gt(0).sum(dim=1), offset=0)
+                    loss_value = loss.item()
+                    train_loss += loss_value
+                    bar(step=step, info={'loss': loss_value})
+                    global_step += 1
+                    if self.timer.enable:
+                        self.writer.add_scalars("phase_time/train", self.timer.pop(), global_step)
+                    train_profiler.step()
                 # if step % 5 == 4:
                 #     f1, dloss = dev(dev_loader)
                 #     print("f1: ", f1)
                 #     print("loss: ", dloss)
                 #     model.train()
 
-            train_f1, train_loss = self.dev(self.train_loader)
-            dev_f1, dev_loss = self.dev(self.dev_loader)
+            train_f1 = None
+            if train_scorer is not None:
+                train_f1 = train_scorer.compute()["total"]["F1"]
+            elif self.train_eval == "sample":
+                train_f1, train_loss = self.dev(self.get_train_sample_loader())
+            # 训练集评估的耗时不计入验证集
+            self.timer.pop()
+            dev_profiler = StepProfiler(self.profile_cfg if epoch == profile_epoch else None, "dev")
+            with dev_profiler:
+                dev_f1, dev_loss = self.dev(self.dev_loader, profiler=dev_profiler)
+            if self.timer.enable:
+                self.writer.add_scalars("phase_time/dev", self.timer.pop(), epoch + 1)
             print()
             logging.info("Epoch: {} 验证集F1: {}".format(epoch + 1, dev_f1))
-            self.writer.add_scalars("f1",
-                            {
-                                "train": round(100 * train_f1, 2),
-                                "dev": round(100 * dev_f1, 2)
-                            },
-                            epoch + 1)
-            self.writer.add_scalars('loss',
-                            {
-                                "train": round(
-                                    train_loss, 2),
-                                "dev": round(dev_loss,
-                                                2)
-                            },
-                            epoch + 1)
+            f1_dict = {"dev": round(100 * dev_f1, 2)}
+            loss_dict = {"dev": round(dev_loss, 2)}
+            if train_f1 is not None:
+                f1_dict["train"] = round(100 * train_f1, 2)
+                loss_dict["train"] = round(train_loss, 2)
+            self.writer.add_scalars("f1", f1_dict, epoch + 1)
+            self.writer.add_scalars('loss', loss_dict, epoch + 1)
 
             if dev_f1 >= best_f1:
                 best_f1 = dev_f1
@@ -140,51 +194,38 @@ class LstmTrain:
 
         logging.info(f"训练完成，best f1: {best_f1}")
 
-    def dev(self, loader):
+    def dev(self, loader, profiler=None):
+        """
+        不计算梯度，一遍前向同时得到损失和预测，按batch累计实体级别的计数
+        Args:
+            loader(DataLoader): 数据
+            profiler(StepProfiler): 每个batch后step
+        Returns:
+            f1(float): 总体F1
+            loss(float): 各batch损失之和
+        """
         self.model.eval()
-        gold_lists, pred_lists = self.generate_result(loader)
-        f1 = get_f1(gold_lists, pred_lists, self.train_cfg["tag_format"])
-        loss = self.get_loss(loader)
-        return f1, loss
-
-    def generate_result(self, loader):
-        gold_list = list()
-        pred_list = list()
-        for batch in loader:
-            word_batch, gold_ids_batch = batch
-            word_batch = word_batch.to(self.device)
-            pred_ids_batch, len_list_batch = self.model(word_batch)
-            gold_lists_batch, pred_lists_batch = self.recover_id_to_tag(
-                gold_ids_batch.tolist(),
-                pred_ids_batch,
-                len_list_batch
-            )
-            gold_list.extend(gold_lists_batch)
-            pred_list.extend(pred_lists_batch)
-        return gold_list, pred_list
-
-    def get_loss(self, loader):
+        scorer = NerScorer(self.label_list)
         loss = 0.0
-        for batch in loader:
-            word_batch, label_batch = batch
-            word_batch = word_batch.to(self.device)
-            label_batch = label_batch.to(self.device)
-            loss_batch = self.model(word_batch, label_batch)
-            loss += loss_batch.item()
-        return loss
-
-    def recover_id_to_tag(self, gold_ids_list, pred_ids_list, len_list):
-        gold_tag_lists = list()
-        pred_tag_lists = list()
-
-        for gold_id_list, pred_id_list, seq_len in \
-                zip(gold_ids_list, pred_ids_list, len_list):
-            tmp_gold_list = list()
-            tmp_pred_list = list()
-            for i in range(seq_len):
-                tmp_gold_list.append(self.vocab.get_label(gold_id_list[i]))
-                tmp_pred_list.append(self.vocab.get_label(pred_id_list[i]))
-            gold_tag_lists.append(tmp_gold_list)
-            pred_tag_lists.append(tmp_pred_list)
-
-        return gold_tag_lists, pred_tag_lists
+        with torch.no_grad():
+            for batch in self.timer.iter(loader, "data"):
+                word_batch, label_batch = batch
+                word_batch = word_batch.to(self.device)
+                label_batch = label_batch.to(self.device)
+                with self.timer.phase("forward"):
+                    loss_batch, pred_ids = self.model.evaluate(word_batch, label_batch)
+                with self.timer.phase("f1"):
+                    scorer.update(label_batch, pred_ids, word_batch.gt(0).sum(dim=1), offset=0)
+                loss += loss_batch.item()
+                if profiler is not None:
+                    profiler.step()
+        return scorer.compute()["total"]["F1"], loss
+
+    def get_train_sample_loader(self):
+        """
+        随机采样train_eval_size条训练数据
+        """
+        sample_size = min(self.train_eval_size, len(self.train_data))
+        indices = random.sample(range(len(self.train_data)), sample_size)
+        return NerLstmDataLoader(Subset(self.train_data, indices), self.train_cfg["batch"],
+                                 shuffle=False, drop_last=False)
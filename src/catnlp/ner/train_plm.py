@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import contextlib
 import logging
 import math
 import os
@@ -22,8 +23,10 @@ from .model.albert_tiny import AlbertTinyCrf, AlbertTinySoftmax
 from .model.bert import BertBiaffine, BertCrf, BertSoftmax, BertLstmCrf
 from .util.data import NerBertDataset, NerBertDataLoader
 from .util.split import recover
-from .util.score import get_f1
+from .util.score import NerScorer, get_f1, pretty_print
 from .util.decode import get_labels
+from .util.distributed import gather_for_eval
+from .util.meter import PhaseTimer, StepProfiler, ThroughputMeter, get_loss_module
 
 
 class PlmTrain:
@@ -68,6 +71,9 @@ class PlmTrain:
         if file_format in ["bio", "bies", "conll"]:
             train_file = input_dir / "train.txt"
             dev_file = input_dir / "dev.txt"
+        elif file_format == "arrow":
+            train_file = input_dir / "train.arrow"
+            dev_file = input_dir / "dev.arrow"
         else:
             train_file = input_dir / "train.json"
             dev_file = input_dir / "dev.json"
@@ -111,6 +117,7 @@ class PlmTrain:
             raise ValueError
         
         pretrained_config.loss_name = config.get("loss_name")
+        pretrained_config.max_span_len = config.get("max_span_len")
 
         model = model_func.from_pretrained(
             config.get("model_path"),
@@ -159,6 +166,12 @@ class PlmTrain:
         device = accelerator.device
         model.to(device)
 
+        # profile配置存在时统计各阶段耗时，损失模块通过forward hook单独计时
+        profile_cfg = config.get("profile")
+        timer = PhaseTimer(enable=bool(profile_cfg), cuda=device.type == "cuda")
+        timer.watch(get_loss_module(model), "loss")
+        profile_epoch = profile_cfg.get("epoch", 0) if profile_cfg else -1
+
         # Prepare everything with our `accelerator`.
         model, optimizer, train_dataloader, dev_dataloader = accelerator.prepare(
             model, optimizer, train_dataloader, dev_dataloader
@@ -168,7 +181,8 @@ class PlmTrain:
         # shorter in multiprocess)
 
         # Scheduler and math around the number of training steps.
-        num_update_steps_per_epoch = math.ceil(len(train_dataloader) / config.get("gradient_accumulation_steps"))
+        gradient_accumulation_steps = config.get("gradient_accumulation_steps")
+        num_update_steps_per_epoch = math.ceil(len(train_dataloader) / gradient_accumulation_steps)
         config["max_train_steps"] = config.get("num_train_epochs") * num_update_steps_per_epoch
 
         lr_scheduler = get_scheduler(
@@ -191,48 +205,96 @@ class PlmTrain:
         # Only show the progress bar once on each machine.
         progress_bar = tqdm(range(config.get("max_train_steps")), disable=not accelerator.is_local_main_process)
         writer = SummaryWriter(config.get("summary"))
+        throughput_meter = ThroughputMeter()
+        logging_steps = config.get("logging_steps", 50)
         completed_steps = 0
+        global_step = 0
         best_f1 = 0
 
         for epoch in range(config.get("num_train_epochs")):
             model.train()
+            throughput_meter.reset()
             train_loss = 0.0
             dev_loss = 0.0
-            for step, batch in enumerate(train_dataloader):
-                inputs = {"input_ids": batch[0], "attention_mask": batch[1], "labels": batch[3], "label_mask": batch[4], "input_len": batch[5]}
-                outputs = model(**inputs)
-                loss = outputs
-                loss = loss / config.get("gradient_accumulation_steps")
-                accelerator.backward(loss)
-                train_loss += loss.item()
-                if step % config.get("gradient_accumulation_steps") == 0 or step == len(train_dataloader) - 1:
-                    optimizer.step()
-                    lr_scheduler.step()
-                    optimizer.zero_grad()
-                    progress_bar.update(1)
-                    completed_steps += 1
-                if completed_steps >= config.get("max_train_steps"):
-                    break
+            train_profiler = StepProfiler(profile_cfg if epoch == profile_epoch else None, "train")
+            with train_profiler:
+                for step, batch in enumerate(timer.iter(train_dataloader, "data")):
+                    # 只在累积窗口的最后一个micro-step同步梯度，其余micro-step跳过DDP的all-reduce
+                    is_update_step = (step + 1) % gradient_accumulation_steps == 0 or step == len(train_dataloader) - 1
+                    if is_update_step or not hasattr(model, "no_sync"):
+                        sync_context = contextlib.nullcontext()
+                    else:
+                        sync_context = model.no_sync()
+                    with sync_context:
+                        inputs = {"input_ids": batch[0], "attention_mask": batch[1], "labels": batch[3], "label_mask": batch[4], "input_len": batch[5]}
+                        with timer.phase("forward"):
+                            outputs = model(**inputs)
+                        loss = outputs
+                        loss = loss / gradient_accumulation_steps
+                        with timer.phase("backward"):
+                            accelerator.backward(loss)
+                    train_loss += loss.item()
+                    throughput_meter.update(examples=batch[0].size(0), tokens=batch[5].sum().item())
+                    if is_update_step:
+                        with timer.phase("optimizer"):
+                            optimizer.step()
+                            lr_scheduler.step()
+                            optimizer.zero_grad()
+                        progress_bar.update(1)
+                        completed_steps += 1
+                        throughput_meter.step()
+                        if completed_steps % logging_steps == 0:
+                            self.log_throughput(accelerator, writer, throughput_meter, completed_steps)
+                    global_step += 1
+                    if timer.enable:
+                        writer.add_scalars("phase_time/train", timer.pop(), global_step)
+                    train_profiler.step()
+                    if completed_steps >= config.get("max_train_steps"):
+                        break
 
             model.eval()
             device_type = device.type
             decode_type = config.get("decode_type")
             pred_lists = list()
             gold_lists = list()
-            for step, batch in enumerate(dev_dataloader):
-                with torch.no_grad():
-                    inputs = {"input_ids": batch[0], "attention_mask": batch[1], "label_mask": batch[4], "input_len": batch[5]}
-                    outputs = model(**inputs)
-                    inputs = {"input_ids": batch[0], "attention_mask": batch[1], "labels": batch[3], "label_mask": batch[4], "input_len": batch[5]}
-                    loss = model(**inputs)
-                    dev_loss += loss.item()
-                labels = batch[3]
-                predictions_gathered = accelerator.gather(outputs)
-                labels_gathered = accelerator.gather(labels)
-                preds, golds = get_labels(predictions_gathered, labels_gathered, label_list, input_len=batch[5], decode_type=decode_type, device=device_type)
-                pred_lists += preds
-                gold_lists += golds
-            
+            # 非split格式的general解码直接在标签id上按batch累计，不再生成标签字符串列表
+            use_scorer = decode_type == "general" and file_format != "split"
+            scorer = NerScorer(label_list) if use_scorer else None
+            samples_seen = 0
+            dev_profiler = StepProfiler(profile_cfg if epoch == profile_epoch else None, "dev")
+            with dev_profiler:
+                for step, batch in enumerate(timer.iter(dev_dataloader, "data")):
+                    with torch.no_grad():
+                        inputs = {"input_ids": batch[0], "attention_mask": batch[1], "label_mask": batch[4], "input_len": batch[5]}
+                        with timer.phase("forward"):
+                            outputs = model(**inputs)
+                        inputs = {"input_ids": batch[0], "attention_mask": batch[1], "labels": batch[3], "label_mask": batch[4], "input_len": batch[5]}
+                        with timer.phase("forward"):
+                            loss = model(**inputs)
+                        dev_loss += loss.item()
+                    labels = batch[3]
+                    # CRF的输出宽度随batch变化，补齐后连同标签和长度一起gather，并去掉重复样本
+                    (predictions_gathered, labels_gathered, input_len_gathered), samples_seen = gather_for_eval(
+                        accelerator, [outputs, labels, batch[5]], samples_seen, len(dev_dataset))
+                    # 解码和评估只在主进程进行
+                    if accelerator.is_main_process:
+                        if use_scorer:
+                            with timer.phase("f1"):
+                                scorer.update(labels_gathered, predictions_gathered, input_len_gathered)
+                        else:
+                            with timer.phase("decode"):
+                                preds, golds = get_labels(predictions_gathered, labels_gathered, label_list, input_len=input_len_gathered, decode_type=decode_type, device=device_type, max_span_len=config.get("max_span_len"))
+                            pred_lists += preds
+                            gold_lists += golds
+                    dev_profiler.step()
+
+            # 各进程的损失求和，与单进程时的累计方式一致
+            losses = accelerator.gather(torch.tensor([train_loss, dev_loss], device=device))
+            train_loss, dev_loss = losses.view(-1, 2).sum(dim=0).tolist()
+            if not accelerator.is_main_process:
+                timer.pop()
+                continue
+
             if file_format == "split":
                 new_pred_lists = list()
                 new_gold_lists = list()
@@ -248,7 +310,15 @@ class PlmTrain:
                 gold_lists = new_gold_lists
             
             accelerator.print(f"\nepoch: {epoch}")
-            f1, table = get_f1(gold_lists, pred_lists, format=file_format)
+            with timer.phase("f1"):
+                if use_scorer:
+                    result_dict = scorer.compute()
+                    f1 = result_dict["total"]["F1"]
+                    table = pretty_print(result_dict)
+                else:
+                    f1, table = get_f1(gold_lists, pred_lists, format=file_format)
+            if timer.enable:
+                writer.add_scalars("phase_time/dev", timer.pop(), epoch + 1)
             writer.add_scalars("f1",
                             {
                                 "dev": round(100*f1, 2)
@@ -269,12 +339,35 @@ class PlmTrain:
             if f1 > best_f1:
                 best_f1 = f1
                 print(table)
+                if use_scorer:
+                    print(scorer.error_table())
+                # 保存去掉DDP包装后的模型，参数名不带module.前缀
+                unwrapped_model = accelerator.unwrap_model(model)
                 output_model = config.get("output")
                 output_model_file = os.path.join(output_model, "pytorch_model.bin")
-                torch.save(model.state_dict(), output_model_file)
+                torch.save(unwrapped_model.state_dict(), output_model_file)
                 output_config_file = os.path.join(output_model, "config.json")
                 with open(output_config_file, 'w') as f:
-                    f.write(model.config.to_json_string())
-                # accelerator.wait_for_everyone()
-                # unwrapped_model = accelerator.unwrap_model(model)
-                # unwrapped_model.save_pretrained(config.get("output"), save_function=accelerator.save)
+                    f.write(unwrapped_model.config.to_json_string())
+
+    def log_throughput(self, accelerator, writer, throughput_meter, completed_steps):
+        """
+        记录训练吞吐量，样本数和token数在所有进程上求和
+        Args:
+            accelerator(Accelerator): accelerator
+            writer(SummaryWriter): tensorboard writer
+            throughput_meter(ThroughputMeter): 吞吐量统计
+            completed_steps(int): 已完成的optimizer step数
+        """
+        examples, tokens, steps = throughput_meter.counts()
+        counts = torch.tensor([examples, tokens], dtype=torch.long, device=accelerator.device)
+        examples, tokens = accelerator.gather(counts).view(-1, 2).sum(dim=0).tolist()
+        result = throughput_meter.compute([examples, tokens, steps])
+        writer.add_scalars("throughput",
+                        {
+                            "tokens_per_sec": round(result["tokens_per_sec"], 2),
+                            "examples_per_sec": round(result["examples_per_sec"], 2),
+                            "steps_per_sec": round(result["steps_per_sec"], 4)
+                        },
+                        completed_steps)
+        throughput_meter.reset()
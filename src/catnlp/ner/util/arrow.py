@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+# 列式存储的NER数据集：Arrow IPC文件，每行一条记录
+#   text(string): 文本
+#   starts(list<int32>), ends(list<int32>), tags(list<string>): 实体的起止位置和类别
+#   offsets(list<int32>): 可选，split格式中各片段在原文中的起始位置
+# 读取时内存映射整个文件，过滤、采样和统计可以直接在列上进行
+
+
+def get_pyarrow():
+    """
+    获得pyarrow模块
+    Returns:
+        module(module): pyarrow
+    """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        raise RuntimeError("arrow格式需要安装pyarrow：pip install pyarrow")
+    return pyarrow
+
+
+def get_schema(with_offsets=False):
+    """
+    获得数据集的schema
+    Args:
+        with_offsets(bool): 是否包括offsets列
+    Returns:
+        schema(Schema): schema
+    """
+    pa = get_pyarrow()
+    fields = [
+        ("text", pa.string()),
+        ("starts", pa.list_(pa.int32())),
+        ("ends", pa.list_(pa.int32())),
+        ("tags", pa.list_(pa.string()))
+    ]
+    if with_offsets:
+        fields.append(("offsets", pa.list_(pa.int32())))
+    return pa.schema(fields)
+
+
+def to_record_batch(records, schema):
+    """
+    记录列表转为RecordBatch
+    Args:
+        records(list): [(text, entities, offsets), ...]，entities为[[start, end, tag], ...]
+        schema(Schema): schema
+    Returns:
+        batch(RecordBatch): RecordBatch
+    """
+    pa = get_pyarrow()
+    columns = {name: list() for name in schema.names}
+    for text, entities, offsets in records:
+        columns["text"].append(text)
+        columns["starts"].append([entity[0] for entity in entities])
+        columns["ends"].append([entity[1] for entity in entities])
+        columns["tags"].append([entity[2] for entity in entities])
+        if "offsets" in columns:
+            columns["offsets"].append(offsets)
+    arrays = [pa.array(columns[name], type=schema.field(name).type) for name in schema.names]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class ArrowWriter:
+    """
+    按批写入Arrow IPC文件
+    Args:
+        target(str): 文件路径
+        with_offsets(bool): 是否包括offsets列
+    """
+    def __init__(self, target, with_offsets=False):
+        pa = get_pyarrow()
+        self.schema = get_schema(with_offsets)
+        self._sink = pa.OSFile(str(target), "wb")
+        self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def write(self, records):
+        """
+        写入一批记录
+        Args:
+            records(list): [(text, entities, offsets), ...]
+        """
+        if not records:
+            return
+        if "offsets" not in self.schema.names and any(offsets is not None for _, _, offsets in records):
+            # schema在写入第一批前确定，之后的offsets不能丢弃
+            raise ValueError("记录中有offsets，但schema中没有offsets列：第一块记录都没有offsets，可以调大chunk_size")
+        self._writer.write_batch(to_record_batch(records, self.schema))
+
+    def close(self):
+        self._writer.close()
+        self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def load_arrow_table(source):
+    """
+    内存映射方式加载Arrow IPC文件，不复制数据
+    Args:
+        source(str): 文件路径
+    Returns:
+        table(Table): 数据表
+    """
+    pa = get_pyarrow()
+    with pa.memory_map(str(source), "r") as source_file:
+        return pa.ipc.open_file(source_file).read_all()
+
+
+def iter_arrow_records(table):
+    """
+    逐条读取数据表中的记录，每次只把一个batch转为python对象
+    Args:
+        table(Table): 数据表
+    Returns:
+        records(generator): (text, entities, offsets)，没有offsets列时offsets为None
+    """
+    with_offsets = "offsets" in table.schema.names
+    for batch in table.to_batches():
+        columns = batch.to_pydict()
+        offset_lists = columns["offsets"] if with_offsets else [None] * batch.num_rows
+        for text, starts, ends, tags, offsets in zip(columns["text"], columns["starts"],
+                                                     columns["ends"], columns["tags"], offset_lists):
+            entities = [[start, end, tag] for start, end, tag in zip(starts, ends, tags)]
+            yield text, entities, offsets
+
+
+def get_tag_values(table):
+    """
+    实体类别及数量，直接在列上统计
+    Args:
+        table(Table): 数据表
+    Returns:
+        tag_dict(dict): 类别 - 数量
+    """
+    import pyarrow.compute as pc
+
+    tags = pc.list_flatten(table.column("tags"))
+    tag_dict = dict()
+    for item in pc.value_counts(tags).to_pylist():
+        tag_dict[item["values"]] = item["counts"]
+    return tag_dict
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# 大文件分块处理：按记录读取，按chunk_size分块，块在进程池中处理，结果按原顺序返回
+
+
+def map_chunks(chunk_func, chunks, workers=1):
+    """
+    按顺序返回每块的处理结果，workers大于1时在进程池中处理
+    Args:
+        chunk_func(callable): 块处理函数，参数为一块记录，多进程时需要可以pickle(模块级函数或其partial)
+        chunks(iterable): 块
+        workers(int): 进程数
+    Returns:
+        outputs(generator): 每块的处理结果
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield chunk_func(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # 最多保留2倍进程数的块在途，内存占用与文件大小无关
+        futures = deque()
+        for chunk in chunks:
+            futures.append(executor.submit(chunk_func, chunk))
+            if len(futures) >= 2 * workers:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+
+
+def iter_records(sf, record_type):
+    """
+    读取记录
+    Args:
+        sf(file): 文件
+        record_type(str): line为每行一条记录，block为空行分隔的记录
+    Returns:
+        records(generator): 记录
+    """
+    if record_type == "block":
+        return iter_blocks(sf)
+    return iter_lines(sf)
+
+
+def iter_lines(sf):
+    """
+    按行读取记录，跳过空行
+    """
+    for line in sf:
+        if line.strip():
+            yield line
+
+
+def iter_blocks(sf):
+    """
+    读取以空行分隔的记录，每条记录为行列表
+    """
+    block = list()
+    for line in sf:
+        line = line.rstrip()
+        if line:
+            block.append(line)
+        elif block:
+            yield block
+            block = list()
+    if block:
+        yield block
+
+
+def iter_chunks(records, chunk_size):
+    """
+    把记录按chunk_size分块
+    """
+    chunk = list()
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = list()
+    if chunk:
+        yield chunk
@@ -1,5 +1,15 @@
 # -*- coding: utf-8 -*-
 
+# 全角转半角：全角空格转为空格，其余全角字符(65281-65374)减去65248
+Q2B_TABLE = {12288: 32, **{code: code - 65248 for code in range(65281, 65375)}}
+
+# 制表符、换行和各种宽度的空格统一为空格
+WHITESPACE_TABLE = {ord(char): 32 for char in "\t\n\r\x0b\x0c\x85\xa0\u1680\u2028\u2029\u202f\u205f"}
+WHITESPACE_TABLE.update({code: 32 for code in range(0x2000, 0x200b)})
+
+CLEAN_TABLE = {**Q2B_TABLE, **WHITESPACE_TABLE}
+
+
 def strQ2B(ustr):
     """
     全角转半角
@@ -8,28 +18,56 @@ def strQ2B(ustr):
     Returns:
         rstring(str): 半角字符串
     """
-    rstring = ""
-    for uchar in ustr:
-        inside_code = ord(uchar)
-        if inside_code == 12288:  # 全角空格直接转换
-            inside_code = 32
-        elif 65281 <= inside_code <= 65374:  # 全角字符（除空格）根据关系转化
-            inside_code -= 65248
-        rstring += chr(inside_code)
-    return rstring
+    return ustr.translate(Q2B_TABLE)
+
+
+def get_clean_table(mapping=None):
+    """
+    获得清理用的转换表，默认为全角转半角和空白归一化，可以加上自定义映射。
+    只允许单个字符到单个字符的映射，保证清理前后长度和位置不变，实体位置仍然有效
+    Args:
+        mapping(dict|str): 自定义映射{原字符: 新字符}，或yaml文件路径
+    Returns:
+        table(dict): str.translate使用的转换表
+    """
+    table = dict(CLEAN_TABLE)
+    if not mapping:
+        return table
+    if isinstance(mapping, str):
+        from ...common.load_file import load_config_file
+        mapping = load_config_file(mapping) or dict()
+    for source, target in mapping.items():
+        source = str(source)
+        target = str(target)
+        if len(source) != 1 or len(target) != 1:
+            raise ValueError(f"清理映射必须是单个字符到单个字符：{source} -> {target}")
+        table[ord(source)] = ord(target)
+    return table
 
 
-def clean_text(text):
+def clean_text(text, table=None):
     """
-    清理文本
+    清理文本，清理前后长度不变
     Args:
         text(str): 任意文本
+        table(dict): 转换表，默认为CLEAN_TABLE
     Returns:
         text(str): 清理文本
     """
-    text = strQ2B(text)
-    text = text.replace("\t", " ")
-    return text
+    return text.translate(CLEAN_TABLE if table is None else table)
+
+
+def clean_texts(texts, table=None):
+    """
+    批量清理文本
+    Args:
+        texts(list): 文本列表
+        table(dict): 转换表，默认为CLEAN_TABLE
+    Returns:
+        texts(list): 清理后的文本列表
+    """
+    table = CLEAN_TABLE if table is None else table
+    return [text.translate(table) for text in texts]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_left, bisect_right
+
+
+class IntervalSet:
+    """
+    已选中的不重叠区间，按(start, end)有序保存，用二分查找判断重叠
+    区间[s1, e1)与[s2, e2)重叠的条件与原实现一致：s1 < e2 and s2 < e1
+    Example:
+        >>> interval_set = IntervalSet()
+        >>> interval_set.add(0, 3)
+        >>> interval_set.overlaps(2, 4)
+        True
+    """
+    def __init__(self):
+        self._keys = list()
+        self._starts = list()
+        self._ends = list()
+
+    def overlaps(self, start, end):
+        """
+        是否与已选中的区间重叠
+        Args:
+            start(int): 起始位置
+            end(int): 结束位置(不包含)
+        Returns:
+            is_overlap(bool): 是否重叠
+        """
+        # 已选区间互不重叠，按(start, end)排序后end也是非降的，
+        # start < end的区间中end最大的就是最后一个
+        idx = bisect_left(self._starts, end)
+        return idx > 0 and self._ends[idx - 1] > start
+
+    def add(self, start, end):
+        """
+        加入区间，调用方需保证不与已选区间重叠
+        Args:
+            start(int): 起始位置
+            end(int): 结束位置(不包含)
+        """
+        idx = bisect_right(self._keys, (start, end))
+        self._keys.insert(idx, (start, end))
+        self._starts.insert(idx, start)
+        self._ends.insert(idx, end)
+
+
+def greedy_scheduling(interval_list, key, get_span):
+    """
+    贪心区间调度：按key降序依次选择不与已选区间重叠的区间
+    Args:
+        interval_list(list): 区间列表
+        key(callable): 排序键，相同键保持原顺序
+        get_span(callable): 获得区间的(start, end)
+    Returns:
+        scheduling_list(list): 去重区间列表
+    """
+    scheduling_list = list()
+    interval_set = IntervalSet()
+    for interval in sorted(interval_list, key=key, reverse=True):
+        start, end = get_span(interval)
+        if not interval_set.overlaps(start, end):
+            interval_set.add(start, end)
+            scheduling_list.append(interval)
+    return scheduling_list
+
+
+def longest_interval_scheduling(interval_list):
+    """
+    最长区间调度：优先选择长度长的区间
+    Args:
+        interval_list(list): 区间列表
+    Returns:
+        scheduling_list(list): 去重实体列表
+    """
+    return greedy_scheduling(interval_list, lambda x: x['len'],
+                             lambda x: (x['start'], x['end']))
+
+
+def most_interval_scheduling(interval_list):
+    """
+    最多区间调度：优先选择'end'值小的区间
+    Args:
+        interval_list(list): 区间列表
+    Returns:
+        scheduling_list(list): 去重实体列表
+    """
+    scheduling_list = list()
+    sorted_interval_list = sorted(interval_list,
+                                  key=lambda x: x['end'])
+    size = len(sorted_interval_list)
+    scheduling_list.append(sorted_interval_list[0])
+    for i in range(1, size):
+        if scheduling_list[-1]['end'] <= sorted_interval_list[i]['start']:
+            scheduling_list.append(sorted_interval_list[i])
+
+    return scheduling_list
+
+
+def maximum_interval_scheduling(interval_list):
+    """
+    最大区间调度
+    Args:
+        interval_list(list): 区间列表
+    Returns:
+        scheduling_list(list): 去重实体列表
+    """
+    scheduling_list = list()
+    sorted_interval_list = sorted(interval_list,
+                                  key=lambda x: x['end'])
+    size = len(sorted_interval_list)
+    max_value = [0] * size
+    is_use = [False] * size
+    last_idx = [-1] * size
+    max_value[0] = sorted_interval_list[0]['len']
+    is_use[0] = True
+
+    for i in range(1, size):
+
+        j = find_no_overlap(sorted_interval_list,
+                            sorted_interval_list[i]['start'],
+                            i)
+        tmp_value = sorted_interval_list[i]['len']
+        if j >= 0:
+            tmp_value += max_value[j]
+            last_idx[i] = j
+
+        if tmp_value > max_value[i - 1]:
+            max_value[i] = tmp_value
+            is_use[i] = True
+        else:
+            max_value[i] = max_value[i - 1]
+            last_idx[i] = i - 1
+
+    idx = size - 1
+    while idx >= 0:
+        if is_use[idx]:
+            scheduling_list.append(sorted_interval_list[idx])
+        idx = last_idx[idx]
+
+    return scheduling_list
+
+
+def weighted_interval_scheduling(interval_list):
+    """
+    最大区间调度
+    Args:
+        interval_list(list): 区间列表
+    Returns:
+        scheduling_list(list): 去重实体列表
+    """
+    scheduling_list = list()
+    sorted_interval_list = sorted(interval_list,
+                                  key=lambda x: x['end'])
+    size = len(sorted_interval_list)
+    max_value = [0] * size
+    is_use = [False] * size
+    last_idx = [-1] * size
+    max_value[0] = sorted_interval_list[0]['len'] * \
+                   sorted_interval_list[0]['weight']
+    is_use[0] = True
+
+    for i in range(1, size):
+
+        j = find_no_overlap(sorted_interval_list,
+                            sorted_interval_list[i]['start'],
+                            i)
+        tmp_value = sorted_interval_list[i]['len'] * \
+                    sorted_interval_list[i]['weight']
+        if j >= 0:
+            tmp_value += max_value[j]
+            last_idx[i] = j
+
+        if tmp_value > max_value[i - 1]:
+            max_value[i] = tmp_value
+            is_use[i] = True
+        else:
+            max_value[i] = max_value[i - 1]
+            last_idx[i] = i - 1
+
+    idx = size - 1
+    while idx >= 0:
+        if is_use[idx]:
+            scheduling_list.append(sorted_interval_list[idx])
+        idx = last_idx[idx]
+
+    return scheduling_list
+
+
+def vote_interval_scheduling(interval_list):
+    """
+    投票区间调度：相同区间的权重累加，优先选择票数多、长度长的区间
+    Args:
+        interval_list(list): 区间列表
+    Returns:
+        scheduling_list(list): 去重实体列表
+    """
+    vote_dict = dict()
+    for interval in interval_list:
+        key = (interval['start'], interval['end'], interval['tag'])
+        if key in vote_dict:
+            vote_dict[key]['weight'] += interval['weight']
+        else:
+            vote_dict[key] = dict(interval)
+    return greedy_scheduling(vote_dict.values(), lambda x: (x['weight'], x['len']),
+                             lambda x: (x['start'], x['end']))
+
+
+def find_no_overlap(interval_list, start, size):
+    left = -1
+    right = size
+    while right >= left:
+        mid = int((left + right) / 2)
+        if interval_list[mid]['end'] > start:
+            right = mid - 1
+        else:
+            left = mid + 1
+    return left - 1
+
+
+
+
+def merge_entities(entity_list):
+    """
+    实体去冲突：优先选择长度长的实体
+    Args:
+        entity_list(list): [[start, end, tag, ...], ...]
+    Returns:
+        entity_list(list): 去冲突后的实体列表
+    """
+    return greedy_scheduling(entity_list, lambda x: x[1] - x[0],
+                             lambda x: (x[0], x[1]))
+
+
+def vote_entities(entity_list):
+    """
+    实体投票去冲突：优先选择票数多、长度长的实体
+    Args:
+        entity_list(list): [[start, end, tag, count], ...]
+    Returns:
+        entity_list(list): 去冲突后的实体列表
+    """
+    return greedy_scheduling(entity_list, lambda x: (x[3], x[1] - x[0]),
+                             lambda x: (x[0], x[1]))
@@ -85,10 +85,8 @@ class NerLstmDataset(Dataset):
         for (ex_index, data) in enumerate(datas):
             if ex_index < 3:
                 print(data)
-            word_ids = [vocab.get_word_id(x) for x in data[0]]
-            label_ids = [vocab.get_label_id(x) for x in data[1]]
-            word_ids = torch.tensor(word_ids, dtype=torch.long)
-            label_ids = torch.tensor(label_ids, dtype=torch.long)
+            word_ids = torch.from_numpy(vocab.encode(data[0]))
+            label_ids = torch.from_numpy(vocab.encode_labels(data[1]))
             features.append([word_ids, label_ids])
         return features
 
@@ -146,6 +144,8 @@ class NerBertDataset(Dataset):
             return self._load_biaffine_file(data_file)
         elif file_format == "bies":
             return self._load_bies_file(data_file, delimiter)
+        elif file_format == "arrow":
+            return self._load_arrow_file(data_file)
         else:
             return self._load_conll_file(data_file, delimiter)
 
@@ -249,6 +249,34 @@ class NerBertDataset(Dataset):
         self.offset_lists = list()
         return datas
     
+    def _load_arrow_file(self, data_file):
+        """
+        加载arrow格式的数据集文件，文件内存映射，标签集合直接在列上统计
+        Args:
+            data_file(str): 数据集文件路径
+        Returns: 无
+        """
+        from .arrow import get_tag_values, iter_arrow_records, load_arrow_table
+
+        table = load_arrow_table(data_file)
+        label_set = set(["O"])
+        for tag in get_tag_values(table):
+            label_set.add(f"B-{tag}")
+            label_set.add(f"I-{tag}")
+        datas = list()
+        for text, entities, _ in iter_arrow_records(table):
+            tag_list = ["O"] * len(text)
+            for start, end, tag in entities:
+                tag_list[start] = f"B-{tag}"
+                for i in range(start+1, end):
+                    tag_list[i] = f"I-{tag}"
+            datas.append([text, tag_list])
+        self.label_list = ["[PAD]"] + sorted(list(label_set))
+        self.label_to_id = {label: idx for idx, label in enumerate(self.label_list)}
+        self.contents = list()
+        self.offset_lists = list()
+        return datas
+
     def _load_split_file(self, data_file):
         """
         加载数据集文件
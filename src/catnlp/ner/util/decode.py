@@ -1,7 +1,143 @@
 import numpy as np
+import torch
 
+from .conflict import greedy_scheduling
 
-def get_labels(predictions, references, label_list, input_len, decode_type="general", device="cpu"):
+
+class TagDecoder:
+    """
+    直接从标签id中抽取实体，规则与get_interval一致：开始标签(B/S)、前一个为O或类别不同时开始新实体。
+    按标签预先算好前缀和类别的查找数组，一个batch一次向量化处理，只有调用to_tags时才生成标签字符串
+    Args:
+        label_list(list): 标签列表，标签形如O、B-X、I-X、E-X、S-X，其余(如[PAD])视为O
+        pad_id(int): 输出标签字符串时该id输出为O，为None时按label_list输出
+    Example:
+        >>> decoder = TagDecoder(label_list, pad_id=0)
+        >>> entity_lists = decoder.decode(pred_ids, input_len, offset=1)
+    """
+    def __init__(self, label_list, pad_id=None):
+        self.label_list = list(label_list)
+        self.type_list = list()
+        type_to_id = dict()
+        # 0: O, 1: 开始(B/S), 2: 延续(I/E)；末尾多一个O，用于填充无效位置，
+        # 标签id 0不一定是O(如BiLSTM的标签按出现顺序编号)
+        self.prefix_array = np.zeros(len(label_list) + 1, dtype=np.int8)
+        self.type_array = np.full(len(label_list) + 1, -1, dtype=np.int64)
+        self.o_id = len(label_list)
+        for idx, label in enumerate(label_list):
+            if len(label) < 3 or label[1] != "-":
+                continue
+            tag = label[2:]
+            if tag not in type_to_id:
+                type_to_id[tag] = len(self.type_list)
+                self.type_list.append(tag)
+            self.prefix_array[idx] = 1 if label[0] in ["B", "S"] else 2
+            self.type_array[idx] = type_to_id[tag]
+        tag_list = self.label_list + ["O"]
+        if pad_id is not None:
+            tag_list[pad_id] = "O"
+        self.tag_array = np.array(tag_list, dtype=object)
+
+    def to_numpy(self, ids):
+        """
+        Tensor、ndarray或列表转为int64数组，长度不同的二维列表末尾补0
+        """
+        if isinstance(ids, torch.Tensor):
+            return ids.detach().cpu().numpy().astype(np.int64, copy=False)
+        if isinstance(ids, np.ndarray):
+            return ids.astype(np.int64, copy=False)
+        ids = list(ids)
+        if not ids or np.ndim(ids[0]) == 0:
+            return np.asarray(ids, dtype=np.int64)
+        width = max((len(row) for row in ids), default=0)
+        array = np.zeros([len(ids), width], dtype=np.int64)
+        for idx, row in enumerate(ids):
+            array[idx, :len(row)] = row
+        return array
+
+    def align(self, ids, lengths, offset=0, width=None):
+        """
+        只保留[offset, length)的位置，其余位置和补齐的列填为O
+        Args:
+            ids(Tensor|ndarray|list): (batch_size, seq_length)的标签id
+            lengths(Tensor|ndarray|list): 每条样本的长度
+            offset(int): 起始位置，跳过[CLS]
+            width(int): 输出宽度，默认为seq_length + 1，保证每行末尾至少有一个O，实体不会跨行
+        Returns:
+            ids(ndarray): (batch_size, width)的标签id
+        """
+        ids = self.to_numpy(ids).reshape(len(lengths), -1)
+        lengths = self.to_numpy(lengths).reshape(-1, 1)
+        if width is None:
+            width = ids.shape[1] + 1
+        positions = np.arange(width)
+        valid = (positions >= offset) & (positions < lengths)
+        ids = np.pad(ids[:, :width], ((0, 0), (0, max(width - ids.shape[1], 0))))
+        return np.where(valid, ids, self.o_id)
+
+    def get_flat_spans(self, ids):
+        """
+        Args:
+            ids(ndarray): align后的标签id，每行末尾至少有一个O
+        Returns:
+            starts(ndarray): 实体在展平后的起始位置
+            ends(ndarray): 实体在展平后的结束位置(不包含)
+            types(ndarray): 实体类别
+        """
+        flat_ids = ids.reshape(-1)
+        prefixes = self.prefix_array[flat_ids]
+        types = self.type_array[flat_ids]
+        is_entity = prefixes > 0
+        prev_types = np.concatenate([[-1], types[:-1]])
+        is_start = is_entity & ((prefixes == 1) | (prev_types != types))
+        next_is_inside = np.concatenate([is_entity[1:] & ~is_start[1:], [False]])
+        is_end = is_entity & ~next_is_inside
+        starts = np.flatnonzero(is_start)
+        ends = np.flatnonzero(is_end) + 1
+        return starts, ends, types[starts]
+
+    def get_spans(self, ids, lengths, offset=0):
+        """
+        Args:
+            ids(Tensor|ndarray|list): (batch_size, seq_length)的标签id
+            lengths(Tensor|ndarray|list): 每条样本的长度，只解码[offset, length)的位置
+            offset(int): 起始位置，跳过[CLS]
+        Returns:
+            rows(ndarray): 实体所在样本
+            starts(ndarray): 实体起始位置，从offset开始计
+            ends(ndarray): 实体结束位置(不包含)
+            types(ndarray): 实体类别
+        """
+        ids = self.align(ids, lengths, offset)
+        width = ids.shape[1]
+        starts, ends, types = self.get_flat_spans(ids)
+        rows = starts // width
+        offsets = rows * width + offset
+        return rows, starts - offsets, ends - offsets, types
+
+    def decode(self, ids, lengths, offset=0):
+        """
+        Returns:
+            entity_lists(list): 每条样本的实体列表[[start, end, tag], ...]
+        """
+        rows, starts, ends, types = self.get_spans(ids, lengths, offset)
+        bounds = np.searchsorted(rows, np.arange(len(lengths) + 1)).tolist()
+        entities = [[start, end, self.type_list[tag_type]]
+                    for start, end, tag_type in zip(starts.tolist(), ends.tolist(), types.tolist())]
+        return [entities[bounds[idx]: bounds[idx + 1]] for idx in range(len(lengths))]
+
+    def to_tags(self, ids, lengths, offset=0):
+        """
+        Returns:
+            tag_lists(list): 每条样本[offset, length)位置的标签
+        """
+        ids = self.to_numpy(ids)
+        lengths = self.to_numpy(lengths).reshape(-1).tolist()
+        tags = self.tag_array[ids]
+        return [tags[idx, offset: length].tolist() for idx, length in enumerate(lengths)]
+
+
+def get_labels(predictions, references, label_list, input_len, decode_type="general", device="cpu", max_span_len=None):
     if device == "cpu":
         y_pred = predictions.detach().clone().numpy()
         y_true = references.detach().clone().numpy()
@@ -13,76 +149,80 @@ def get_labels(predictions, references, label_list, input_len, decode_type="gene
     if decode_type == "general":
         return get_general_labels(y_pred, y_true, label_list, input_len)
     elif decode_type == "biaffine":
-        return get_biaffine_labels(y_pred, y_true, label_list, input_len)
+        return get_biaffine_labels(y_pred, y_true, label_list, input_len, max_span_len)
     else:
         raise ValueError
 
 
 def get_general_labels(y_pred, y_true, label_list, input_len):
-    preds = list()
-    golds = list()
-    for pred, gold, max_len in zip(y_pred, y_true, input_len):
-        tmp_preds = list()
-        tmp_golds = list()
-        for i in range(1, max_len):
-            p = pred[i]
-            g = gold[i]
-            if g == 0:
-                tmp_golds.append("O")
-            else:
-                tmp_golds.append(label_list[g])
-            if p == 0:
-                tmp_preds.append("O")
-            else:
-                tmp_preds.append(label_list[p])
-        preds.append(tmp_preds)
-        golds.append(tmp_golds)
+    decoder = TagDecoder(label_list, pad_id=0)
+    preds = decoder.to_tags(y_pred, input_len, offset=1)
+    golds = decoder.to_tags(y_true, input_len, offset=1)
     return preds, golds
 
 
-def get_biaffine_labels(y_pred, y_true, label_list, input_len):
+def get_biaffine_labels(y_pred, y_true, label_list, input_len, max_span_len=None):
     preds = list()
     golds = list()
     for pred, gold, max_len in zip(y_pred, y_true, input_len):
-        pred_entities = list()
-        gold_entities = list()
-
-        for i in range(1, max_len):
-            for j in range(i, max_len):
-                pred_scores = pred[i][j]
-                pred_label_id = np.argmax(pred_scores)
-                gold_label_id = gold[i][j]
-                if gold_label_id > 0:
-                    gold_entities.append([i-1, j, label_list[gold_label_id]])
-                    if pred_label_id > 0:
-                        pred_entities.append([i-1, j, label_list[pred_label_id], pred_scores[pred_label_id]])
-
-        pred_entities = sorted(pred_entities, reverse=True, key=lambda x:x[3])
-        new_pred_entities = list()
-        for pred_entity in pred_entities:
-            start, end, tag, _ = pred_entity
-            flag = True
-            for new_pred_entity in new_pred_entities:
-                new_start, new_end, _ = new_pred_entity
-                if start < new_end and new_start < end:
-                    #for flat ner nested mentions are not allowed
-                    flag = False
-                    break
-            if flag:
-                new_pred_entities.append([start, end, tag])
-        pred_entities = new_pred_entities
-        tmp_preds = ["O"] * max_len
-        tmp_golds = ["O"] * max_len
-        for entity in pred_entities:
-            start, end, tag = entity
-            tmp_preds[start] = f"B-{tag}"
-            for i in range(start+1, end):
-                tmp_preds[i] = f"I-{tag}"
-        for entity in gold_entities:
-            start, end, tag = entity
-            tmp_golds[start] = f"B-{tag}"
-            for i in range(start+1, end):
-                tmp_golds[i] = f"I-{tag}"
-        preds.append(tmp_preds)
-        golds.append(tmp_golds)
+        pred_entities = get_biaffine_entities(pred, max_len, label_list, max_span_len)
+        # 标签始终是稠密矩阵
+        i, j = np.nonzero(np.triu(gold[1:max_len, 1:max_len]))
+        gold_entities = [[start, end + 1, label_list[gold[start + 1][end + 1]]] for start, end in zip(i, j)]
+        preds.append(entities_to_tags(pred_entities, max_len))
+        golds.append(entities_to_tags(gold_entities, max_len))
     return preds, golds
+
+
+def get_biaffine_entities(pred, max_len, label_list, max_span_len=None, return_score=False):
+    """
+    从span打分中取出候选实体，再按分数贪心去掉重叠的实体
+    Args:
+        pred(ndarray): 稠密打分(seq_len, seq_len, num_labels)，
+            或max_span_len不为空时的带状打分(seq_len, span_len, num_labels)
+        max_len(int): 解码长度，token i对应字符i - 1
+        label_list(list): 标签列表
+        max_span_len(int): 最大span长度
+        return_score(bool): 是否返回实体的概率
+    Returns:
+        entity_list(list): [[start, end, tag], ...]，return_score为True时为[[start, end, tag, score], ...]
+    """
+    if max_span_len:
+        scores = pred[1:max_len]
+        label_ids = scores.argmax(axis=-1)
+        i, k = np.nonzero(label_ids > 0)
+        j = i + k
+        valid = j < max_len - 1
+        i, j, k = i[valid], j[valid], k[valid]
+        label_ids = label_ids[i, k]
+        label_scores = scores[i, k, label_ids]
+    else:
+        scores = pred[1:max_len, 1:max_len]
+        label_ids = scores.argmax(axis=-1)
+        i, j = np.nonzero(np.triu(label_ids > 0))
+        label_ids = label_ids[i, j]
+        label_scores = scores[i, j, label_ids]
+    candidate_list = [[start, end + 1, label_list[label_id], score]
+                      for start, end, label_id, score in zip(i.tolist(), j.tolist(), label_ids.tolist(), label_scores.tolist())]
+    # for flat ner nested mentions are not allowed
+    candidate_list = greedy_scheduling(candidate_list, lambda x: x[3], lambda x: (x[0], x[1]))
+    if return_score:
+        return candidate_list
+    return [[start, end, tag] for start, end, tag, _ in candidate_list]
+
+
+def entities_to_tags(entity_list, length):
+    """
+    实体列表转为BIO标签
+    Args:
+        entity_list(list): [[start, end, tag], ...]
+        length(int): 标签长度
+    Returns:
+        tag_list(list): BIO标签
+    """
+    tag_list = ["O"] * length
+    for start, end, tag in entity_list:
+        tag_list[start] = f"B-{tag}"
+        for i in range(start + 1, end):
+            tag_list[i] = f"I-{tag}"
+    return tag_list
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+import torch
+
+
+def pad_across_processes(accelerator, tensor, pad_index=0):
+    """
+    把张量除第0维以外的维度补齐到所有进程中的最大值，之后才能gather
+    Args:
+        accelerator(Accelerator): accelerator
+        tensor(Tensor): 本进程的张量
+        pad_index(int): 补齐的值
+    Returns:
+        tensor(Tensor): 补齐后的张量
+    """
+    if accelerator.num_processes == 1:
+        return tensor
+    size = torch.tensor(tensor.shape, device=tensor.device)
+    max_size = accelerator.gather(size[None]).max(dim=0).values
+    if torch.equal(max_size[1:], size[1:]):
+        return tensor
+    new_tensor = tensor.new_full((tensor.size(0),) + tuple(max_size[1:].tolist()), pad_index)
+    new_tensor[tuple(slice(0, dim) for dim in tensor.shape)] = tensor
+    return new_tensor
+
+
+def gather_for_eval(accelerator, tensors, samples_seen, num_samples, pad_index=0):
+    """
+    补齐后gather验证集的预测、标签和长度，并去掉最后一个batch中为了各进程均分而重复的样本
+    Args:
+        accelerator(Accelerator): accelerator
+        tensors(list): 本进程的张量列表，第0维为batch
+        samples_seen(int): 之前已经gather到的样本数
+        num_samples(int): 验证集样本数
+        pad_index(int): 补齐的值
+    Returns:
+        gathered_list(list): gather后的张量列表，顺序与数据集一致
+        samples_seen(int): 累计的样本数
+    """
+    gathered_list = [accelerator.gather(pad_across_processes(accelerator, tensor, pad_index)) for tensor in tensors]
+    batch_size = gathered_list[0].size(0)
+    if samples_seen + batch_size > num_samples:
+        batch_size = max(num_samples - samples_seen, 0)
+        gathered_list = [gathered[:batch_size] for gathered in gathered_list]
+    return gathered_list, samples_seen + batch_size
@@ -1,13 +1,19 @@
 # -*- coding: utf-8 -*-
 
+from pathlib import Path
+
 import numpy as np
 
+# 二进制词向量：{prefix}.npy为float32矩阵，每行一个词，按原文件顺序；
+# {prefix}.words.npy为排序后的词，{prefix}.index.npy为排序后每个词在矩阵中的行号。
+# 加载时三个文件都内存映射，二分查找词典中的词后只读取命中的行
+
 
 def get_embed(embed_file, vocab, embed_dim=100, format="word2vec"):
     """
     获得词向量
     Args:
-        embed_file(str): 词向量文件路径
+        embed_file(str): 词向量文件路径，后缀为.npy时为convert_word2vec转换后的二进制文件
         vocab(Vocab): 词典类
         embed_dim(int): 词向量维度
         format(str): 词向量文件格式
@@ -25,7 +31,7 @@ def get_word2vec(embed_file, vocab, embed_dim):
     """
     获得word2vec词向量
     Args:
-        embed_file(str): 词向量文件路径
+        embed_file(str): 词向量文件路径，文本格式或.npy二进制格式
         vocab(Vocab): 词典类
         embed_dim(int): 词向量维度
     Returns: word2vec词向量
@@ -41,7 +47,10 @@ def get_word2vec(embed_file, vocab, embed_dim):
     match = 0
     not_match = 0
     word2id = vocab.get_word2id()
-    embed_dict = load_embed_file(embed_file, embed_dim)
+    if str(embed_file).endswith(".npy"):
+        embed_dict = load_embed_npy(embed_file, list(word2id), embed_dim)
+    else:
+        embed_dict = load_embed_file(embed_file, embed_dim, words=word2id)
     for word, idx in word2id.items():
         if word in embed_dict:
             word2vec[idx, :] = embed_dict[word]
@@ -55,24 +64,185 @@ def get_word2vec(embed_file, vocab, embed_dim):
     return word2vec
 
 
-def load_embed_file(embed_file, embed_dim):
+def iter_embed_file(embed_file, embed_dim):
     """
-    加载词向量文件
+    逐行读取文本格式的词向量，跳过首行的"词数 维度"和长度不对的行
     Args:
         embed_file(str): 词向量文件路径
         embed_dim(int): 词向量维度
-    Returns: 词向量矩阵
+    Returns:
+        items(generator): (word, values)，values为字符串列表
+    """
+    with open(embed_file, 'r', encoding='utf-8') as rf:
+        for line in rf:
+            tokens = line.split()
+            lens = len(tokens)
+            if lens <= embed_dim:
+                continue
+            yield " ".join(tokens[: lens - embed_dim]), tokens[lens - embed_dim:]
+
+
+def load_embed_file(embed_file, embed_dim, words=None):
     """
+    加载文本格式的词向量文件
+    Args:
+        embed_file(str): 词向量文件路径
+        embed_dim(int): 词向量维度
+        words(set|dict): 只保留这些词，为None时保留全部
+    Returns: 词 - 词向量
+    """
+    header = read_embed_header(embed_file)
+    if header is not None and header[1] != embed_dim:
+        raise ValueError(f"词向量维度不一致：{embed_file}为{header[1]}维，配置的word_dim为{embed_dim}")
     embed_dict = dict()
+    for word, values in iter_embed_file(embed_file, embed_dim):
+        if words is not None and word not in words:
+            continue
+        embed = np.empty([1, embed_dim])
+        embed[:] = values
+        embed_dict[word] = embed
+    return embed_dict
+
+
+def get_npy_files(target):
+    """
+    Args:
+        target(str): 矩阵文件路径{prefix}.npy
+    Returns:
+        words_file(Path): 排序后的词
+        index_file(Path): 排序后每个词的行号
+    """
+    prefix = str(Path(target).with_suffix(""))
+    return Path(f"{prefix}.words.npy"), Path(f"{prefix}.index.npy")
+
+
+def read_embed_header(embed_file):
+    """
+    读取文件首行的"词数 维度"
+    Returns:
+        header(tuple): (词数, 维度)，没有时为None
+    """
     with open(embed_file, 'r', encoding='utf-8') as rf:
+        tokens = rf.readline().split()
+    if len(tokens) == 2 and all(token.isdigit() for token in tokens):
+        return int(tokens[0]), int(tokens[1])
+    return None
+
+
+def convert_word2vec(embed_file, target=None, embed_dim=None, chunk_size=10000):
+    """
+    文本格式的词向量转为二进制格式，只需要转换一次，内存占用与文件大小无关(词表除外)
+    Args:
+        embed_file(str): 文本格式的词向量文件路径
+        target(str): 矩阵文件路径，默认为embed_file换成.npy后缀
+        embed_dim(int): 词向量维度，文件首行有"词数 维度"时可以不填
+        chunk_size(int): 每次写入的行数
+    Returns:
+        target(Path): 矩阵文件路径
+    """
+    target = Path(target) if target else Path(embed_file).with_suffix(".npy")
+    header = read_embed_header(embed_file)
+    if header is not None:
+        embed_dim = header[1]
+    if not embed_dim:
+        raise ValueError("文件首行没有词向量维度，需要指定embed_dim")
+    # 按非空行数分配矩阵，首行和长度不对的行跳过，矩阵末尾多出的行保持为0且不进入词表
+    with open(embed_file, 'r', encoding='utf-8') as rf:
+        num_rows = sum(1 for line in rf if not line.isspace())
+
+    matrix = np.lib.format.open_memmap(target, mode="w+", dtype=np.float32, shape=(num_rows, embed_dim))
+    word_list = list()
+    row = 0
+    with open(embed_file, 'r', encoding='utf-8') as rf:
+        if header is not None:
+            rf.readline()
+        lines = list()
         for line in rf:
-            line = line.strip()
-            if not line:
+            if line.isspace():
                 continue
+            lines.append(line)
+            if len(lines) >= chunk_size:
+                row = write_rows(matrix, row, lines, embed_dim, word_list)
+                lines = list()
+        if lines:
+            row = write_rows(matrix, row, lines, embed_dim, word_list)
+    matrix.flush()
+    del matrix
+
+    # 稳定排序，重复的词在查找时取最后一个，与加载为词典时一致
+    words = np.array(word_list)
+    order = np.argsort(words, kind="stable")
+    words_file, index_file = get_npy_files(target)
+    np.save(words_file, words[order])
+    np.save(index_file, order.astype(np.int64))
+    return target
+
+
+def write_rows(matrix, row, lines, embed_dim, word_list):
+    """
+    解析一块词向量写入矩阵。先按第一个空格切出词，数值部分用np.loadtxt一次解析；
+    有词中带空格或长度不对的行时，这一块逐行按空白切分
+    Args:
+        matrix(ndarray): 内存映射的矩阵
+        row(int): 写入的起始行
+        lines(list): 文本行
+        embed_dim(int): 词向量维度
+        word_list(list): 写入的词追加在后面
+    Returns:
+        row(int): 下一块的起始行
+    """
+    words = list()
+    values_list = list()
+    for line in lines:
+        word, _, values = line.strip().partition(" ")
+        words.append(word)
+        values_list.append(values)
+    try:
+        values = np.loadtxt(values_list, dtype=np.float32, comments=None, ndmin=2)
+    except ValueError:
+        values = None
+    if values is None or values.shape != (len(lines), embed_dim):
+        words = list()
+        values_list = list()
+        for line in lines:
             tokens = line.split()
             lens = len(tokens)
-            embed = np.empty([1, embed_dim])
-            embed[:] = tokens[lens - embed_dim:]
-            word = " ".join(tokens[: lens - embed_dim])
-            embed_dict[word] = embed
-    return embed_dict
+            if lens <= embed_dim:
+                continue
+            words.append(" ".join(tokens[: lens - embed_dim]))
+            values_list.append(tokens[lens - embed_dim:])
+        values = np.array(values_list, dtype=np.float32).reshape(len(words), embed_dim)
+    matrix[row: row + len(words)] = values
+    word_list.extend(words)
+    return row + len(words)
+
+
+def load_embed_npy(embed_file, words, embed_dim=None):
+    """
+    内存映射二进制词向量，只读取words中命中的行
+    Args:
+        embed_file(str): 矩阵文件路径
+        words(list): 需要的词
+        embed_dim(int): 词向量维度，不为None时检查与矩阵的列数一致
+    Returns: 词 - 词向量
+    """
+    words_file, index_file = get_npy_files(embed_file)
+    matrix = np.load(embed_file, mmap_mode="r")
+    if embed_dim is not None and matrix.shape[1] != embed_dim:
+        raise ValueError(f"词向量维度不一致：{embed_file}为{matrix.shape[1]}维，配置的word_dim为{embed_dim}")
+    sorted_words = np.load(words_file, mmap_mode="r")
+    index = np.load(index_file, mmap_mode="r")
+    if not words or sorted_words.size == 0:
+        return dict()
+
+    query = np.array(words)
+    pos = np.searchsorted(sorted_words, query, side="right") - 1
+    valid = pos >= 0
+    valid[valid] = sorted_words[pos[valid]] == query[valid]
+    hit_words = query[valid]
+    rows = np.asarray(index[pos[valid]])
+    # 按行号顺序读取，减少随机读
+    order = np.argsort(rows)
+    vectors = np.empty([rows.size, matrix.shape[1]], dtype=np.float32)
+    vectors[order] = matrix[rows[order]]
+    return {str(word): vector for word, vector in zip(hit_words, vectors)}
@@ -1,12 +1,20 @@
 # -*- coding: utf-8 -*-
 
+from .conflict import (
+    longest_interval_scheduling,
+    maximum_interval_scheduling,
+    most_interval_scheduling,
+    vote_interval_scheduling,
+    weighted_interval_scheduling
+)
+
 
 def merge_tag_lists(tag_lists, method="longest", weight_list=None, format="bio"):
     """
     合并标签序列组
     Args:
         tag_lists(list): 标签序列组
-        method(str): 合并策略(longest|most|maximum|weighted)
+        method(str): 合并策略(longest|most|maximum|weighted|vote)
         weight_list(list): 权重列表
         format(str): 标签序列格式(bio|bioes)
     Returns:
@@ -92,7 +100,7 @@ def merge_strategy(tag_lists, method, weight_list=None, format="bio"):
     合并策略
     Args:
         tag_lists(list): 标签序列组
-        method(str): 合并策略(longest|most|maximum|weighted)
+        method(str): 合并策略(longest|most|maximum|weighted|vote)
         weight_list(list): 权重列表
         format(str): 标签序列格式(bio|bioes)
     Returns:
@@ -117,175 +125,14 @@ def merge_strategy(tag_lists, method, weight_list=None, format="bio"):
         scheduling_list = maximum_interval_scheduling(interval_list)
     elif method == "weighted":
         scheduling_list = weighted_interval_scheduling(interval_list)
+    elif method == "vote":
+        scheduling_list = vote_interval_scheduling(interval_list)
     else:
-        raise ValueError("select in {longest|most|maximum|weighted}")
-
-    return scheduling_list
-
-
-def longest_interval_scheduling(interval_list):
-    """
-    最长区间调度：优先选择长度长的区间
-    Args:
-        interval_list(list): 区间列表
-    Returns:
-        scheduling_list(list): 去重实体列表
-    """
-    scheduling_list = list()
-    sorted_interval_list = sorted(interval_list,
-                                  key=lambda x: x['len'], reverse=True)
-    scheduling_list.append(sorted_interval_list[0])
-    compare_list = [[sorted_interval_list[0]['start'],
-                    sorted_interval_list[0]['end']]]
-    size = len(sorted_interval_list)
-    for i in range(1, size):
-        current = [sorted_interval_list[i]['start'],
-                   sorted_interval_list[i]['end']]
-        compare_list, is_overlap = extend_compare_list(current, compare_list)
-        if not is_overlap:
-            scheduling_list.append(sorted_interval_list[i])
-
-    return scheduling_list
-
-
-def extend_compare_list(interval, compare_list):
-    for compare in compare_list:
-        if interval[0] < compare[1] and \
-                compare[0] < interval[1]:
-            return compare_list, True
-    compare_list.append(interval)
-    return compare_list, False
-
-
-def most_interval_scheduling(interval_list):
-    """
-    最多区间调度：优先选择'end'值小的区间
-    Args:
-        interval_list(list): 区间列表
-    Returns:
-        scheduling_list(list): 去重实体列表
-    """
-    scheduling_list = list()
-    sorted_interval_list = sorted(interval_list,
-                                  key=lambda x: x['end'])
-    size = len(sorted_interval_list)
-    scheduling_list.append(sorted_interval_list[0])
-    for i in range(1, size):
-        if scheduling_list[-1]['end'] <= sorted_interval_list[i]['start']:
-            scheduling_list.append(sorted_interval_list[i])
-
-    return scheduling_list
-
-
-def maximum_interval_scheduling(interval_list):
-    """
-    最大区间调度
-    Args:
-        interval_list(list): 区间列表
-    Returns:
-        scheduling_list(list): 去重实体列表
-    """
-    scheduling_list = list()
-    sorted_interval_list = sorted(interval_list,
-                                  key=lambda x: x['end'])
-    size = len(sorted_interval_list)
-    max_value = [0] * size
-    is_use = [False] * size
-    last_idx = [-1] * size
-    max_value[0] = sorted_interval_list[0]['len']
-    is_use[0] = True
-
-    for i in range(1, size):
-
-        j = find_no_overlap(sorted_interval_list,
-                            sorted_interval_list[i]['start'],
-                            i)
-        tmp_value = sorted_interval_list[i]['len']
-        if j >= 0:
-            tmp_value += max_value[j]
-            last_idx[i] = j
-
-        if tmp_value > max_value[i - 1]:
-            max_value[i] = tmp_value
-            is_use[i] = True
-        else:
-            max_value[i] = max_value[i - 1]
-            last_idx[i] = i - 1
-
-    idx = size - 1
-    while idx >= 0:
-        if is_use[idx]:
-            scheduling_list.append(sorted_interval_list[idx])
-        idx = last_idx[idx]
+        raise ValueError("select in {longest|most|maximum|weighted|vote}")
 
     return scheduling_list
 
 
-def weighted_interval_scheduling(interval_list):
-    """
-    最大区间调度
-    Args:
-        interval_list(list): 区间列表
-    Returns:
-        scheduling_list(list): 去重实体列表
-    """
-    scheduling_list = list()
-    sorted_interval_list = sorted(interval_list,
-                                  key=lambda x: x['end'])
-    size = len(sorted_interval_list)
-    max_value = [0] * size
-    is_use = [False] * size
-    last_idx = [-1] * size
-    max_value[0] = sorted_interval_list[0]['len'] * \
-                   sorted_interval_list[0]['weight']
-    is_use[0] = True
-
-    for i in range(1, size):
-
-        j = find_no_overlap(sorted_interval_list,
-                            sorted_interval_list[i]['start'],
-                            i)
-        tmp_value = sorted_interval_list[i]['len'] * \
-                    sorted_interval_list[i]['weight']
-        if j >= 0:
-            tmp_value += max_value[j]
-            last_idx[i] = j
-
-        if tmp_value > max_value[i - 1]:
-            max_value[i] = tmp_value
-            is_use[i] = True
-        else:
-            max_value[i] = max_value[i - 1]
-            last_idx[i] = i - 1
-
-    idx = size - 1
-    while idx >= 0:
-        if is_use[idx]:
-            scheduling_list.append(sorted_interval_list[idx])
-        idx = last_idx[idx]
-
-    return scheduling_list
-
-
-def find_no_overlap(interval_list, start, size):
-    left = -1
-    right = size
-    while right >= left:
-        mid = int((left + right) / 2)
-        if interval_list[mid]['end'] > start:
-            right = mid - 1
-        else:
-            left = mid + 1
-    return left - 1
-
-
-def find_no_overlap1(interval_list, start, size):
-    for i in range(size - 1, -1, -1):
-        if interval_list[i]["end"] <= start:
-            return i
-    return -1
-
-
 def get_interval(tag_list, weight=1, format="bio"):
     if format == "bio":
         entity_list = get_interval_bio(tag_list, weight)
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+import contextlib
+import os
+import time
+from collections import defaultdict
+
+import torch
+
+
+class ThroughputMeter:
+    """
+    吞吐量统计
+    Example:
+        >>> meter = ThroughputMeter()
+        >>> meter.update(examples=16, tokens=512)
+        >>> meter.step()
+        >>> meter.compute()
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        重置计数和计时起点
+        """
+        self._start_time = time.perf_counter()
+        self._examples = 0
+        self._tokens = 0
+        self._steps = 0
+
+    def update(self, examples, tokens):
+        """
+        累计一个micro-step的样本数和token数
+        Args:
+            examples(int): 样本数
+            tokens(int): token数
+        """
+        self._examples += examples
+        self._tokens += tokens
+
+    def step(self):
+        """
+        累计一次optimizer step
+        """
+        self._steps += 1
+
+    def counts(self):
+        """
+        获得当前累计的样本数、token数和optimizer step数
+        Returns:
+            counts(list): [examples, tokens, steps]
+        """
+        return [self._examples, self._tokens, self._steps]
+
+    def compute(self, counts=None):
+        """
+        计算吞吐量
+        Args:
+            counts(list): 汇总后的[examples, tokens, steps]，默认使用本进程计数
+        Returns:
+            result(dict): examples/tokens/steps每秒数
+        """
+        if counts is None:
+            counts = self.counts()
+        examples, tokens, steps = counts
+        elapsed = max(time.perf_counter() - self._start_time, 1e-6)
+        return {
+            "examples_per_sec": examples / elapsed,
+            "tokens_per_sec": tokens / elapsed,
+            "steps_per_sec": steps / elapsed
+        }
+
+
+class PhaseTimer:
+    """
+    分阶段计时，嵌套阶段的耗时不计入外层阶段
+    Example:
+        >>> timer = PhaseTimer()
+        >>> for batch in timer.iter(loader, "data"):
+        >>>     with timer.phase("forward"):
+        >>>         model(batch)
+        >>> timer.pop()
+    """
+    def __init__(self, enable=True, cuda=False):
+        self.enable = enable
+        self.cuda = cuda
+        self._stack = list()
+        self._times = defaultdict(float)
+
+    def _now(self):
+        if self.cuda:
+            torch.cuda.synchronize()
+        return time.perf_counter()
+
+    def _enter(self, name):
+        self._stack.append([name, self._now(), 0.0])
+
+    def _exit(self, name):
+        end = self._now()
+        phase_name, start, child_time = self._stack.pop()
+        assert phase_name == name, f"阶段不匹配：{phase_name} != {name}"
+        elapsed = end - start
+        self._times[name] += elapsed - child_time
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        统计一个阶段的耗时
+        Args:
+            name(str): 阶段名
+        """
+        if not self.enable:
+            yield
+            return
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit(name)
+
+    def iter(self, iterable, name="data"):
+        """
+        统计迭代器取数据的耗时
+        Args:
+            iterable(iterable): 数据迭代器，如DataLoader
+            name(str): 阶段名
+        """
+        if not self.enable:
+            yield from iterable
+            return
+        iterator = iter(iterable)
+        while True:
+            self._enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self._exit(name)
+                return
+            self._exit(name)
+            yield item
+
+    def watch(self, module, name):
+        """
+        通过forward hook统计子模块的耗时，如CRF或损失函数
+        Args:
+            module(nn.Module): 子模块
+            name(str): 阶段名
+        Returns:
+            handles(list): hook句柄
+        """
+        if not self.enable or module is None:
+            return list()
+        pre_handle = module.register_forward_pre_hook(lambda m, i: self._enter(name))
+        post_handle = module.register_forward_hook(lambda m, i, o: self._exit(name))
+        return [pre_handle, post_handle]
+
+    def pop(self):
+        """
+        获得累计的各阶段耗时(毫秒)并清零
+        Returns:
+            times(dict): 阶段名 - 耗时
+        """
+        times = {name: round(value * 1e3, 3) for name, value in self._times.items()}
+        self._times = defaultdict(float)
+        return times
+
+
+class StepProfiler:
+    """
+    用torch.profiler记录前若干个step，并导出chrome trace
+    Args:
+        profile_cfg(dict): profile配置，包括wait/warmup/active/output/record_shapes/profile_memory
+        name(str): trace文件名前缀
+    """
+    def __init__(self, profile_cfg, name):
+        self.enable = bool(profile_cfg)
+        self._profiler = None
+        self._num_steps = 0
+        if not self.enable:
+            return
+        self._wait = profile_cfg.get("wait", 1)
+        self._warmup = profile_cfg.get("warmup", 1)
+        self._active = profile_cfg.get("active", 5)
+        self._record_shapes = profile_cfg.get("record_shapes", False)
+        self._profile_memory = profile_cfg.get("profile_memory", False)
+        self._output = profile_cfg.get("output", "profile")
+        self._name = name
+        os.makedirs(self._output, exist_ok=True)
+
+    def _on_trace_ready(self, profiler):
+        trace_file = os.path.join(self._output, f"{self._name}_{int(time.time())}.json")
+        profiler.export_chrome_trace(trace_file)
+        print(f"\nprofile trace: {trace_file}")
+
+    def __enter__(self):
+        if self.enable:
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            self._profiler = torch.profiler.profile(
+                activities=activities,
+                schedule=torch.profiler.schedule(wait=self._wait, warmup=self._warmup, active=self._active),
+                on_trace_ready=self._on_trace_ready,
+                record_shapes=self._record_shapes,
+                profile_memory=self._profile_memory
+            )
+            self._profiler.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._profiler is not None:
+            self._profiler.__exit__(exc_type, exc_value, traceback)
+            self._profiler = None
+
+    def step(self):
+        """
+        推进profiler的schedule，只记录第一个wait+warmup+active周期
+        """
+        if self._profiler is None:
+            return
+        if self._num_steps < self._wait + self._warmup + self._active:
+            self._profiler.step()
+            self._num_steps += 1
+
+
+def get_loss_module(model):
+    """
+    获得模型中计算损失的子模块，用于单独统计CRF/biaffine损失耗时
+    Args:
+        model(nn.Module): 模型
+    Returns:
+        module(nn.Module): crf或损失函数模块，没有则返回None
+    """
+    for name in ["crf", "loss_func", "loss"]:
+        module = getattr(model, name, None)
+        if isinstance(module, torch.nn.Module):
+            return module
+    return None
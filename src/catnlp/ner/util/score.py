@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 from collections import defaultdict
 
+import numpy as np
 from prettytable import PrettyTable
 
+from .decode import TagDecoder
 from .merge import get_interval
 
     
@@ -63,3 +65,160 @@ def f1_score(gold_set, pred_set):
     else:
         f1 = float(2 * p * r) / (p + r)
     return {"P": p, "R": r, "F1": f1, "Equal": equal_num}
+
+
+class NerScorer:
+    """
+    流式的实体级别评估，直接处理标签id，按batch累计各类别的计数
+    Args:
+        label_list(list): 标签列表，标签形如O、B-X、I-X、E-X、S-X，[PAD]视为O
+    Example:
+        >>> scorer = NerScorer(label_list)
+        >>> scorer.update(gold_ids, pred_ids, input_len)
+        >>> f1 = scorer.compute()["total"]["F1"]
+    """
+    def __init__(self, label_list):
+        self.decoder = TagDecoder(label_list)
+        self.type_list = self.decoder.type_list
+        self.reset()
+
+    def reset(self):
+        """
+        清零计数
+        """
+        num_types = len(self.type_list)
+        self.gold_counts = np.zeros(num_types, dtype=np.int64)
+        self.pred_counts = np.zeros(num_types, dtype=np.int64)
+        self.equal_counts = np.zeros(num_types, dtype=np.int64)
+        self.boundary_counts = np.zeros(num_types, dtype=np.int64)
+        self.spurious_counts = np.zeros(num_types, dtype=np.int64)
+        self.confusion = np.zeros((num_types, num_types), dtype=np.int64)
+
+    def update(self, gold_ids, pred_ids, lengths, offset=1):
+        """
+        累计一个batch
+        Args:
+            gold_ids(Tensor|ndarray): (batch_size, seq_length)的标注标签id
+            pred_ids(Tensor|ndarray): (batch_size, seq_length')的预测标签id，宽度不同时补0
+            lengths(Tensor|ndarray): 每条样本的长度，只评估[offset, length)的位置
+            offset(int): 起始位置，跳过[CLS]
+        """
+        gold_ids = self.decoder.to_numpy(gold_ids)
+        pred_ids = self.decoder.to_numpy(pred_ids)
+        width = max(gold_ids.shape[1], pred_ids.shape[1]) + 1
+        gold_ids = self.decoder.align(gold_ids, lengths, offset, width)
+        pred_ids = self.decoder.align(pred_ids, lengths, offset, width)
+
+        gold_starts, gold_ends, gold_types = self.decoder.get_flat_spans(gold_ids)
+        pred_starts, pred_ends, pred_types = self.decoder.get_flat_spans(pred_ids)
+        num_types = len(self.type_list)
+        size = gold_ids.size + 1
+        gold_keys = (gold_starts * size + gold_ends) * num_types + gold_types
+        pred_keys = (pred_starts * size + pred_ends) * num_types + pred_types
+        is_equal = np.isin(pred_keys, gold_keys, assume_unique=True)
+
+        self.gold_counts += np.bincount(gold_types, minlength=num_types)
+        self.pred_counts += np.bincount(pred_types, minlength=num_types)
+        self.equal_counts += np.bincount(pred_types[is_equal], minlength=num_types)
+        self._update_errors(gold_starts, gold_ends, gold_types,
+                            pred_starts[~is_equal], pred_ends[~is_equal], pred_types[~is_equal])
+
+    def _update_errors(self, gold_starts, gold_ends, gold_types, pred_starts, pred_ends, pred_types):
+        """
+        错误预测分为三类：边界一致类别错误、类别一致边界错误、其余(多预测)
+        """
+        num_types = len(self.type_list)
+        if not len(pred_starts):
+            return
+        # 标注实体互不重叠且有序，与[start, end)重叠的是下标在[lo, hi)内的实体
+        lo = np.searchsorted(gold_ends, pred_starts, side="right")
+        hi = np.searchsorted(gold_starts, pred_ends, side="left")
+        counts = np.maximum(hi - lo, 0)
+        owners = np.repeat(np.arange(len(pred_starts)), counts)
+        gold_idx = np.repeat(lo, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        same_span = (gold_starts[gold_idx] == pred_starts[owners]) & (gold_ends[gold_idx] == pred_ends[owners])
+        same_type = gold_types[gold_idx] == pred_types[owners]
+        is_type_error = np.zeros(len(pred_starts), dtype=bool)
+        is_type_error[owners[same_span]] = True
+        is_boundary_error = np.zeros(len(pred_starts), dtype=bool)
+        is_boundary_error[owners[same_type]] = True
+        is_boundary_error &= ~is_type_error
+        is_spurious = ~(is_type_error | is_boundary_error)
+
+        np.add.at(self.confusion, (gold_types[gold_idx[same_span]], pred_types[owners[same_span]]), 1)
+        self.boundary_counts += np.bincount(pred_types[is_boundary_error], minlength=num_types)
+        self.spurious_counts += np.bincount(pred_types[is_spurious], minlength=num_types)
+
+    def compute(self):
+        """
+        计算各类别和总体的P/R/F1，格式与get_f1一致，只包含标注中出现的类别
+        Returns:
+            result_dict(dict): 类别 - {"P", "R", "F1", "Equal"}
+        """
+        result_dict = dict()
+        for idx, tag in enumerate(self.type_list):
+            if self.gold_counts[idx] > 0:
+                result_dict[tag] = prf_score(self.gold_counts[idx], self.pred_counts[idx], self.equal_counts[idx])
+        result_dict["total"] = prf_score(self.gold_counts.sum(), self.pred_counts.sum(), self.equal_counts.sum())
+        return result_dict
+
+    def compute_errors(self):
+        """
+        错误分析
+        Returns:
+            error_dict(dict): 按预测类别统计的类别错误type/边界错误boundary/多预测spurious，
+                              按标注类别统计的漏预测missed，以及标注类别 - 预测类别的混淆计数confusion
+        """
+        error_dict = dict()
+        type_errors = self.confusion.sum(axis=0)
+        for idx, tag in enumerate(self.type_list):
+            error_dict[tag] = {
+                "type": int(type_errors[idx]),
+                "boundary": int(self.boundary_counts[idx]),
+                "spurious": int(self.spurious_counts[idx]),
+                "missed": int(self.gold_counts[idx] - self.equal_counts[idx])
+            }
+        confusion = dict()
+        for gold_idx, pred_idx in zip(*np.nonzero(self.confusion)):
+            confusion[(self.type_list[gold_idx], self.type_list[pred_idx])] = int(self.confusion[gold_idx, pred_idx])
+        error_dict["confusion"] = confusion
+        return error_dict
+
+    def error_table(self):
+        """
+        错误分析表
+        Returns:
+            table(PrettyTable): 每个预测类别的错误计数，以及类别错误中最常见的标注类别
+        """
+        error_dict = self.compute_errors()
+        table = PrettyTable()
+        table.field_names = ["Label", "Type", "Boundary", "Spurious", "Missed", "Should be"]
+        for idx, tag in enumerate(self.type_list):
+            errors = error_dict[tag]
+            confused = ""
+            if self.confusion[:, idx].sum() > 0:
+                gold_idx = int(self.confusion[:, idx].argmax())
+                confused = f"{self.type_list[gold_idx]}({self.confusion[gold_idx, idx]})"
+            table.add_row([tag, errors["type"], errors["boundary"], errors["spurious"], errors["missed"], confused])
+        return table
+
+
+def prf_score(gold_num, pred_num, equal_num):
+    """
+    根据计数计算P/R/F1，与f1_score一致
+    Args:
+        gold_num(int): 标注实体数
+        pred_num(int): 预测实体数
+        equal_num(int): 预测正确的实体数
+    Returns:
+        score(dict): {"P", "R", "F1", "Equal"}
+    """
+    gold_num, pred_num, equal_num = int(gold_num), int(pred_num), int(equal_num)
+    p = float(equal_num) / pred_num if pred_num > 0 else 0
+    r = float(equal_num) / gold_num if gold_num > 0 else 0
+    if not p or not r:
+        f1 = 0
+    else:
+        f1 = float(2 * p * r) / (p + r)
+    return {"P": p, "R": r, "F1": f1, "Equal": equal_num}
@@ -1,76 +1,139 @@
-import re
+from .conflict import merge_entities
+
+# 句子分隔符，"."只有前后都不是数字时才算分隔符
+DELIMITERS = "。？?，,；;！!."
+
+
+def get_delimiter_positions(text):
+    """
+    找出所有分隔符的位置，每种分隔符用str.find在C层面扫描，Python只处理命中的位置
+    Args:
+        text(str): 文本
+    Returns:
+        positions(list): 升序的分隔符位置
+    """
+    text_len = len(text)
+    positions = list()
+    for char in DELIMITERS:
+        idx = text.find(char)
+        while idx >= 0:
+            if char != "." or not ((idx > 0 and text[idx - 1].isdigit()) or
+                                   (idx + 1 < text_len and text[idx + 1].isdigit())):
+                positions.append(idx)
+            idx = text.find(char, idx + 1)
+    positions.sort()
+    return positions
+
+
+def get_pieces(text):
+    """
+    把文本切分为片段，每个分隔符单独成为一个片段
+    Args:
+        text(str): 文本
+    Returns:
+        starts(list): 各片段的起始位置，最后加上len(text)
+        is_sents(list): 各片段是否为句子(非分隔符)
+    """
+    starts = list()
+    is_sents = list()
+    pre_end = 0
+    for idx in get_delimiter_positions(text):
+        if pre_end < idx:
+            starts.append(pre_end)
+            is_sents.append(True)
+        starts.append(idx)
+        is_sents.append(False)
+        pre_end = idx + 1
+    if pre_end < len(text):
+        starts.append(pre_end)
+        is_sents.append(True)
+    starts.append(len(text))
+    return starts, is_sents
 
 
 def cut(text, tags=None, max_len=256, overlap_len=50):
-    sents = re.split(r'([。？?，,；;！!]|(?<!\d)\.(?!\d))', text)
-    sents_len = len(sents)
-    offset_list = list()
-    i = 0
-    end_idx = 0
+    """
+    把长文本切分为有重叠的片段：每个句子前面拼上总长度小于overlap_len的前文(不以分隔符开头)，
+    后面拼上后文直到总长度达到max_len。片段的起止位置用双指针在片段起始位置(前缀和)上移动，
+    整体为O(n)
+    Args:
+        text(str): 文本
+        tags(list): 每个字的bio标签
+        max_len(int): 片段最大长度，单个句子超过时不再切分
+        overlap_len(int): 与前文的重叠长度上限
+    Returns:
+        sent_list(list): 片段列表
+        entity_lists(list): 各片段中的实体，没有tags时为空列表
+        offset_list(list): 各片段在文本中的起始位置
+    """
+    starts, is_sents = get_pieces(text)
+    num_pieces = len(is_sents)
+    # 每个位置之后第一个句子片段，用于去掉前文开头的分隔符
+    next_sents = [num_pieces] * (num_pieces + 1)
+    for k in range(num_pieces - 1, -1, -1):
+        next_sents[k] = k if is_sents[k] else next_sents[k + 1]
+
+    entities = get_entity_list(tags) if tags else list()
     sent_list = list()
-    tag_lists = list()
     entity_lists = list()
-    while i < sents_len:
-        sent = sents[i]
-        sent_len = len(sent)
-        end_idx += sent_len
-        if not sent or re.match(r'([。？?，,；;！!]|(?<!\d)\.(?!\d))', sent):
-            i += 1
-            continue
-        # 搜索前缀
-        pre_list = list()
-        pre_list_len = 0
-        j = i - 1
-        while j >= 0:
-            sent_j = sents[j]
-            sent_j_len = len(sent_j)
-            if pre_list_len + sent_j_len < overlap_len:
-                pre_list.append(sent_j)
-                pre_list_len += sent_j_len
-            else:
-                break
-            j -= 1
-        pre_idx = 0
-        pre_list = pre_list[::-1]
-        for tmp_sent in pre_list:
-            if not tmp_sent or re.match(r'([。？?，,；;！!]|(?<!\d)\.(?!\d))', tmp_sent):
-                pre_idx += 1
-                pre_list_len -= len(tmp_sent)
-            else:
-                break
-        pre_list = pre_list[pre_idx:]
-
-        # 搜索后缀
-        post_list = list()
-        post_list_len = 0
+    offset_list = list()
+    pre_idx = 0
+    entity_idx = 0
+    i = next_sents[0]
+    while i < num_pieces:
+        # 前文：最早的片段j满足starts[i] - starts[j] < overlap_len
+        while pre_idx < i and starts[i] - starts[pre_idx] >= overlap_len:
+            pre_idx += 1
+        start_idx = starts[next_sents[pre_idx]]
+        # 后文：加入片段j直到starts[j + 1] - start_idx达到max_len
         j = i + 1
-        while j < sents_len:
-            sent_j = sents[j]
-            sent_j_len = len(sent_j)
-            if pre_list_len + sent_len + post_list_len + sent_j_len < max_len:
-                post_list.append(sent_j)
-                post_list_len += sent_j_len
-            else:
-                break
+        while j < num_pieces and starts[j + 1] - start_idx < max_len:
             j += 1
-        
-        # 拼接
-        sent = "".join(pre_list + [sent] + post_list)
-        sent_list.append(sent)
-        end_idx += post_list_len
-        start_idx = end_idx - len(sent)
+        end_idx = starts[j]
+        sent_list.append(text[start_idx: end_idx])
         offset_list.append(start_idx)
         if tags:
-            tag_list = tags[start_idx: end_idx]
-            tag_lists.append(tag_list)
-            entity_list = get_entity_list(tag_list)
+            while entity_idx < len(entities) and entities[entity_idx][1] <= start_idx:
+                entity_idx += 1
+            entity_list = list()
+            k = entity_idx
+            while k < len(entities) and entities[k][0] < end_idx:
+                start, end, tag = entities[k]
+                entity_list.append([max(start, start_idx) - start_idx, min(end, end_idx) - start_idx, tag])
+                k += 1
             entity_lists.append(entity_list)
-        i = j
-
-    if valid(text, sent_list, offset_list):
-        return sent_list, entity_lists, offset_list
-    else:
-        raise ValueError
+        i = next_sents[j]
+
+    return sent_list, entity_lists, offset_list
+
+
+def cut_batch(texts, tags_list=None, max_len=256, overlap_len=50):
+    """
+    批量切分
+    Args:
+        texts(list): 文本列表
+        tags_list(list): 各文本的bio标签，可以为None
+        max_len(int): 片段最大长度
+        overlap_len(int): 与前文的重叠长度上限
+    Returns:
+        sent_lists(list): 各文本的片段列表
+        entity_lists(list): 各文本各片段中的实体
+        offset_lists(list): 各文本各片段的起始位置
+        doc_idx_list(list): 展平后每个片段所属的文本序号，便于把片段放在同一个batch里预测后还原
+    """
+    if tags_list is None:
+        tags_list = [None] * len(texts)
+    sent_lists = list()
+    entity_lists = list()
+    offset_lists = list()
+    doc_idx_list = list()
+    for doc_idx, (text, tags) in enumerate(zip(texts, tags_list)):
+        sent_list, entity_list, offset_list = cut(text, tags, max_len, overlap_len)
+        sent_lists.append(sent_list)
+        entity_lists.append(entity_list)
+        offset_lists.append(offset_list)
+        doc_idx_list.extend([doc_idx] * len(sent_list))
+    return sent_lists, entity_lists, offset_lists, doc_idx_list
 
 
 def recover(text, tag_lists, offset_list):
@@ -113,21 +176,6 @@ def get_entity_list(tag_list):
     return entity_list
 
 
-def merge_entities(entity_list):
-    sorted_entity_list = sorted(entity_list, key=lambda i: i[1]-i[0], reverse=True)
-    new_entity_list = list()
-    is_appear_list = [False] * len(entity_list)
-    for idx, entity in enumerate(sorted_entity_list):
-        if is_appear_list[idx]:
-            continue
-        new_entity_list.append(entity)
-        for idy, tmp_entity in enumerate(sorted_entity_list[idx:]):
-            if entity[0] < tmp_entity[1] and \
-                    tmp_entity[0] < entity[1]:
-                is_appear_list[idx+idy] = True
-    return new_entity_list
-
-
 def valid(text, sent_list, offset_list):
     for offset, sent in zip(offset_list, sent_list):
         sent_len = len(sent)
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+import math
+from collections import Counter
+
+
+class RunningStats:
+    """
+    单遍统计数量、均值、标准差(Welford)、最小值和最大值，可以合并
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """
+        合并另一部分数据的统计(Chan等的并行算法)
+        Args:
+            other(RunningStats): 另一部分数据的统计
+        """
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self):
+        """
+        总体标准差，与np.std一致
+        """
+        if self.count == 0:
+            return 0.0
+        return math.sqrt(self.m2 / self.count)
+
+
+class IntHistogram:
+    """
+    整数值的直方图，内存只与不同取值的个数有关，分位数是精确的
+    """
+    def __init__(self):
+        self.counter = Counter()
+        self.count = 0
+
+    def update(self, value, count=1):
+        self.counter[value] += count
+        self.count += count
+
+    def merge(self, other):
+        self.counter.update(other.counter)
+        self.count += other.count
+
+    def quantile(self, q):
+        """
+        分位数，与排序后取sorted_values[int(count * q)]一致
+        Args:
+            q(float): 0到1之间
+        Returns:
+            value(int): 分位数，没有数据时为None
+        """
+        if self.count == 0:
+            return None
+        rank = min(int(self.count * q), self.count - 1)
+        cumulative = 0
+        for value in sorted(self.counter):
+            cumulative += self.counter[value]
+            if cumulative > rank:
+                return value
+        return None
+
+    def items(self):
+        """
+        Returns:
+            items(list): 按取值排序的(取值, 数量)
+        """
+        return sorted(self.counter.items())
+
+
+class NerStats:
+    """
+    NER数据集的流式统计：文本长度、实体长度、类别频次、嵌套和交叉实体数，
+    各部分统计可以合并，用于多进程分块统计
+    """
+    def __init__(self):
+        self.text_len = RunningStats()
+        self.text_len_hist = IntHistogram()
+        self.entity_len = RunningStats()
+        self.entity_len_hist = IntHistogram()
+        self.tag_counter = Counter()
+        self.label_counter = Counter()
+        self.nested = 0
+        self.overlap = 0
+
+    @property
+    def count(self):
+        return self.text_len.count
+
+    def update(self, text, entities, labels=None):
+        """
+        加入一条记录
+        Args:
+            text(str): 文本
+            entities(list): [[start, end, tag], ...]
+            labels(list): 每个字的标签，conll格式才有
+        """
+        text_len = len(text)
+        self.text_len.update(text_len)
+        self.text_len_hist.update(text_len)
+        for start, end, tag in entities:
+            self.entity_len.update(end - start)
+            self.entity_len_hist.update(end - start)
+            self.tag_counter[tag] += 1
+        if labels is not None:
+            self.label_counter.update(labels)
+        nested, overlap = count_nested_overlap(entities)
+        self.nested += nested
+        self.overlap += overlap
+
+    def merge(self, other):
+        """
+        合并另一部分数据的统计
+        Args:
+            other(NerStats): 另一部分数据的统计
+        """
+        self.text_len.merge(other.text_len)
+        self.text_len_hist.merge(other.text_len_hist)
+        self.entity_len.merge(other.entity_len)
+        self.entity_len_hist.merge(other.entity_len_hist)
+        self.tag_counter.update(other.tag_counter)
+        self.label_counter.update(other.label_counter)
+        self.nested += other.nested
+        self.overlap += other.overlap
+
+    def summary(self):
+        """
+        Returns:
+            summary(dict): 统计结果
+        """
+        def get_len_summary(running_stats, hist):
+            return {
+                "count": running_stats.count,
+                "mean": round(running_stats.mean, 2),
+                "std": round(running_stats.std, 2),
+                "min": running_stats.min,
+                "50%": hist.quantile(0.5),
+                "70%": hist.quantile(0.7),
+                "90%": hist.quantile(0.9),
+                "max": running_stats.max
+            }
+
+        return {
+            "text_len": get_len_summary(self.text_len, self.text_len_hist),
+            "entity_len": get_len_summary(self.entity_len, self.entity_len_hist),
+            "tags": dict(self.tag_counter.most_common()),
+            "nested": self.nested,
+            "overlap": self.overlap
+        }
+
+
+def count_nested_overlap(entities):
+    """
+    统计一条记录中的嵌套实体对和交叉实体对
+    Args:
+        entities(list): [[start, end, tag], ...]
+    Returns:
+        nested(int): 一个实体包含另一个实体的对数，位置相同的也算嵌套
+        overlap(int): 两个实体交叉但互不包含的对数
+    """
+    nested = 0
+    overlap = 0
+    if len(entities) < 2:
+        return nested, overlap
+    spans = sorted(((entity[0], entity[1]) for entity in entities), key=lambda x: (x[0], -x[1]))
+    for i, (start, end) in enumerate(spans):
+        for next_start, next_end in spans[i + 1:]:
+            if next_start >= end:
+                break
+            if next_end <= end:
+                nested += 1
+            else:
+                overlap += 1
+    return nested, overlap
+
+
+def compute_chunk_stats(parse_record, chunk):
+    """
+    统计一块记录
+    Args:
+        parse_record(callable): 把一条记录解析为(text, entities, labels)，空记录返回None
+        chunk(list): 记录列表
+    Returns:
+        stats(NerStats): 这一块的统计
+    """
+    stats = NerStats()
+    for record in chunk:
+        record = parse_record(record)
+        if record is not None:
+            stats.update(*record)
+    return stats
@@ -1,80 +1,63 @@
 # -*- coding: utf-8 -*-
 
+from collections import Counter
+from functools import partial
+
+import numpy as np
+
+from .chunk import iter_chunks, map_chunks
+
 
 class Vocab:
     """
-    词典类
+    词典类：先在整个数据集上计数，再按阈值筛选，单词按(-频次, 单词)排序，标签按出现顺序，
+    结果与读取顺序和进程数无关。构建后为id列表加查找词典
     """
     def __init__(self, pad="<pad>", unk="<unk>"):
         # word - id
         self._word2id = dict()
-        self._id2word = dict()
-        self._word_size = 0
+        self._id2word = list()
         # label - id
         self._label2id = dict()
-        self._id2label = dict()
-        self._label_size = 0
-        self._word2count = dict()
+        self._id2label = list()
+        self._word2count = Counter()
         self._pad = pad
         self._unk = unk
 
-    def build_vocab(self, train, dev, delimiter="\t", count=0):
+    def build_vocab(self, train, dev, delimiter="\t", count=0, workers=1, chunk_size=100000):
         """
         构建词典
         Args:
             train(str): 训练集
             dev(str): 验证集
             delimiter(str): 分隔符
-            count(int): 阈值
+            count(int): 阈值，出现次数大于阈值的单词加入词典
+            workers(int): 计数的进程数
+            chunk_size(int): 每个进程每次计数的行数
         Returns: 无
         """
-        self._word2id[self._pad] = self._word_size
-        self._id2word[self._word_size] = self._pad
-        self._word_size += 1
-        self._word2id[self._unk] = self._word_size
-        self._id2word[self._word_size] = self._unk
-        self._word_size += 1
-
-        self._read_file(train, delimiter, count)
-        self._read_file(dev, delimiter, count)
-
-    def _read_file(self, data_file, delimiter, count):
-        """
-        读取数据集
-        Args:
-            data_file(str): 文件路径
-            delimiter(str): 分隔符
-            count(int): 阈值
-        :return: 无
-        """
-        if not data_file:
-            return
-
-        with open(data_file, 'r', encoding='utf-8') as rf:
-            for line in rf:
-                line = line.rstrip()
-                if not line:
-                    continue
-                word, label = line.split(delimiter)
-
-                # 判断标签是否在标签词典里
-                if label not in self._label2id:
-                    self._label2id[label] = self._label_size
-                    self._id2label[self._label_size] = label
-                    self._label_size += 1
-
-                # 判断单词是否在单词统计词典里
-                if word not in self._word2count:
-                    self._word2count[word] = 1
-                else:
-                    self._word2count[word] += 1
-
-                # 判断是否把单词添加到单词词典
-                if word not in self._word2id \
-                        and self._word2count[word] > count:
-                    self._word2id[word] = self._word_size
-                    self._id2word[self._word_size] = word
-                    self._word_size += 1
+        label_dict = dict()
+        for data_file in [train, dev]:
+            word_counter, labels = count_file(data_file, delimiter, workers, chunk_size)
+            self._word2count.update(word_counter)
+            label_dict.update(dict.fromkeys(labels))
+
+        words = [word for word, word_count in self._word2count.items() if word_count > count]
+        words.sort(key=lambda word: (-self._word2count[word], word))
+        for word in [self._pad, self._unk] + words:
+            self._add_word(word)
+        for label in label_dict:
+            self._add_label(label)
+
+    def _add_word(self, word):
+        if word not in self._word2id:
+            self._word2id[word] = len(self._id2word)
+            self._id2word.append(word)
+
+    def _add_label(self, label):
+        if label not in self._label2id:
+            self._label2id[label] = len(self._id2label)
+            self._id2label.append(label)
 
     def save_vocab(self, word_file, label_file):
         """
@@ -86,11 +69,11 @@ class Vocab:
         """
         with open(word_file, 'w', encoding='utf-8') as wf, \
                 open(label_file, 'w', encoding='utf-8') as lf:
-            for i in range(self._word_size):
-                wf.write(self._id2word[i] + "\n")
+            for word in self._id2word:
+                wf.write(word + "\n")
 
-            for i in range(self._label_size):
-                lf.write(self._id2label[i] + "\n")
+            for label in self._id2label:
+                lf.write(label + "\n")
 
     def load_vocab(self, word_file, label_file):
         """
@@ -105,21 +88,37 @@ class Vocab:
 
         with open(word_file, 'r', encoding='utf-8') as wf, \
                 open(label_file, 'r', encoding='utf-8') as lf:
+            # 只去掉换行符，行号即为索引，空白字符(如" "、"\u3000")也是单词
             for line in wf:
-                word = line.rstrip()
-                if not word:
-                    continue
-                self._word2id[word] = self._word_size
-                self._id2word[self._word_size] = word
-                self._word_size += 1
+                self._add_word(line.rstrip("\n"))
 
             for line in lf:
-                label = line.rstrip()
-                if not label:
-                    continue
-                self._label2id[label] = self._label_size
-                self._id2label[self._label_size] = label
-                self._label_size += 1
+                self._add_label(line.rstrip("\n"))
+
+    def encode(self, words):
+        """
+        单词序列转为索引数组，不在词典中的单词为<unk>的索引
+        Args:
+            words(list): 单词序列
+        Returns:
+            word_ids(ndarray): int64索引数组
+        """
+        word2id = self._word2id
+        unk_id = word2id.get(self._unk, 1)
+        return np.fromiter((word2id.get(word, unk_id) for word in words), dtype=np.int64, count=len(words))
+
+    def encode_labels(self, labels):
+        """
+        标签序列转为索引数组
+        Args:
+            labels(list): 标签序列
+        Returns:
+            label_ids(ndarray): int64索引数组
+        """
+        try:
+            return np.fromiter((self._label2id[label] for label in labels), dtype=np.int64, count=len(labels))
+        except KeyError as e:
+            raise ValueError(f"标签不在词典中：{e.args[0]}")
 
     def get_word2id(self):
         """
@@ -142,8 +141,10 @@ class Vocab:
             idx: 索引
         Returns: 单词
         """
-        return self._id2word.get(idx, self._unk)
-    
+        if 0 <= idx < len(self._id2word):
+            return self._id2word[idx]
+        return self._unk
+
     def get_word_id(self, word):
         """
         获得单词索引
@@ -152,7 +153,7 @@ class Vocab:
         Returns: 单词索引
         """
         return self._word2id.get(word, 1)
-    
+
     def get_label(self, idx):
         """
         获得标签
@@ -160,8 +161,10 @@ class Vocab:
             idx: 索引
         Returns: 标签
         """
-        return self._id2label.get(idx)
-    
+        if 0 <= idx < len(self._id2label):
+            return self._id2label[idx]
+        return None
+
     def get_label_id(self, label):
         """
         获得标签索引
@@ -170,17 +173,66 @@ class Vocab:
         Returns: 标签索引
         """
         return self._label2id.get(label)
-    
+
     def get_word_size(self):
         """
         获得单词词典长度
         Returns: 单词词典长度
         """
-        return self._word_size
-    
+        return len(self._id2word)
+
     def get_label_size(self):
         """
         获得标签词典长度
         Return: 标签词典长度
         """
-        return self._label_size
+        return len(self._id2label)
+
+
+def count_file(data_file, delimiter="\t", workers=1, chunk_size=100000):
+    """
+    分块统计数据集中的单词频次和标签
+    Args:
+        data_file(str): 文件路径，为空时返回空结果
+        delimiter(str): 分隔符
+        workers(int): 进程数
+        chunk_size(int): 每块的行数
+    Returns:
+        word_counter(Counter): 单词 - 频次
+        labels(list): 按出现顺序的标签
+    """
+    word_counter = Counter()
+    label_dict = dict()
+    if not data_file:
+        return word_counter, list()
+
+    with open(data_file, 'r', encoding='utf-8') as rf:
+        if workers <= 1:
+            return count_chunk(rf, delimiter)
+        chunks = iter_chunks(rf, chunk_size)
+        for chunk_counter, chunk_labels in map_chunks(partial(count_chunk, delimiter=delimiter), chunks, workers):
+            word_counter.update(chunk_counter)
+            label_dict.update(dict.fromkeys(chunk_labels))
+    return word_counter, list(label_dict)
+
+
+def count_chunk(chunk, delimiter="\t"):
+    """
+    统计一块行中的单词频次和标签
+    Args:
+        chunk(iterable): 行列表，每行为word{delimiter}label，跳过空行
+        delimiter(str): 分隔符
+    Returns:
+        word_counter(Counter): 单词 - 频次
+        labels(list): 按出现顺序的标签
+    """
+    word_list = list()
+    label_dict = dict()
+    for line in chunk:
+        line = line.rstrip()
+        if not line:
+            continue
+        word, label = line.split(delimiter)
+        word_list.append(word)
+        label_dict[label] = None
+    return Counter(word_list), list(label_dict)
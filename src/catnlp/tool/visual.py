@@ -3,7 +3,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 
-def draw_histogram(datas, num_bins=50, density=True, xlabel="Len", ylabel="Num", title="Histogram of Length"):
+def draw_histogram(datas, num_bins=50, density=True, xlabel="Len", ylabel="Num", title="Histogram of Length", weights=None):
      def get_ymax(rects):
           max_y = 0
           for rect in rects:
@@ -14,11 +14,12 @@ def draw_histogram(datas, num_bins=50, density=True, xlabel="Len", ylabel="Num",
      fig, ax = plt.subplots()
 
      # the histogram of the data
-     n, bins, patches = ax.hist(datas, num_bins, density=density)
+     # weights不为空时datas为各取值，weights为各取值的数量
+     n, bins, patches = ax.hist(datas, num_bins, density=density, weights=weights)
      ax.set_xlabel(xlabel)
      ax.set_ylabel(ylabel)
      ax.set_title(title)
-     x_val = datas.mean()
+     x_val = np.average(datas, weights=weights)
      ymax = get_ymax(patches)
      ax.vlines(x=x_val, ymin=0, ymax=ymax, color='r', linestyle='-')
      ax.text(x_val, ymax/2, round(x_val, 1), color='r')
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+
+from catnlp.ner.util.embed import convert_word2vec
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="文本格式的词向量转为内存映射的二进制格式")
+    parser.add_argument(
+        "--embed_file", default="resources/data/embed/character.vec.txt", type=str, help="文本格式的词向量文件"
+    )
+    parser.add_argument(
+        "--target", default=None, type=str, help="输出的.npy文件，默认与输入同名"
+    )
+    parser.add_argument(
+        "--embed_dim", default=None, type=int, help="词向量维度，文件首行有维度时可以不填"
+    )
+    args = parser.parse_args()
+    target = convert_word2vec(args.embed_file, args.target, args.embed_dim)
+    print(f"转换完成：{target}")
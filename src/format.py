@@ -23,11 +23,24 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "--convert", default="bies2json", type=str,
-        choices=["json2bio", "bio2json", "json2bies", "bies2json", "json2clue", "clue2json", "json2split", "split2json", "json2many"], 
+        choices=["json2bio", "bio2json", "json2bies", "bies2json", "json2clue", "clue2json", "json2split", "split2json", "json2many",
+                 "json2arrow", "arrow2json", "conll2arrow"],
         help="转化类型"
     )
+    parser.add_argument(
+        "--workers", default=1, type=int, help="转换进程数"
+    )
+    parser.add_argument(
+        "--chunk_size", default=1000, type=int, help="每个进程每次转换的记录数"
+    )
+    parser.add_argument(
+        "--is_clean", action="store_true", help="是否清理文本"
+    )
+    parser.add_argument(
+        "--clean_mapping", default=None, type=str, help="清理时追加的单字符映射，yaml文件"
+    )
     args = parser.parse_args()
-    # NER Format: json2bio,bio2json,json2bies,bies2json,json2clue,clue2json,json2split,split2json
+    # NER Format: json2bio,bio2json,json2bies,bies2json,json2clue,clue2json,json2split,split2json,json2arrow,arrow2json,conll2arrow
     ner_format = NerFormat()
     input_path = Path(args.input_dir)
     output_path = Path(args.output_dir)
@@ -38,5 +51,7 @@ if __name__ == "__main__":
     for dataset in datasets:
         input_file = input_path / f"{dataset}.{args.input_type}"
         output_file = output_path / f"{dataset}.{args.output_type}"
-        ner_format.convert(input_file, output_file, 
-                           is_clean=False, format=args.convert)
+        ner_format.convert(input_file, output_file,
+                           is_clean=args.is_clean, format=args.convert,
+                           workers=args.workers, chunk_size=args.chunk_size,
+                           clean_mapping=args.clean_mapping)
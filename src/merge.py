@@ -2,6 +2,8 @@ import json
 from pathlib import Path
 from collections import defaultdict
 
+from catnlp.ner.util.conflict import vote_entities
+
 
 def merge_files(sources, target):
     with open(target, "w", encoding="utf-8") as tf:
@@ -23,7 +25,7 @@ def merge_files(sources, target):
             entity_list = list()
             for entity in entity_dict:
                 entity_list.append([entity[0], entity[1], entity[2], entity_dict[entity]])
-            entities = merge_entities(entity_list)
+            entities = vote_entities(entity_list)
             tag_list = get_tag_list(text, entities)
             tf.write(f"{idx}\u0001{text}\u0001{' '.join(tag_list)}\n")
 
@@ -53,7 +55,7 @@ def get_interval(tag_list, format="bio"):
     return entity_list
 
 
-def get_interval_bio(tag_list, weight):
+def get_interval_bio(tag_list):
     entities = []
     pre_o = True
     for idx, tag in enumerate(tag_list):
@@ -100,21 +102,6 @@ def get_interval_bies(tag_list):
     return entities
 
 
-def merge_entities(entity_list):
-    sorted_entity_list = sorted(entity_list, key=lambda i: (i[2], i[1]-i[0]), reverse=True)
-    new_entity_list = list()
-    is_appear_list = [False] * len(entity_list)
-    for idx, entity in enumerate(sorted_entity_list):
-        if is_appear_list[idx]:
-            continue
-        new_entity_list.append(entity)
-        for idy, tmp_entity in enumerate(sorted_entity_list[idx:]):
-            if entity[0] < tmp_entity[1] and \
-                    tmp_entity[0] < entity[1]:
-                is_appear_list[idx+idy] = True
-    return new_entity_list
-
-
 if __name__ == "__main__":
     source_path = Path("resources/data/dataset/ner/zh/ccks/address/0621/merge")
     file_names = ["试一下_addr_parsing_runid_9094", "试一下_addr_parsing_runid_9092", "试一下_addr_parsing_runid_9090"] #, "试一下_addr_parsing_runid_9045", "试一下_addr_parsing_runid_9034"]
@@ -8,22 +8,8 @@ import json
 from tqdm import tqdm
 
 from catnlp.common.load_file import load_config_file
-from catnlp.ner.predict import NerPredict
-
-
-def merge_entities(entity_list):
-    sorted_entity_list = sorted(entity_list, key=lambda i: i[1]-i[0], reverse=True)
-    new_entity_list = list()
-    is_appear_list = [False] * len(entity_list)
-    for idx, entity in enumerate(sorted_entity_list):
-        if is_appear_list[idx]:
-            continue
-        new_entity_list.append(entity)
-        for idy, tmp_entity in enumerate(sorted_entity_list[idx:]):
-            if entity[0] < tmp_entity[1] and \
-                    tmp_entity[0] < entity[1]:
-                is_appear_list[idx+idy] = True
-    return new_entity_list
+from catnlp.ner.predict import NerPipeline
+from catnlp.ner.util.conflict import merge_entities
 
 
 if __name__ == "__main__":
@@ -40,6 +26,8 @@ if __name__ == "__main__":
                         default="resources/config/ner/predict/bert_biaffine.yaml", help="预测配置")
     parser.add_argument("--log_config", type=str,
                         default="resources/config/ner/logging.yaml", help="日志配置")
+    parser.add_argument("--batch_size", type=int,
+                        default=32, help="每批预测的文本数")
     args = parser.parse_args()
 
     try:
@@ -51,37 +39,40 @@ if __name__ == "__main__":
 
     task = args.task.lower()
     if task == "ner":
-        ner_services = list()
-        for type in predict_config:
-            ner_services.append(NerPredict(predict_config[type], type=type))
+        ner_pipeline = NerPipeline(predict_config)
         with open(args.input_file, "r", encoding="utf-8") as sf, \
                 open(args.mid_file, "w", encoding="utf-8") as mf, \
                 open(args.output_file, "w", encoding="utf-8") as tf:
             lines = sf.readlines()
-            for line in tqdm(lines):
+            records = list()
+            for line in lines:
                 line = line.rstrip()
                 if not line:
                     continue
-                idx, text = line.split("\u0001")
-                entity_list = list()
-                for ner_service in ner_services:
-                    entity_list += ner_service.predict(text)
-                entity_list = merge_entities(entity_list)
-                tag_list = ["O"] * len(text)
-                for entity in entity_list:
-                    start, end, tag = entity
-                    if end - start == 1:
-                        # if tag in ["assist", "intersection"]:
-                        tag_list[start] = f"S-{tag}"
-                    else:
-                        tag_list[start] = f"B-{tag}"
-                        for i in range(start+1, end-1):
-                            tag_list[i] = f"I-{tag}"
-                        tag_list[end-1] = f"E-{tag}"
-                tf.write(f"{idx}\u0001{text}\u0001{' '.join(tag_list)}\n")
-                mf.write(json.dumps({
-                    "text": text,
-                    "ner": entity_list
-                }, ensure_ascii=False) + "\n")
+                records.append(line.split("\u0001"))
+            for batch_start in tqdm(range(0, len(records), args.batch_size)):
+                batch = records[batch_start: batch_start + args.batch_size]
+                entity_lists = ner_pipeline.predict_batch([text for _, text in batch])
+                for (idx, text), entity_list in zip(batch, entity_lists):
+                    entity_list = merge_entities(entity_list)
+                    tag_list = ["O"] * len(text)
+                    for entity in entity_list:
+                        start, end, tag = entity[:3]
+                        if end - start == 1:
+                            # if tag in ["assist", "intersection"]:
+                            tag_list[start] = f"S-{tag}"
+                        else:
+                            tag_list[start] = f"B-{tag}"
+                            for i in range(start+1, end-1):
+                                tag_list[i] = f"I-{tag}"
+                            tag_list[end-1] = f"E-{tag}"
+                    tf.write(f"{idx}\u0001{text}\u0001{' '.join(tag_list)}\n")
+                    mf.write(json.dumps({
+                        "text": text,
+                        "ner": entity_list
+                    }, ensure_ascii=False) + "\n")
+        # 级联预测时输出各阶段处理的文本数
+        for type, stats in ner_pipeline.get_stats().items():
+            print(f"{type}: {json.dumps(stats, ensure_ascii=False)}")
     else:
         raise RuntimeError(f"{args.task}未开发")
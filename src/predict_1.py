@@ -8,21 +8,7 @@ from tqdm import tqdm
 
 from catnlp.common.load_file import load_config_file
 from catnlp.ner.predict import NerPredict
-
-
-def merge_entities(entity_list):
-    sorted_entity_list = sorted(entity_list, key=lambda i: i[1]-i[0], reverse=True)
-    new_entity_list = list()
-    is_appear_list = [False] * len(entity_list)
-    for idx, entity in enumerate(sorted_entity_list):
-        if is_appear_list[idx]:
-            continue
-        new_entity_list.append(entity)
-        for idy, tmp_entity in enumerate(sorted_entity_list[idx:]):
-            if entity[0] < tmp_entity[1] and \
-                    tmp_entity[0] < entity[1]:
-                is_appear_list[idx+idy] = True
-    return new_entity_list
+from catnlp.ner.util.conflict import merge_entities
 
 
 if __name__ == "__main__":